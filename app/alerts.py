@@ -0,0 +1,105 @@
+from datetime import date, datetime, time, timedelta
+
+from app.cache import get_cached, set_cached
+from app.config import ALERT_DIGEST_DAYS
+from models import EmployeeTable as E
+from models import PCTable as P
+
+DIGEST_KEY = "alerts:digest"
+# ダッシュボード・日次通知の対象期間 (日)
+DIGEST_DAYS = ALERT_DIGEST_DAYS
+
+# 退職・異動それぞれの日付インデックスで範囲検索し、PC割り当て有無をEXISTSで付与
+# (profile_imageは取得しない)
+_UPCOMING_SQL = """
+SELECT 'resignation' AS kind, e.resignation_date AS alert_date,
+       e.id, e.name, e.email, e.department_id,
+       e.resignation_date, e.transfer_date, e.role,
+       EXISTS (SELECT 1 FROM pcs p WHERE p.assigned_to = e.id) AS has_pc
+FROM employees e
+WHERE e.resignation_date >= {} AND e.resignation_date <= {}
+UNION ALL
+SELECT 'transfer', e.transfer_date,
+       e.id, e.name, e.email, e.department_id,
+       e.resignation_date, e.transfer_date, e.role,
+       EXISTS (SELECT 1 FROM pcs p WHERE p.assigned_to = e.id)
+FROM employees e
+WHERE e.transfer_date >= {} AND e.transfer_date <= {}
+ORDER BY alert_date, name
+"""
+
+
+def _as_date(value) -> date:
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+async def find_upcoming_alerts(days: int, today: date | None = None) -> dict:
+    """今日からdays日以内の退職・異動予定者 (1クエリ)"""
+    today = today or date.today()
+    target_date = today + timedelta(days=days)
+    alerts = {"resignations": [], "transfers": []}
+    for row in await E.raw(_UPCOMING_SQL, today, target_date, today, target_date):
+        kind = row.pop("kind")
+        alert_date = _as_date(row.pop("alert_date"))
+        row["has_pc"] = bool(row["has_pc"])
+        row["date"] = alert_date.isoformat()
+        row["days_left"] = (alert_date - today).days
+        alerts[f"{kind}s"].append(row)
+    return alerts
+
+
+def _seconds_until_midnight(now: datetime) -> int:
+    midnight = datetime.combine(now.date() + timedelta(days=1), time.min)
+    return max(int((midnight - now).total_seconds()), 1)
+
+
+async def _pc_returns(alerts: dict) -> list[dict]:
+    """PCが割り当てられたままの退職・異動予定者 (日付順、PC名付き)"""
+    pending = [
+        {"kind": kind, **a}
+        for kind in ("resignations", "transfers")
+        for a in alerts[kind]
+        if a["has_pc"]
+    ]
+    if not pending:
+        return []
+    pc_names: dict = {}
+    for pc in (
+        await P.select(P.name, P.assigned_to)
+        .where(P.assigned_to.is_in([a["id"] for a in pending]))
+        .order_by(P.name)
+    ):
+        pc_names.setdefault(pc["assigned_to"], []).append(pc["name"])
+    return [
+        {
+            "kind": a["kind"],
+            "name": a["name"],
+            "date": a["date"],
+            "days_left": a["days_left"],
+            "pcs": pc_names.get(a["id"], []),
+        }
+        for a in sorted(pending, key=lambda a: a["date"])
+    ]
+
+
+async def refresh_alert_digest(now: datetime | None = None) -> dict:
+    """当日分のダイジェストを計算して保存 (日付が変わるまで有効)"""
+    now = now or datetime.now()
+    alerts = await find_upcoming_alerts(DIGEST_DAYS, now.date())
+    digest = {
+        "date": now.date().isoformat(),
+        "days": DIGEST_DAYS,
+        **alerts,
+        "pc_returns": await _pc_returns(alerts),
+    }
+    await set_cached(DIGEST_KEY, digest, ttl=_seconds_until_midnight(now))
+    return digest
+
+
+async def get_alert_digest() -> dict:
+    """保存済みの当日分ダイジェスト (無効化後・未計算なら計算して保存)"""
+    now = datetime.now()
+    cached = await get_cached(DIGEST_KEY)
+    if cached and cached["date"] == now.date().isoformat():
+        return cached
+    return await refresh_alert_digest(now)
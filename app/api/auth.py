@@ -1,11 +1,14 @@
+import hashlib
 import secrets
 from dataclasses import dataclass
-from datetime import datetime
 
 from litestar import Request, Response, Router, post
-from litestar.exceptions import NotAuthorizedException, TooManyRequestsException
+from litestar.exceptions import NotAuthorizedException, ServiceUnavailableException
 
-from app.cache import delete_cached, get_cached, redis, set_cached
+from app.breaker import CircuitBreakerError
+from app.cache import redis_breaker, run_script, set_cached
+from app.ratelimit import AUTH_RATE_LIMIT, check_rate_limit
+from app.sessions import SESSION_TTL, create_session, revoke_session
 from app.utils import send_otp_email
 from models import EmployeeTable, Role
 
@@ -21,63 +24,106 @@ class VerifyOTPRequest:
     otp: str
 
 
-async def check_rate_limit(key: str, max: int, window: int) -> None:
-    """レート制限チェック"""
-    if (count := await redis.get(key)) and int(count) >= max:
-        raise TooManyRequestsException(detail="試行回数の上限に達しました")
-    await redis.incr(key)
-    await redis.expire(key, window)
+OTP_MAX_ATTEMPTS = 5
+
+# OTPの照合・試行回数の加算・使用済みの削除を1往復で行う
+# KEYS[1]: otp:<email> / ARGV: 入力コード, 試行回数の上限
+# コードは保存せず、OTPごとのランダムな鍵 (key) とのダイジェストだけを保存して照合する。
+# 比べるのは攻撃者が知らない鍵から作ったダイジェスト同士なので、
+# 文字列比較の時間差からコードは推測できない (secrets.compare_digest の代わり)
+_VERIFY_OTP_SCRIPT = """
+local raw = redis.call('GET', KEYS[1])
+if not raw then
+    return 'missing'
+end
+local otp = cjson.decode(raw)
+if not otp['digest'] then
+    redis.call('DEL', KEYS[1])
+    return 'missing'
+end
+if otp['attempts'] >= tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1])
+    return 'exceeded'
+end
+if redis.sha1hex(otp['key'] .. ARGV[1]) ~= otp['digest'] then
+    otp['attempts'] = otp['attempts'] + 1
+    redis.call('SET', KEYS[1], cjson.encode(otp), 'KEEPTTL')
+    return 'invalid'
+end
+redis.call('DEL', KEYS[1])
+return 'ok'
+"""
+
+
+def _otp_record(code: str) -> dict:
+    """Redisに保存するOTP (コードそのものは保存しない)"""
+    key = secrets.token_hex(16)
+    digest = hashlib.sha1((key + code).encode()).hexdigest()
+    return {"key": key, "digest": digest, "attempts": 0}
+
+
+_OTP_ERRORS = {
+    "missing": "OTPが無効または期限切れです",
+    "exceeded": "試行回数超過",
+    "invalid": "OTPが正しくありません",
+}
+
+
+def _require_redis() -> None:
+    """OTPはRedisにしか無いため、停止中はログインを受け付けない
+
+    サーキットブレーカーが open の間は /auth/send-otp・/auth/verify-otp とも
+    503 を返す (フェイルクローズ)。ログイン済みのセッションは SESSION_GRACE_TTL の間使える。
+    """
+    if not redis_breaker.available:
+        raise ServiceUnavailableException(detail="現在ログインできません")
 
 
 @post("/send-otp")
 async def send_otp(data: SendOTPRequest) -> dict[str, str]:
     """OTP送信"""
-    await check_rate_limit(f"rate:otp:{data.email}", 5, 300)
+    _require_redis()
+    await check_rate_limit(f"otp:{data.email}", 5, 300)
     if not await EmployeeTable.exists().where(EmployeeTable.email == data.email):
         raise NotAuthorizedException(detail="メールアドレスが登録されていません")
 
     otp = "".join(str(secrets.randbelow(10)) for _ in range(6))
-    await set_cached(f"otp:{data.email}", {"code": otp, "attempts": 0}, 600)
+    await set_cached(f"otp:{data.email}", _otp_record(otp), 600)
     await send_otp_email(data.email, otp)
     return {"message": "OTPを送信しました"}
 
 
 @post("/verify-otp")
 async def verify_otp(data: VerifyOTPRequest) -> Response[dict[str, str]]:
-    """OTP検証&ログイン"""
-    await check_rate_limit(f"rate:login:{data.email}", 10, 600)
-
-    if not (otp_data := await get_cached(f"otp:{data.email}")):
-        raise NotAuthorizedException(detail="OTPが無効または期限切れです")
-
-    if otp_data["attempts"] >= 5:
-        await delete_cached(f"otp:{data.email}")
-        raise NotAuthorizedException(detail="試行回数超過")
-
-    if not secrets.compare_digest(data.otp, otp_data["code"]):
-        otp_data["attempts"] += 1
-        await set_cached(f"otp:{data.email}", otp_data, 600)
-        raise NotAuthorizedException(detail="OTPが正しくありません")
+    """OTP検証&ログイン (Redis停止中は503)"""
+    _require_redis()
+    await check_rate_limit(f"login:{data.email}", 10, 600)
+
+    try:
+        result = await run_script(
+            _VERIFY_OTP_SCRIPT, [f"otp:{data.email}"], [data.otp, OTP_MAX_ATTEMPTS]
+        )
+    except CircuitBreakerError:
+        raise ServiceUnavailableException(detail="現在ログインできません")
+    if result != "ok":
+        raise NotAuthorizedException(detail=_OTP_ERRORS[result])
 
     employee = (
-        await EmployeeTable.select().where(EmployeeTable.email == data.email).first()
+        await EmployeeTable.select(EmployeeTable.id, EmployeeTable.role)
+        .where(EmployeeTable.email == data.email)
+        .first()
     )
-    session_id = secrets.token_urlsafe(32)
-    await set_cached(
-        f"session:{session_id}",
+    session_id = await create_session(
         {
             "user_id": str(employee["id"]),
             "email": data.email,
             "role": employee.get("role", Role.USER.value),
-            "created_at": datetime.now().isoformat(),
-        },
-        86400,
+        }
     )
-    await delete_cached(f"otp:{data.email}")
 
     response = Response({"message": "ログイン成功"})
     response.set_cookie(
-        "session_id", session_id, httponly=True, max_age=86400, samesite="strict"
+        "session_id", session_id, httponly=True, max_age=SESSION_TTL, samesite="strict"
     )
     return response
 
@@ -86,10 +132,14 @@ async def verify_otp(data: VerifyOTPRequest) -> Response[dict[str, str]]:
 async def logout(request: Request) -> Response[dict[str, str]]:
     """ログアウト"""
     if session_id := request.cookies.get("session_id"):
-        await delete_cached(f"session:{session_id}")
+        await revoke_session(session_id)
     response = Response({"message": "ログアウトしました"})
     response.delete_cookie("session_id")
     return response
 
 
-auth_router = Router(path="/auth", route_handlers=[send_otp, verify_otp, logout])
+auth_router = Router(
+    path="/auth",
+    route_handlers=[send_otp, verify_otp, logout],
+    middleware=[AUTH_RATE_LIMIT],
+)
@@ -7,7 +7,13 @@ from litestar import Request, Router, WebSocket, get, post, websocket
 from litestar.exceptions import ValidationException
 
 from app.auth import session_auth_guard
-from app.redis_client import get_redis
+from app.cache import publish
+from app.directory import get_employee_name
+from app.metrics import in_flight, inc
+from app.ratelimit import CHAT_RATE_LIMIT
+from app.redis_client import get_pubsub
+from app.sessions import load_session
+from app.statements import PreparedQuery
 from models import ChatMessage, ChatMessageTable, EmployeeTable
 
 
@@ -29,7 +35,7 @@ class MessageResponse:
     is_read: bool
 
 
-@post("/messages")
+@post("/messages", middleware=[CHAT_RATE_LIMIT])
 async def send_message(data: SendMessageRequest, request: Request) -> dict[str, str]:
     """メッセージ送信"""
     sender_id = UUID(request.state.user_id)
@@ -58,44 +64,68 @@ async def send_message(data: SendMessageRequest, request: Request) -> dict[str,
         )
     )
 
-    # Redisでリアルタイム配信
-    redis = await get_redis()
-    await redis.publish(f"chat:{receiver_id}", json.dumps(asdict(message), default=str))
+    # Redisでリアルタイム配信 (Redis停止中は復旧後に配信)
+    await publish(f"chat:{receiver_id}", json.dumps(asdict(message), default=str))
 
     return {"message": "送信しました", "id": str(message.id)}
 
 
-@get("/messages/{user_id:uuid}")
-async def get_messages(user_id: UUID, request: Request) -> list[MessageResponse]:
-    """特定ユーザーとのメッセージ履歴取得（最新200件）"""
-    current_user_id = UUID(request.state.user_id)
-
-    # 自分と相手のメッセージを最新200件取得
-    messages = (
-        await ChatMessageTable.select()
+def _conversation(me: UUID, other: UUID):
+    return (
+        ChatMessageTable.select()
         .where(
             (
-                (ChatMessageTable.sender_id == current_user_id)
-                & (ChatMessageTable.receiver_id == user_id)
+                (ChatMessageTable.sender_id == me)
+                & (ChatMessageTable.receiver_id == other)
             )
             | (
-                (ChatMessageTable.sender_id == user_id)
-                & (ChatMessageTable.receiver_id == current_user_id)
+                (ChatMessageTable.sender_id == other)
+                & (ChatMessageTable.receiver_id == me)
             )
         )
         .order_by(ChatMessageTable.created_at, ascending=False)
         .limit(200)
     )
-    messages = list(reversed(messages))
 
-    # 2人の社員情報を一度だけ取得
-    sender = (
-        await EmployeeTable.select().where(EmployeeTable.id == current_user_id).first()
-    )
-    receiver = await EmployeeTable.select().where(EmployeeTable.id == user_id).first()
 
-    sender_name = sender["name"] if sender else "Unknown"
-    receiver_name = receiver["name"] if receiver else "Unknown"
+_MESSAGES_SQL = (
+    "SELECT id, sender_id, receiver_id, content, created_at, is_read "
+    "FROM chat_messages "
+    "WHERE ((sender_id = $1 AND receiver_id = $2) "
+    "OR (sender_id = $2 AND receiver_id = $1)){} "
+    "ORDER BY created_at DESC LIMIT 200"
+)
+# 2人の間のメッセージ (最新200件) はチャット画面のポーリングのたびに実行される
+_messages = PreparedQuery(
+    "chat_messages_between", _MESSAGES_SQL.format(""), _conversation
+)
+_messages_since = PreparedQuery(
+    "chat_messages_between_since",
+    _MESSAGES_SQL.format(" AND created_at >= $3"),
+    lambda me, other, since: _conversation(me, other).where(
+        ChatMessageTable.created_at >= since
+    ),
+)
+
+
+@get("/messages/{user_id:uuid}")
+async def get_messages(
+    user_id: UUID, request: Request, since: datetime | None = None
+) -> list[MessageResponse]:
+    """特定ユーザーとのメッセージ履歴取得（最新200件、sinceで期間指定可）"""
+    current_user_id = UUID(request.state.user_id)
+
+    # 自分と相手のメッセージを最新200件取得
+    # 期間指定時はパーティションプルーニングが効く
+    if since:
+        messages = await _messages_since.fetch(current_user_id, user_id, since)
+    else:
+        messages = await _messages.fetch(current_user_id, user_id)
+    messages = list(reversed(messages))
+
+    # 2人の社員名は社員ディレクトリから取得
+    sender_name = await get_employee_name(current_user_id, default="Unknown")
+    receiver_name = await get_employee_name(user_id, default="Unknown")
 
     # メッセージをレスポンス形式に変換
     result = []
@@ -118,22 +148,27 @@ async def get_messages(user_id: UUID, request: Request) -> list[MessageResponse]
 
 
 @get("/conversations")
-async def get_conversations(request: Request) -> list[dict]:
-    """会話一覧を取得"""
+async def get_conversations(
+    request: Request, since: datetime | None = None
+) -> list[dict]:
+    """会話一覧を取得 (sinceで対象期間を限定可)"""
     current_user_id = UUID(request.state.user_id)
 
     # 最新メッセージと未読件数を1クエリで取得
     rows = await ChatMessageTable.raw(
         """
-        WITH latest_messages AS (
-            SELECT DISTINCT ON (
-                CASE WHEN sender_id = {} THEN receiver_id ELSE sender_id END
-            )
+        WITH my_messages AS (
+            SELECT
                 CASE WHEN sender_id = {} THEN receiver_id ELSE sender_id END as other_user_id,
                 content, created_at
             FROM chat_messages
-            WHERE sender_id = {} OR receiver_id = {}
-            ORDER BY CASE WHEN sender_id = {} THEN receiver_id ELSE sender_id END, created_at DESC
+            WHERE (sender_id = {} OR receiver_id = {}) AND created_at >= {}
+        ),
+        latest_messages AS (
+            -- プレースホルダごとに別パラメータになるため、相手IDは上で一度だけ計算
+            SELECT DISTINCT ON (other_user_id) other_user_id, content, created_at
+            FROM my_messages
+            ORDER BY other_user_id, created_at DESC
         ),
         unread_counts AS (
             SELECT sender_id, COUNT(*) as count
@@ -150,8 +185,7 @@ async def get_conversations(request: Request) -> list[dict]:
         current_user_id,
         current_user_id,
         current_user_id,
-        current_user_id,
-        current_user_id,
+        since or datetime.min,
         current_user_id,
     )
 
@@ -211,26 +245,25 @@ async def chat_websocket(socket: WebSocket) -> None:
         await socket.close(code=4001, reason="認証が必要です")
         return
 
-    from app.cache import get_cached
-
-    session = await get_cached(f"session:{session_id}")
+    session = await load_session(session_id)
     if not session:
         await socket.close(code=4001, reason="セッションが無効です")
         return
 
     user_id = session["user_id"]
-    redis = await get_redis()
-    pubsub = redis.pubsub()
+    pubsub = await get_pubsub()
 
     # 自分宛のチャンネルを購読
     await pubsub.subscribe(f"chat:{user_id}")
 
     try:
-        async for message in pubsub.listen():
-            if message["type"] == "message":
-                # メッセージをクライアントに送信
-                data = json.loads(message["data"])
-                await socket.send_json(data)
+        with in_flight("chat_websocket_connections"):
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    # メッセージをクライアントに送信
+                    data = json.loads(message["data"])
+                    await socket.send_json(data)
+                    inc("chat_websocket_messages_total")
     except Exception:
         pass
     finally:
@@ -1,62 +1,53 @@
 from uuid import UUID
 
+import msgspec
 from litestar import Router, delete, get, post, put
-from litestar.exceptions import NotFoundException
 from litestar.status_codes import HTTP_201_CREATED, HTTP_204_NO_CONTENT
 
 from app.auth import bearer_token_guard
 from app.cache import delete_cached, get_cached, set_cached
+from app.ratelimit import API_RATE_LIMIT
+from app.refdata import invalidate_refdata
+from app.repository import department_repo
 from models import Department
 from models import DepartmentTable as D
 
 
-async def _get_or_404(department_id: UUID) -> dict:
-    """部署を取得、存在しなければ404エラー"""
-    if not await D.exists().where(D.id == department_id):
-        raise NotFoundException(detail=f"Department with ID {department_id} not found")
-    return await D.select().where(D.id == department_id).first()
-
-
-def _to_department(data: dict) -> Department:
-    """辞書からDepartmentオブジェクトに変換"""
-    return Department(id=data["id"], name=data["name"])
-
-
 @post("/departments", status_code=HTTP_201_CREATED)
 async def create_department(data: Department) -> Department:
     await D(id=data.id, name=data.name).save()
     await delete_cached("departments:list", "dashboard:stats")
+    await invalidate_refdata()
     return data
 
 
 @get("/departments")
 async def list_departments() -> list[Department]:
-    if cached := await get_cached("departments:list"):
-        return [Department(**d) for d in cached]
-    result = [_to_department(d) for d in await D.select()]
-    await set_cached("departments:list", [d.__dict__ for d in result])
+    if cached := await get_cached("departments:list", list[Department]):
+        return cached
+    result = department_repo.to_models(await D.select())
+    await set_cached("departments:list", result)
     return result
 
 
 @get("/departments/{department_id:uuid}")
 async def get_department(department_id: UUID) -> Department:
-    return _to_department(await _get_or_404(department_id))
+    return await department_repo.get_model_or_404(department_id)
 
 
 @put("/departments/{department_id:uuid}")
 async def update_department(department_id: UUID, data: Department) -> Department:
-    await _get_or_404(department_id)
-    await D.update({D.name: data.name}).where(D.id == department_id)
+    await department_repo.update_or_404(department_id, {D.name: data.name})
     await delete_cached("departments:list", "dashboard:stats")
-    data.id = department_id
-    return data
+    await invalidate_refdata()
+    return msgspec.structs.replace(data, id=department_id)
 
 
 @delete("/departments/{department_id:uuid}", status_code=HTTP_204_NO_CONTENT)
 async def delete_department(department_id: UUID) -> None:
-    await _get_or_404(department_id)
-    await D.delete().where(D.id == department_id)
+    await department_repo.delete_or_404(department_id)
     await delete_cached("departments:list", "dashboard:stats")
+    await invalidate_refdata()
 
 
 department_api_router = Router(
@@ -69,5 +60,6 @@ department_api_router = Router(
         delete_department,
     ],
     guards=[bearer_token_guard],
+    middleware=[API_RATE_LIMIT],
     security=[{"BearerAuth": []}],
 )
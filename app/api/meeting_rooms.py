@@ -1,33 +1,19 @@
 from uuid import UUID
 
+import msgspec
 from litestar import Router, delete, get, post, put
-from litestar.exceptions import NotFoundException
 from litestar.status_codes import HTTP_201_CREATED, HTTP_204_NO_CONTENT
 
 from app.auth import bearer_token_guard
-from app.cache import delete_cached, get_cached, set_cached
+from app.cache import delete_cached
+from app.ratelimit import API_RATE_LIMIT
+from app.refdata import invalidate_refdata
+from app.repository import meeting_room_repo
+from app.warmup import cache_loader, load_cached
 from models import MeetingRoom
 from models import MeetingRoomTable as MR
 
 
-async def _get_or_404(room_id: UUID) -> dict:
-    """会議室を取得、存在しなければ404エラー"""
-    if not await MR.exists().where(MR.id == room_id):
-        raise NotFoundException(detail=f"Meeting room with ID {room_id} not found")
-    return await MR.select().where(MR.id == room_id).first()
-
-
-def _to_meeting_room(data: dict) -> MeetingRoom:
-    """辞書からMeetingRoomオブジェクトに変換"""
-    return MeetingRoom(
-        id=data["id"],
-        name=data["name"],
-        capacity=data["capacity"],
-        location=data["location"],
-        equipment=data["equipment"],
-    )
-
-
 @post("/meeting_rooms", status_code=HTTP_201_CREATED)
 async def create_meeting_room(data: MeetingRoom) -> MeetingRoom:
     await MR(
@@ -38,44 +24,46 @@ async def create_meeting_room(data: MeetingRoom) -> MeetingRoom:
         equipment=data.equipment,
     ).save()
     await delete_cached("meeting_rooms:list")
+    await invalidate_refdata()
     return data
 
 
+@cache_loader("meeting_rooms:list")
+async def load_meeting_room_list() -> list[MeetingRoom]:
+    return meeting_room_repo.to_models(await MR.select())
+
+
 @get("/meeting_rooms")
 async def list_meeting_rooms() -> list[MeetingRoom]:
-    if cached := await get_cached("meeting_rooms:list"):
-        return [MeetingRoom(**d) for d in cached]
-    result = [_to_meeting_room(d) for d in await MR.select()]
-    await set_cached("meeting_rooms:list", [d.__dict__ for d in result])
-    return result
+    return await load_cached("meeting_rooms:list", list[MeetingRoom])
 
 
 @get("/meeting_rooms/{room_id:uuid}")
 async def get_meeting_room(room_id: UUID) -> MeetingRoom:
-    return _to_meeting_room(await _get_or_404(room_id))
+    return await meeting_room_repo.get_model_or_404(room_id)
 
 
 @put("/meeting_rooms/{room_id:uuid}")
 async def update_meeting_room(room_id: UUID, data: MeetingRoom) -> MeetingRoom:
-    await _get_or_404(room_id)
-    await MR.update(
+    await meeting_room_repo.update_or_404(
+        room_id,
         {
             MR.name: data.name,
             MR.capacity: data.capacity,
             MR.location: data.location,
             MR.equipment: data.equipment,
-        }
-    ).where(MR.id == room_id)
+        },
+    )
     await delete_cached("meeting_rooms:list")
-    data.id = room_id
-    return data
+    await invalidate_refdata()
+    return msgspec.structs.replace(data, id=room_id)
 
 
 @delete("/meeting_rooms/{room_id:uuid}", status_code=HTTP_204_NO_CONTENT)
 async def delete_meeting_room(room_id: UUID) -> None:
-    await _get_or_404(room_id)
-    await MR.delete().where(MR.id == room_id)
+    await meeting_room_repo.delete_or_404(room_id)
     await delete_cached("meeting_rooms:list")
+    await invalidate_refdata()
 
 
 meeting_room_api_router = Router(
@@ -88,5 +76,6 @@ meeting_room_api_router = Router(
         delete_meeting_room,
     ],
     guards=[bearer_token_guard],
+    middleware=[API_RATE_LIMIT],
     security=[{"BearerAuth": []}],
 )
@@ -0,0 +1,19 @@
+from litestar import Router, get
+from litestar.response import Response
+
+from app.auth import metrics_token_guard
+from app.metrics import render
+
+
+@get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """Prometheus テキスト形式 (全ワーカー合算)"""
+    return Response(
+        content=await render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+metrics_router = Router(
+    path="", route_handlers=[get_metrics], guards=[metrics_token_guard]
+)
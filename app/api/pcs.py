@@ -1,17 +1,23 @@
+from datetime import datetime
 from uuid import UUID, uuid4
 
+import msgspec
 from litestar import Router, delete, get, post, put
-from litestar.exceptions import NotFoundException
 from litestar.status_codes import HTTP_201_CREATED, HTTP_204_NO_CONTENT
 
+from app.alerts import DIGEST_KEY
 from app.auth import bearer_token_guard
-from app.cache import delete_cached, get_cached, set_cached
+from app.cache import delete_cached
+from app.ratelimit import API_RATE_LIMIT
+from app.repository import pc_repo
 from app.slack import (
     format_pc_created,
     format_pc_deleted,
     format_pc_updated,
     notify_slack,
 )
+from app.statements import PreparedQuery
+from app.warmup import cache_loader, load_cached
 from models import (
     PC,
     PCAssignmentHistory,
@@ -24,30 +30,8 @@ from models import (
 )
 
 
-async def _get_or_404(pc_id: UUID) -> dict:
-    if not await P.exists().where(P.id == pc_id):
-        raise NotFoundException(detail=f"PC with ID {pc_id} not found")
-    return await P.select().where(P.id == pc_id).first()
-
-
-def _to_pc(data: dict) -> PC:
-    return PC(
-        id=data["id"],
-        name=data["name"],
-        model=data["model"],
-        serial_number=data["serial_number"],
-        assigned_to=data["assigned_to"],
-    )
-
-
-def _to_history(data: dict) -> PCAssignmentHistory:
-    return PCAssignmentHistory(
-        id=data["id"],
-        pc_id=data["pc_id"],
-        employee_id=data["employee_id"],
-        assigned_at=data["assigned_at"],
-        notes=data["notes"],
-    )
+def _to_histories(rows: list[dict]) -> list[PCAssignmentHistory]:
+    return msgspec.convert(rows, list[PCAssignmentHistory])
 
 
 @post("/pcs", status_code=HTTP_201_CREATED)
@@ -65,7 +49,7 @@ async def create_pc(data: PC) -> PC:
         await H(id=uuid4(), pc_id=data.id, employee_id=data.assigned_to).save()
 
     # キャッシュ削除
-    await delete_cached("pcs:list", "history:all", "dashboard:stats")
+    await delete_cached("pcs:list", "history:all", "dashboard:stats", DIGEST_KEY)
 
     # Slack通知
     assigned_name = None
@@ -84,23 +68,32 @@ async def create_pc(data: PC) -> PC:
     return data
 
 
+# 一覧はモデルのフィールド順に列を並べ、行から直接 PC を組み立てる
+_pc_list = PreparedQuery(
+    "pcs_list",
+    "SELECT id, name, model, serial_number, assigned_to FROM pcs",
+    lambda: P.select(*pc_repo.default_columns),
+)
+
+
+@cache_loader("pcs:list")
+async def load_pc_list() -> list[PC]:
+    return await _pc_list.fetch_models(PC)
+
+
 @get("/pcs")
 async def list_pcs() -> list[PC]:
-    if cached := await get_cached("pcs:list"):
-        return [PC(**p) for p in cached]
-    result = [_to_pc(r) for r in await P.select(P.all_columns())]
-    await set_cached("pcs:list", [p.__dict__ for p in result])
-    return result
+    return await load_cached("pcs:list", list[PC])
 
 
 @get("/pcs/{pc_id:uuid}")
 async def get_pc(pc_id: UUID) -> PC:
-    return _to_pc(await _get_or_404(pc_id))
+    return await pc_repo.get_model_or_404(pc_id)
 
 
 @put("/pcs/{pc_id:uuid}")
 async def update_pc(pc_id: UUID, data: PC) -> PC:
-    old = await _get_or_404(pc_id)
+    old = await pc_repo.get_or_404(pc_id)
     if old["assigned_to"] != data.assigned_to:
         await H(id=uuid4(), pc_id=pc_id, employee_id=data.assigned_to).save()
     await P.update(
@@ -113,7 +106,7 @@ async def update_pc(pc_id: UUID, data: PC) -> PC:
     ).where(P.id == pc_id)
 
     # キャッシュ削除
-    await delete_cached("pcs:list", "history:all", "dashboard:stats")
+    await delete_cached("pcs:list", "history:all", "dashboard:stats", DIGEST_KEY)
 
     # Slack通知
     assigned_name = None
@@ -129,17 +122,15 @@ async def update_pc(pc_id: UUID, data: PC) -> PC:
         )
     )
 
-    data.id = pc_id
-    return data
+    return msgspec.structs.replace(data, id=pc_id)
 
 
 @delete("/pcs/{pc_id:uuid}", status_code=HTTP_204_NO_CONTENT)
 async def delete_pc(pc_id: UUID) -> None:
-    pc = await _get_or_404(pc_id)
-    await P.delete().where(P.id == pc_id)
+    pc = await pc_repo.delete_or_404(pc_id, P.name, P.model, P.serial_number)
 
     # キャッシュ削除
-    await delete_cached("pcs:list", "history:all", "dashboard:stats")
+    await delete_cached("pcs:list", "history:all", "dashboard:stats", DIGEST_KEY)
 
     # Slack通知
     await notify_slack(
@@ -149,20 +140,29 @@ async def delete_pc(pc_id: UUID) -> None:
 
 @get("/pcs/{pc_id:uuid}/history")
 async def get_pc_assignment_history(pc_id: UUID) -> list[PCAssignmentHistory]:
-    await _get_or_404(pc_id)
-    return [_to_history(h) for h in await H.select().where(H.pc_id == pc_id)]
+    await pc_repo.ensure_exists(pc_id)
+    return _to_histories(await H.select().where(H.pc_id == pc_id))
+
+
+@cache_loader("history:all")
+async def load_history_list() -> list[PCAssignmentHistory]:
+    return _to_histories(await H.select().order_by(H.assigned_at, ascending=False))
 
 
 @get("/history")
-async def list_all_assignment_history() -> list[PCAssignmentHistory]:
-    if cached := await get_cached("history:all"):
-        return [PCAssignmentHistory(**h) for h in cached]
-    result = [
-        _to_history(h)
-        for h in await H.select().order_by(H.assigned_at, ascending=False)
-    ]
-    await set_cached("history:all", [h.__dict__ for h in result])
-    return result
+async def list_all_assignment_history(
+    since: datetime | None = None, until: datetime | None = None
+) -> list[PCAssignmentHistory]:
+    # 期間指定時はキャッシュを使わず対象パーティションのみ検索
+    if since or until:
+        query = H.select().order_by(H.assigned_at, ascending=False)
+        if since:
+            query = query.where(H.assigned_at >= since)
+        if until:
+            query = query.where(H.assigned_at < until)
+        return _to_histories(await query)
+
+    return await load_cached("history:all", list[PCAssignmentHistory])
 
 
 pc_api_router = Router(
@@ -177,5 +177,6 @@ pc_api_router = Router(
         list_all_assignment_history,
     ],
     guards=[bearer_token_guard],
+    middleware=[API_RATE_LIMIT],
     security=[{"BearerAuth": []}],
 )
@@ -1,11 +1,12 @@
 from uuid import UUID
 
 from litestar import Router, delete, get, post, put
-from litestar.exceptions import NotFoundException
 from litestar.status_codes import HTTP_201_CREATED, HTTP_204_NO_CONTENT
 
 from app.auth import bearer_token_guard
 from app.cache import delete_cached
+from app.ratelimit import API_RATE_LIMIT
+from app.repository import reservation_repo
 from models import (
     MeetingRoomReservation,
 )
@@ -17,21 +18,20 @@ from models import (
 )
 
 
-async def _get_or_404(reservation_id: UUID) -> dict:
-    """予約を取得、存在しなければ404エラー"""
-    if not await MRR.exists().where(MRR.id == reservation_id):
-        raise NotFoundException(
-            detail=f"Reservation with ID {reservation_id} not found"
+async def _get_participants(reservation_ids: list[UUID]) -> dict[UUID, list[UUID]]:
+    """予約ごとの参加者ID一覧 (全予約分を1クエリで取得)"""
+    participants = {rid: [] for rid in reservation_ids}
+    if reservation_ids:
+        rows = await RP.select(RP.reservation_id, RP.employee_id).where(
+            RP.reservation_id.is_in(reservation_ids)
         )
-    return await MRR.select().where(MRR.id == reservation_id).first()
+        for p in rows:
+            participants[p["reservation_id"]].append(p["employee_id"])
+    return participants
 
 
-async def _get_participants(reservation_id: UUID) -> list[UUID]:
-    """予約の参加者ID一覧を取得"""
-    participants = await RP.select(RP.employee_id).where(
-        RP.reservation_id == reservation_id
-    )
-    return [p["employee_id"] for p in participants]
+def _with_participants(reservations: list[dict], participants: dict) -> list[dict]:
+    return [_to_reservation(r, participants[r["id"]]) for r in reservations]
 
 
 def _to_reservation(data: dict, participant_ids: list[UUID] = None) -> dict:
@@ -97,44 +97,38 @@ async def create_reservation(data: dict) -> dict:
 async def list_reservations() -> list[dict]:
     """予約一覧取得"""
     reservations = await MRR.select()
-    result = []
-    for r in reservations:
-        participants = await _get_participants(r["id"])
-        result.append(_to_reservation(r, participants))
-    return result
+    participants = await _get_participants([r["id"] for r in reservations])
+    return _with_participants(reservations, participants)
 
 
 @get("/reservations/{reservation_id:uuid}")
 async def get_reservation(reservation_id: UUID) -> dict:
     """予約詳細取得"""
-    data = await _get_or_404(reservation_id)
-    participants = await _get_participants(reservation_id)
-    return _to_reservation(data, participants)
+    data = await reservation_repo.get_or_404(reservation_id)
+    participants = await _get_participants([reservation_id])
+    return _to_reservation(data, participants[reservation_id])
 
 
 @get("/reservations/room/{room_id:uuid}")
 async def list_reservations_by_room(room_id: UUID) -> list[dict]:
     """会議室別の予約一覧"""
     reservations = await MRR.select().where(MRR.meeting_room_id == room_id)
-    result = []
-    for r in reservations:
-        participants = await _get_participants(r["id"])
-        result.append(_to_reservation(r, participants))
-    return result
+    participants = await _get_participants([r["id"] for r in reservations])
+    return _with_participants(reservations, participants)
 
 
 @put("/reservations/{reservation_id:uuid}")
 async def update_reservation(reservation_id: UUID, data: dict) -> dict:
     """予約更新"""
-    await _get_or_404(reservation_id)
-
-    await MRR.update(
+    updated = await reservation_repo.update_or_404(
+        reservation_id,
         {
             MRR.title: data["title"],
             MRR.start_time: data["start_time"],
             MRR.end_time: data["end_time"],
-        }
-    ).where(MRR.id == reservation_id)
+        },
+        *MRR.all_columns(),
+    )
 
     # 参加者を更新 (既存を削除して再登録)
     await RP.delete().where(RP.reservation_id == reservation_id)
@@ -146,17 +140,14 @@ async def update_reservation(reservation_id: UUID, data: dict) -> dict:
         ).save()
 
     await delete_cached("reservations:list")
-
-    updated = await MRR.select().where(MRR.id == reservation_id).first()
     return _to_reservation(updated, participant_ids)
 
 
 @delete("/reservations/{reservation_id:uuid}", status_code=HTTP_204_NO_CONTENT)
 async def delete_reservation(reservation_id: UUID) -> None:
     """予約削除"""
-    await _get_or_404(reservation_id)
     await RP.delete().where(RP.reservation_id == reservation_id)
-    await MRR.delete().where(MRR.id == reservation_id)
+    await reservation_repo.delete_or_404(reservation_id)
     await delete_cached("reservations:list")
 
 
@@ -171,5 +162,6 @@ reservation_api_router = Router(
         delete_reservation,
     ],
     guards=[bearer_token_guard],
+    middleware=[API_RATE_LIMIT],
     security=[{"BearerAuth": []}],
 )
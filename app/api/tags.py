@@ -1,60 +1,51 @@
 from uuid import UUID
 
+import msgspec
 from litestar import Router, delete, get, post, put
-from litestar.exceptions import NotFoundException
 from litestar.status_codes import HTTP_201_CREATED, HTTP_204_NO_CONTENT
 
 from app.auth import bearer_token_guard
+from app.ratelimit import API_RATE_LIMIT
+from app.repository import tag_repo
+from app.tags import get_all_tags, invalidate_tags
 from models import Tag
 from models import TagTable as T
 
 
-async def _get_or_404(tag_id: UUID) -> dict:
-    """部署を取得、存在しなければ404エラー"""
-    if not await T.exists().where(T.id == tag_id):
-        raise NotFoundException(detail=f"Tag with ID {tag_id} not found")
-    return await T.select().where(T.id == tag_id).first()
-
-
-def _to_tag(data: dict) -> Tag:
-    """辞書からTagオブジェクトに変換"""
-    return Tag(id=data["id"], name=data["name"])
-
-
 @post("/tags", status_code=HTTP_201_CREATED)
 async def create_tag(data: Tag) -> Tag:
     await T(id=data.id, name=data.name).save()
+    await invalidate_tags()
     return data
 
 
 @get("/tags")
 async def list_tags() -> list[Tag]:
-    result = [_to_tag(t) for t in await T.select()]
-    return result
+    return await get_all_tags()
 
 
 @get("/tags/{tag_id:uuid}")
 async def get_tag(tag_id: UUID) -> Tag:
-    return _to_tag(await _get_or_404(tag_id))
+    return await tag_repo.get_model_or_404(tag_id)
 
 
 @put("/tags/{tag_id:uuid}")
 async def update_tag(tag_id: UUID, data: Tag) -> Tag:
-    await _get_or_404(tag_id)
-    await T.update({T.name: data.name}).where(T.id == tag_id)
-    data.id = tag_id
-    return data
+    await tag_repo.update_or_404(tag_id, {T.name: data.name})
+    await invalidate_tags()
+    return msgspec.structs.replace(data, id=tag_id)
 
 
 @delete("/tags/{tag_id:uuid}", status_code=HTTP_204_NO_CONTENT)
 async def delete_tag(tag_id: UUID) -> None:
-    await _get_or_404(tag_id)
-    await T.delete().where(T.id == tag_id)
+    await tag_repo.delete_or_404(tag_id)
+    await invalidate_tags()
 
 
 tag_api_router = Router(
     path="",
     route_handlers=[create_tag, list_tags, get_tag, update_tag, delete_tag],
     guards=[bearer_token_guard],
+    middleware=[API_RATE_LIMIT],
     security=[{"BearerAuth": []}],
 )
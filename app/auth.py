@@ -1,15 +1,16 @@
 import os
+import secrets
 
-from cachetools import TTLCache
 from litestar.connection import ASGIConnection
 from litestar.exceptions import NotAuthorizedException, PermissionDeniedException
 from litestar.handlers.base import BaseRouteHandler
 
-from app.cache import get_cached, redis
+from app.sessions import load_session
 from models import Role
 
 API_TOKEN = os.getenv("API_TOKEN", "")
-session_cache = TTLCache(maxsize=10000, ttl=60)
+# /metrics のスクレイプ用 (未設定ならAPI_TOKEN)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
 
 
 async def bearer_token_guard(connection: ASGIConnection, _: BaseRouteHandler) -> None:
@@ -21,6 +22,16 @@ async def bearer_token_guard(connection: ASGIConnection, _: BaseRouteHandler) ->
         raise NotAuthorizedException(detail="Invalid token")
 
 
+async def metrics_token_guard(connection: ASGIConnection, _: BaseRouteHandler) -> None:
+    """Bearer Token認証ガード(/metrics用)"""
+    auth_header = connection.headers.get("Authorization", "")
+    if not auth_header.startswith("Bearer "):
+        raise NotAuthorizedException(detail="Missing or invalid Authorization header")
+    token = METRICS_TOKEN or API_TOKEN
+    if not secrets.compare_digest(auth_header[7:].encode(), token.encode()):
+        raise NotAuthorizedException(detail="Invalid token")
+
+
 class SessionExpiredException(PermissionDeniedException):
     """セッション切れ例外"""
 
@@ -28,16 +39,11 @@ class SessionExpiredException(PermissionDeniedException):
 
 
 async def session_auth_guard(connection: ASGIConnection, _: BaseRouteHandler) -> None:
-    """セッション認証ガード(Web UI用) - 二段キャッシュ"""
+    """セッション認証ガード(Web UI用)"""
     if not (session_id := connection.cookies.get("session_id")):
         raise SessionExpiredException(detail="ログインが必要です")
-
-    # メモリキャッシュ→Redis の順でチェック
-    if not (session_data := session_cache.get(session_id)):
-        if not (session_data := await get_cached(f"session:{session_id}")):
-            raise SessionExpiredException(detail="セッションが無効です")
-        session_cache[session_id] = session_data
-        await redis.expire(f"session:{session_id}", 86400)
+    if not (session_data := await load_session(session_id)):
+        raise SessionExpiredException(detail="セッションが無効です")
 
     connection.state.user_id = session_data["user_id"]
     connection.state.email = session_data["email"]
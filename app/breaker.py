@@ -0,0 +1,129 @@
+"""サーキットブレーカー
+
+連続して failure_threshold 回失敗 (接続エラー・call_timeout 超過) すると open になり、
+以降の呼び出しは待たずに CircuitBreakerError になる。reset_timeout 秒後に half_open へ
+移り、1件だけ試しに通して成功すれば closed に戻る。
+open の間に失敗した書き込みは defer() で溜めておき、closed に戻ったら順に再実行する。
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+
+from app.metrics import inc, set_gauge
+
+logger = logging.getLogger(__name__)
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+# circuit_breaker_state ゲージの値
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreakerError(Exception):
+    """回路が開いている、または呼び出しが失敗・タイムアウトした"""
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 10.0,
+        call_timeout: float = 0.5,
+        errors: tuple[type[BaseException], ...] = (OSError, TimeoutError),
+        queue_size: int = 1000,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.call_timeout = call_timeout
+        self.errors = errors
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._deferred: deque[tuple[Callable[..., Awaitable], tuple]] = deque(
+            maxlen=queue_size
+        )
+        self._drain_task: asyncio.Task | None = None
+        self._set_state(CLOSED)
+
+    @property
+    def available(self) -> bool:
+        """呼び出しを試せる状態か (open中でも再試行時刻を過ぎていればTrue)"""
+        return self.state != OPEN or self._retry_due()
+
+    def _retry_due(self) -> bool:
+        return time.monotonic() - self.opened_at >= self.reset_timeout
+
+    def _set_state(self, state: str) -> None:
+        if getattr(self, "state", None) not in (None, state):
+            logger.warning(
+                "サーキットブレーカー %s: %s → %s", self.name, self.state, state
+            )
+        self.state = state
+        set_gauge("circuit_breaker_state", STATE_VALUES[state], breaker=self.name)
+
+    def _acquire(self) -> bool:
+        if self.state == OPEN and self._retry_due():
+            self._set_state(HALF_OPEN)
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def _record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state(OPEN)
+
+    def _record_success(self) -> None:
+        self.failures = 0
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+        if self._deferred and self._drain_task is None:
+            self._drain_task = asyncio.create_task(self._drain())
+
+    async def call(self, func: Callable[..., Awaitable], *args, **kwargs):
+        if not self._acquire():
+            inc("circuit_breaker_rejected_total", breaker=self.name)
+            raise CircuitBreakerError(f"{self.name}: open")
+        probing = self.state == HALF_OPEN
+        try:
+            result = await asyncio.wait_for(func(*args, **kwargs), self.call_timeout)
+        except self.errors as e:
+            self._record_failure()
+            raise CircuitBreakerError(f"{self.name}: {e!r}") from e
+        finally:
+            if probing:
+                self._probing = False
+        self._record_success()
+        return result
+
+    def defer(self, func: Callable[..., Awaitable], *args) -> None:
+        """復旧後に再実行する (キューが一杯なら古いものから捨てる)"""
+        if len(self._deferred) == self._deferred.maxlen:
+            inc("circuit_breaker_dropped_total", breaker=self.name)
+        self._deferred.append((func, args))
+        set_gauge("circuit_breaker_deferred", len(self._deferred), breaker=self.name)
+
+    async def _drain(self) -> None:
+        try:
+            while self._deferred and self.state == CLOSED:
+                func, args = self._deferred.popleft()
+                try:
+                    await self.call(func, *args)
+                except CircuitBreakerError:
+                    self._deferred.appendleft((func, args))
+                    break
+                except Exception:
+                    logger.exception("%s: 保留していた処理に失敗しました", self.name)
+        finally:
+            self._drain_task = None
+            set_gauge(
+                "circuit_breaker_deferred", len(self._deferred), breaker=self.name
+            )
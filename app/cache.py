@@ -1,21 +1,341 @@
+"""Redisキャッシュ
+
+呼び出しはすべて redis_breaker を通す。Redisが止まっている・遅いときは待たずに
+読み込みはキャッシュなし扱い (DBへ)、キャッシュの保存は省略し、無効化・ランキング
+更新・Pub/Sub配信は復旧後に再実行する。
+
+リクエスト中は CacheBatchMiddleware が CacheBatcher を用意し、同じイベントループの
+周回で発行されたGET (asyncio.gather で並べた読み込みなど) を1回のMGETにまとめる。
+"""
+
+import asyncio
+import hashlib
 import json
+import time
+from collections.abc import AsyncIterator, Callable, Iterable, Mapping
+from contextlib import asynccontextmanager, suppress
+from contextvars import ContextVar
+from functools import cache
+from uuid import uuid4
+
+import msgspec
+from litestar.middleware import MiddlewareProtocol
+from litestar.types import ASGIApp, Receive, Scope, Send
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import NoScriptError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from app.breaker import CircuitBreaker, CircuitBreakerError
+from app.config import (
+    REDIS_BREAKER_FAILURES,
+    REDIS_BREAKER_RESET_SECONDS,
+    REDIS_CALL_TIMEOUT,
+    REDIS_CLUSTER,
+)
+from app.metrics import inc, key_prefix
+from app.redis_client import redis
+
+redis_breaker = CircuitBreaker(
+    "redis",
+    failure_threshold=REDIS_BREAKER_FAILURES,
+    reset_timeout=REDIS_BREAKER_RESET_SECONDS,
+    call_timeout=REDIS_CALL_TIMEOUT,
+    errors=(RedisConnectionError, RedisTimeoutError, OSError, TimeoutError),
+)
+
+
+def _command(method: str, *args, **kwargs):
+    return getattr(redis, method)(*args, **kwargs)
+
+
+async def _call(method: str, *args, **kwargs):
+    return await redis_breaker.call(_command, method, *args, **kwargs)
+
+
+async def _call_or_defer(method: str, *args) -> None:
+    """失敗したら復旧後に再実行"""
+    try:
+        await _call(method, *args)
+    except CircuitBreakerError:
+        redis_breaker.defer(_command, method, *args)
+
+
+# Clusterではスロットをまたぐキーを MGET できないためノードごとに分けて取得
+_MGET = "mget_nonatomic" if REDIS_CLUSTER else "mget"
+
+
+class CacheBatcher:
+    """同じ周回で発行されたGETを1回のMGETにまとめる (同じキーは1回だけ取得)"""
+
+    def __init__(self) -> None:
+        self._pending: dict[str, asyncio.Future] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def load(self, key: str) -> asyncio.Future:
+        if (future := self._pending.get(key)) is None:
+            loop = asyncio.get_running_loop()
+            if not self._pending:
+                loop.call_soon(self._flush)
+            future = self._pending[key] = loop.create_future()
+        return future
+
+    def _flush(self) -> None:
+        pending, self._pending = self._pending, {}
+        task = asyncio.ensure_future(self._fetch(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
 
-from redis.asyncio import Redis
+    async def _fetch(self, pending: dict[str, asyncio.Future]) -> None:
+        try:
+            if len(pending) == 1:
+                values = [await _call("get", *pending)]
+            else:
+                values = await _call(_MGET, *pending)
+        except Exception as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, value in zip(pending.values(), values):
+            if not future.done():
+                future.set_result(value)
+        for future in pending.values():
+            if not future.done():
+                future.set_result(None)
 
-from app.config import REDIS_URL
 
-redis = Redis.from_url(REDIS_URL, decode_responses=True)
+_batcher: ContextVar[CacheBatcher | None] = ContextVar("cache_batcher", default=None)
 
 
-async def get_cached(key: str):
-    if data := await redis.get(key):
+class CacheBatchMiddleware(MiddlewareProtocol):
+    """リクエストごとに CacheBatcher を用意"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        token = _batcher.set(CacheBatcher())
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _batcher.reset(token)
+
+
+async def _get(key: str):
+    if (batcher := _batcher.get()) is not None:
+        return await batcher.load(key)
+    return await _call("get", key)
+
+
+# モデル (msgspec.Struct) はdictを経由せずにJSONへ、未対応の型は文字列に
+_encode = msgspec.json.Encoder(enc_hook=str).encode
+
+
+def _decode(key: str, data: str | None, type=None):
+    if data:
+        inc("cache_requests_total", prefix=key_prefix(key), result="hit")
+        if type is not None:
+            return msgspec.json.decode(data, type=type)
         return json.loads(data)
+    inc("cache_requests_total", prefix=key_prefix(key), result="miss")
+
+
+async def fetch_cached(key: str, type=None):
+    """get_cached と同じだが、Redisが使えなければ CircuitBreakerError"""
+    return _decode(key, await _get(key), type)
+
+
+async def get_cached(key: str, type=None):
+    """キャッシュの値 (無ければNone)
+
+    type を指定するとJSONから直接その型 (list[PC] など) に変換する。
+    """
+    try:
+        return await fetch_cached(key, type)
+    except CircuitBreakerError:
+        inc("cache_requests_total", prefix=key_prefix(key), result="unavailable")
 
 
 async def set_cached(key: str, value, ttl: int = 300):
-    await redis.setex(key, ttl, json.dumps(value, default=str))
+    try:
+        await _call("setex", key, ttl, _encode(value))
+    except CircuitBreakerError:
+        return
+    inc("cache_requests_total", prefix=key_prefix(key), result="set")
 
 
 async def delete_cached(*keys: str):
-    if keys:
-        await redis.delete(*keys)
+    await delete_many(keys)
+
+
+async def get_many(keys: Iterable[str]) -> dict:
+    """複数キーを1往復 (MGET) で取得。無いキー・Redis停止中の値はNone"""
+    if not (keys := list(dict.fromkeys(keys))):
+        return {}
+    try:
+        values = await _call(_MGET, *keys)
+    except CircuitBreakerError:
+        for key in keys:
+            inc("cache_requests_total", prefix=key_prefix(key), result="unavailable")
+        return dict.fromkeys(keys)
+    return {key: _decode(key, data) for key, data in zip(keys, values)}
+
+
+async def _setex_many(items: list[tuple[str, bytes]], ttl: int) -> None:
+    async with redis.pipeline(transaction=False) as pipe:
+        for key, data in items:
+            pipe.setex(key, ttl, data)
+        await pipe.execute()
+
+
+async def set_many(values: Mapping[str, object], ttl: int = 300):
+    """複数キーを1往復 (パイプライン) で保存"""
+    if not values:
+        return
+    items = [(key, _encode(value)) for key, value in values.items()]
+    try:
+        await redis_breaker.call(_setex_many, items, ttl)
+    except CircuitBreakerError:
+        return
+    for key in values:
+        inc("cache_requests_total", prefix=key_prefix(key), result="set")
+
+
+# 削除したキーを受け取るコールバック (app.warmup が再作成に使う)
+invalidation_hooks: list[Callable[[list[str]], None]] = []
+
+
+async def delete_many(keys: Iterable[str]):
+    """複数キーを1回のDELで削除 (Redis停止中は復旧後に削除)"""
+    if keys := list(dict.fromkeys(keys)):
+        await _call_or_defer("delete", *keys)
+        for hook in invalidation_hooks:
+            hook(keys)
+
+
+def ranking_built_key(key: str) -> str:
+    """ソート済みセットをDBから作り直したことを示す印のキー"""
+    return f"{key}:built"
+
+
+# KEYS[1]: ソート済みセット, KEYS[2]: 作り直した印 / ARGV[1]: 件数
+_RANKING_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    return false
+end
+return redis.call('ZREVRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1, 'WITHSCORES')
+"""
+
+# KEYS は同上 / ARGV: 印のTTL, メンバー1, スコア1, メンバー2, ...
+_REPLACE_RANKING_SCRIPT = """
+redis.call('DEL', KEYS[1])
+for i = 2, #ARGV, 2 do
+    redis.call('ZADD', KEYS[1], ARGV[i + 1], ARGV[i])
+end
+redis.call('SET', KEYS[2], 1, 'EX', ARGV[1])
+return 1
+"""
+
+
+async def get_ranking(key: str, limit: int) -> list[tuple[str, float]] | None:
+    """ソート済みセットから上位limit件を取得
+
+    replace_ranking で作り直した印が無い (期限切れ・削除) か、Redisが使えなければNone。
+    印がある間はセットの件数がlimit未満でも全件が入っている。
+    """
+    try:
+        flat = await run_script(_RANKING_SCRIPT, [key, ranking_built_key(key)], [limit])
+    except CircuitBreakerError:
+        return None
+    if flat is None:
+        return None
+    return [(member, float(score)) for member, score in zip(flat[::2], flat[1::2])]
+
+
+async def replace_ranking(key: str, scores: dict[str, float], ttl: int):
+    """ソート済みセットを丸ごと置き換え、ttl秒有効な印を付ける (1往復)"""
+    args = [ttl, *(v for item in scores.items() for v in item)]
+    with suppress(CircuitBreakerError):
+        await run_script(_REPLACE_RANKING_SCRIPT, [key, ranking_built_key(key)], args)
+
+
+async def set_ranking(key: str, scores: dict[str, float]):
+    if scores:
+        await _call_or_defer("zadd", key, scores)
+
+
+async def delete_ranking(key: str, *members: str):
+    if members:
+        await _call_or_defer("zrem", key, *members)
+
+
+async def get_version(key: str) -> int | None:
+    """無効化用のバージョン番号を取得 (未設定は0、Redisが使えなければNone)"""
+    try:
+        return int(await _get(key) or 0)
+    except CircuitBreakerError:
+        return None
+
+
+async def bump_version(key: str):
+    """バージョン番号を進めて、それを含むキャッシュを無効化"""
+    await _call_or_defer("incr", key)
+
+
+async def publish(channel: str, message: str):
+    """Pub/Sub配信 (Redisが使えなければ復旧後に配信)"""
+    await _call_or_defer("publish", channel, message)
+
+
+@cache
+def _script_sha(script: str) -> str:
+    return hashlib.sha1(script.encode()).hexdigest()
+
+
+async def _eval(script: str, keys: list[str], args: list):
+    try:
+        return await redis.evalsha(_script_sha(script), len(keys), *keys, *args)
+    except NoScriptError:
+        return await redis.eval(script, len(keys), *keys, *args)
+
+
+async def run_script(script: str, keys: list[str], args: list):
+    """Luaスクリプトを1往復で実行 (EVALSHA、未登録ならEVALで登録を兼ねる)
+
+    Redisが使えなければ CircuitBreakerError。
+    """
+    return await redis_breaker.call(_eval, script, keys, args)
+
+
+_UNLOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+@asynccontextmanager
+async def redis_lock(
+    name: str, ttl: float, wait: float = 0, release: bool = True
+) -> AsyncIterator[bool]:
+    """ワーカー間の排他ロック (取得できたかを返す)。wait秒まで取得を待つ
+
+    release=False ならブロックを抜けても解放せずTTLまで保持する。
+    Redisが使えなければ CircuitBreakerError。
+    """
+    key, token = f"lock:{name}", uuid4().hex
+    deadline = time.monotonic() + wait
+    while not (
+        acquired := bool(await _call("set", key, token, nx=True, px=int(ttl * 1000)))
+    ):
+        if time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(0.1)
+    try:
+        yield acquired
+    finally:
+        if acquired and release:
+            # 解放できなくてもTTLで消える
+            with suppress(CircuitBreakerError):
+                await run_script(_UNLOCK_SCRIPT, [key], [token])
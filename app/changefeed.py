@@ -0,0 +1,181 @@
+"""PostgreSQLの変更通知 (LISTEN table_changes) によるキャッシュ無効化
+
+init_data/pg/11_change_notify.sql のトリガーが文ごとに {table, op, txid} を通知する。
+各ワーカーは専用のasyncpg接続で受信し、DEBOUNCE 秒分をまとめて
+- 対応するキャッシュを削除 (登録済みのキーは app.warmup が作り直す)、参照データを無効化
+- subscribe_changes() の購読者へ変更されたテーブル名を配信
+- 開いている画面 (app.live) へ更新を配信
+キャッシュの無効化は同じトランザクション・テーブルにつき1ワーカーだけが行う。
+"""
+
+import asyncio
+import json
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import asyncpg
+
+from app.alerts import DIGEST_KEY
+from app.breaker import CircuitBreakerError
+from app.cache import _call, delete_cached, ranking_built_key
+from app.config import CHANGEFEED_ENABLED, DATABASE_URL
+from app.likes import TOP_LIKED_KEY
+from app.live import publish_update, topics_for
+from app.refdata import invalidate_refdata
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "table_changes"
+DEBOUNCE = 0.2
+# 同じ通知を複数ワーカーで処理しないための印 (秒)
+DEDUPE_TTL = 60
+RECONNECT_DELAY = 5
+
+# テーブル → 削除するキャッシュキー
+TABLE_CACHE_KEYS = {
+    "departments": ["departments:list", "dashboard:stats"],
+    # 社員削除のCASCADEでいいねも消えるためランキングを作り直す
+    "employees": [
+        "employees:list",
+        "dashboard:stats",
+        DIGEST_KEY,
+        ranking_built_key(TOP_LIKED_KEY),
+    ],
+    "pcs": ["pcs:list", "history:all", "dashboard:stats", DIGEST_KEY],
+    "pc_assignment_histories": ["history:all"],
+    "meeting_rooms": ["meeting_rooms:list"],
+    "meeting_room_reservations": ["reservations:list"],
+    "blog_posts": ["blogs:list", "dashboard:stats"],
+    "blog_likes": ["dashboard:stats"],
+    "tags": ["blogs:list"],
+}
+# 参照データ (app.refdata) のスナップショットに含まれるテーブル
+REFDATA_TABLES = {"departments", "employees", "meeting_rooms", "tags"}
+
+# 未処理の通知: (テーブル, txid)
+_pending: set[tuple[str, int | None]] = set()
+_flush_handle: asyncio.TimerHandle | None = None
+_subscribers: set[asyncio.Queue] = set()
+_task: asyncio.Task | None = None
+
+
+@asynccontextmanager
+async def subscribe_changes(maxsize: int = 100) -> AsyncIterator[asyncio.Queue]:
+    """変更されたテーブル名の集合を受け取るキュー (溢れた分は捨てる)"""
+    queue: asyncio.Queue[set[str]] = asyncio.Queue(maxsize)
+    _subscribers.add(queue)
+    try:
+        yield queue
+    finally:
+        _subscribers.discard(queue)
+
+
+def _publish(tables: set[str]) -> None:
+    for queue in _subscribers:
+        try:
+            queue.put_nowait(tables)
+        except asyncio.QueueFull:
+            pass
+
+
+async def _claim(table: str, txid: int | None) -> bool:
+    """このワーカーが無効化を担当するか"""
+    if txid is None:
+        return True
+    try:
+        key = f"changefeed:{txid}:{table}"
+        return bool(await _call("set", key, 1, nx=True, ex=DEDUPE_TTL))
+    except CircuitBreakerError:
+        # 削除は復旧後に実行されるため重複しても問題ない
+        return True
+
+
+async def apply_changes(changes: set[tuple[str, int | None]]) -> set[str]:
+    """通知をまとめて反映し、変更されたテーブル名を返す"""
+    tables = {table for table, _ in changes}
+    claimed = [
+        table
+        for (table, txid), ok in zip(
+            changes, await asyncio.gather(*(_claim(t, x) for t, x in changes))
+        )
+        if ok
+    ]
+    keys = [key for table in claimed for key in TABLE_CACHE_KEYS.get(table, [])]
+    await delete_cached(*dict.fromkeys(keys))
+    if REFDATA_TABLES.intersection(claimed):
+        await invalidate_refdata()
+    _publish(tables)
+    # 開いている画面の更新は担当したワーカーから1回だけ配信 (失敗しても無効化は済んでいる)
+    try:
+        await publish_update(topics_for(claimed))
+    except Exception:
+        logger.exception("ライブ更新の配信に失敗しました")
+    return tables
+
+
+def _flush() -> None:
+    global _flush_handle
+    _flush_handle = None
+    changes = set(_pending)
+    _pending.clear()
+    asyncio.ensure_future(_apply(changes))
+
+
+async def _apply(changes: set[tuple[str, int | None]]) -> None:
+    try:
+        await apply_changes(changes)
+    except Exception:
+        logger.exception("変更通知の反映に失敗しました")
+
+
+def _on_notify(connection, pid: int, channel: str, payload: str) -> None:
+    global _flush_handle
+    try:
+        change = json.loads(payload)
+    except ValueError:
+        logger.warning("不正な変更通知: %s", payload)
+        return
+    _pending.add((change["table"], change.get("txid")))
+    if _flush_handle is None:
+        _flush_handle = asyncio.get_running_loop().call_later(DEBOUNCE, _flush)
+
+
+async def _listen() -> None:
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(DATABASE_URL)
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            await connection.add_listener(CHANNEL, _on_notify)
+            # 切断中の変更は分からないため、接続のたびに全キャッシュを無効化
+            await apply_changes({(table, None) for table in TABLE_CACHE_KEYS})
+            await closed.wait()
+            logger.warning("変更通知の接続が切断されました")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("変更通知の接続に失敗しました")
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        await asyncio.sleep(RECONNECT_DELAY)
+
+
+async def start_changefeed() -> None:
+    global _task
+    if CHANGEFEED_ENABLED and _task is None:
+        _task = asyncio.create_task(_listen())
+
+
+async def stop_changefeed() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
@@ -2,7 +2,7 @@ import os
 
 from piccolo.engine.postgres import PostgresEngine
 
-from app.config import DATABASE_URL
+from app.config import DATABASE_URL, DB_POOL_MAX_SIZE, DB_POOL_MIN_SIZE
 
 # Piccolo用のデータベースエンジン設定
 # テスト環境ではPostgreSQL接続をスキップ
@@ -10,3 +10,16 @@ if os.getenv("TESTING"):
     DB = None  # type: ignore
 else:
     DB = PostgresEngine(config={"dsn": DATABASE_URL})
+
+
+async def open_db() -> None:
+    """接続プールを開始 (クエリごとの接続を避け、プリペアドステートメントを再利用する)"""
+    if DB is not None:
+        await DB.start_connection_pool(
+            min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE
+        )
+
+
+async def close_db() -> None:
+    if DB is not None and DB.pool is not None:
+        await DB.close_connection_pool()
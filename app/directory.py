@@ -0,0 +1,22 @@
+from collections.abc import Mapping
+from uuid import UUID
+
+from app.refdata import get_refdata, invalidate_refdata
+from models import Employee
+
+
+async def get_directory() -> Mapping[UUID, Employee]:
+    """社員ID→社員 (名前順、画像・日付を含まない射影)"""
+    return (await get_refdata()).employees
+
+
+async def get_employee_name(employee_id: UUID | None, default: str = "不明") -> str:
+    """社員名 (存在しなければdefault)"""
+    if employee_id and (emp := (await get_directory()).get(employee_id)):
+        return emp.name
+    return default
+
+
+async def invalidate_directory() -> None:
+    """社員の作成・変更・削除後に全ワーカーのディレクトリを無効化"""
+    await invalidate_refdata()
@@ -0,0 +1,92 @@
+from datetime import datetime
+from uuid import UUID, uuid4
+
+from app.cache import (
+    delete_cached,
+    delete_ranking,
+    get_ranking,
+    ranking_built_key,
+    replace_ranking,
+    set_ranking,
+)
+from models import BlogLikeTable as BLT
+from models import BlogPostTable as B
+
+TOP_LIKED_KEY = "blogs:top_liked"
+# 取りこぼした更新 (社員削除のCASCADE等) を反映するための再構築間隔 (秒)
+RANKING_REBUILD_SECONDS = 600
+
+# 投稿が存在すれば重複を無視して登録する。いいね数はトリガー
+# (init_data/pg/12_blog_like_count_trigger.sql) が加減算するため、
+# 文の開始時点のいいね数と増減した件数を返す (投稿が無ければ0行)
+_ADD_LIKE_SQL = """
+WITH inserted AS (
+    INSERT INTO blog_likes (id, blog_post_id, employee_id, created_at)
+    SELECT {}, id, {}, {} FROM blog_posts WHERE id = {}
+    ON CONFLICT (blog_post_id, employee_id) DO NOTHING
+    RETURNING blog_post_id
+)
+SELECT like_count, (SELECT COUNT(*) FROM inserted) AS changed
+FROM blog_posts WHERE id = {}
+"""
+
+_REMOVE_LIKE_SQL = """
+WITH deleted AS (
+    DELETE FROM blog_likes WHERE blog_post_id = {} AND employee_id = {}
+    RETURNING blog_post_id
+)
+SELECT like_count, -(SELECT COUNT(*) FROM deleted) AS changed
+FROM blog_posts WHERE id = {}
+"""
+
+
+async def _apply_like(rows: list[dict], blog_post_id: UUID) -> tuple[bool, int | None]:
+    if not rows:
+        return False, None
+    row = rows[0]
+    like_count = row["like_count"] + row["changed"]
+    if not row["changed"]:
+        return False, like_count
+    await set_ranking(TOP_LIKED_KEY, {str(blog_post_id): like_count})
+    return True, like_count
+
+
+async def add_like(blog_post_id: UUID, employee_id: UUID) -> tuple[bool, int | None]:
+    """いいね追加 → (追加したか, いいね数)。投稿が無ければいいね数はNone"""
+    rows = await BLT.raw(
+        _ADD_LIKE_SQL,
+        uuid4(),
+        employee_id,
+        datetime.now(),
+        blog_post_id,
+        blog_post_id,
+    )
+    return await _apply_like(rows, blog_post_id)
+
+
+async def remove_like(blog_post_id: UUID, employee_id: UUID) -> tuple[bool, int | None]:
+    """いいね削除 → (削除したか, いいね数)。投稿が無ければいいね数はNone"""
+    rows = await BLT.raw(_REMOVE_LIKE_SQL, blog_post_id, employee_id, blog_post_id)
+    return await _apply_like(rows, blog_post_id)
+
+
+async def forget_post(blog_post_id: UUID) -> None:
+    """削除された投稿をランキングから外す"""
+    await delete_ranking(TOP_LIKED_KEY, str(blog_post_id))
+
+
+async def invalidate_top_liked() -> None:
+    """次の取得でランキングをDBから作り直す (いいねがまとめて消えた場合など)"""
+    await delete_cached(ranking_built_key(TOP_LIKED_KEY))
+
+
+async def get_top_liked(limit: int = 5) -> list[tuple[UUID, int]]:
+    """いいね数ランキング上位 (DBから作り直した印が無ければ再構築)"""
+    if (ranking := await get_ranking(TOP_LIKED_KEY, limit)) is None:
+        scores = {
+            str(b["id"]): b["like_count"]
+            for b in await B.select(B.id, B.like_count).where(B.like_count > 0)
+        }
+        await replace_ranking(TOP_LIKED_KEY, scores, RANKING_REBUILD_SECONDS)
+        ranking = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:limit]
+    return [(UUID(bid), int(score)) for bid, score in ranking if score > 0]
@@ -0,0 +1,147 @@
+"""画面のライブ更新 (Server-Sent Events)
+
+更新はRedisの LIVE_CHANNEL に {"topics": [...]} として配信する
+(変更通知 app.changefeed で無効化を担当したワーカーから1回)。
+各ワーカーは1つの購読を共有して接続中のクライアントへ振り分け、
+クライアントごとに PUSH_INTERVAL 秒に1回まで、その間の更新をまとめて送る。
+送る内容は更新ごと・キーごとにワーカー内で1回だけ作る。
+"""
+
+import asyncio
+import json
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+
+from litestar.response import ServerSentEventMessage
+
+from app.cache import publish
+from app.config import LIVE_UPDATES_ENABLED
+from app.redis_client import get_pubsub
+
+logger = logging.getLogger(__name__)
+
+LIVE_CHANNEL = "live:updates"
+PUSH_INTERVAL = 1.0
+# プロキシに切断されないための空コメントの間隔 (秒)
+KEEPALIVE_SECONDS = 15
+
+# 変更されたテーブル → 更新する画面
+TABLE_TOPICS = {
+    "departments": {"dashboard"},
+    "employees": {"dashboard", "pcs"},
+    "pcs": {"dashboard", "pcs"},
+    "blog_posts": {"dashboard"},
+    "blog_likes": {"dashboard"},
+}
+
+
+class _Client:
+    def __init__(self, topic: str):
+        self.topic = topic
+        self.updated = asyncio.Event()
+
+
+_clients: set[_Client] = set()
+# 受信した更新の通し番号 (送る内容の作り直しの判定に使う)
+_generation = 0
+_snapshots: dict[str, tuple[int, asyncio.Future]] = {}
+_task: asyncio.Task | None = None
+
+
+def topics_for(tables: Iterable[str]) -> set[str]:
+    return set().union(*(TABLE_TOPICS.get(table, set()) for table in tables))
+
+
+async def publish_update(topics: Iterable[str]) -> None:
+    """全ワーカーの接続中の画面へ更新を知らせる"""
+    if topics := sorted(topics):
+        await publish(LIVE_CHANNEL, json.dumps({"topics": topics}))
+
+
+def dispatch(topics: Iterable[str]) -> None:
+    """受信した更新を該当する画面のクライアントへ振り分け"""
+    global _generation
+    topics = set(topics)
+    _generation += 1
+    _snapshots.clear()
+    for client in _clients:
+        if client.topic in topics:
+            client.updated.set()
+
+
+async def _snapshot(key: str, build: Callable[[], Awaitable[dict]]) -> dict:
+    # 同じ更新に対する同じキーは、接続数によらず1回だけ作る
+    entry = _snapshots.get(key)
+    if entry is None or entry[0] != _generation:
+        entry = (_generation, asyncio.ensure_future(build()))
+        _snapshots[key] = entry
+    return await asyncio.shield(entry[1])
+
+
+async def live_events(
+    topic: str, build: Callable[[], Awaitable[dict]], key: str | None = None
+) -> AsyncIterator[ServerSentEventMessage]:
+    """topicの更新ごとに build() の結果を送るSSEのイベント列
+
+    key は build() の結果を共有する単位 (ページ番号などで変わる場合に指定)。
+    """
+    loop = asyncio.get_running_loop()
+    client = _Client(topic)
+    _clients.add(client)
+    last_push = 0.0
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(client.updated.wait(), KEEPALIVE_SECONDS)
+            except TimeoutError:
+                yield ServerSentEventMessage(comment="keepalive")
+                continue
+            # 前回の送信から PUSH_INTERVAL 秒経つまでの更新は1回にまとめる
+            await asyncio.sleep(max(0.0, last_push + PUSH_INTERVAL - loop.time()))
+            client.updated.clear()
+            try:
+                data = await _snapshot(key or topic, build)
+            except Exception:
+                logger.exception("%s のライブ更新の作成に失敗しました", topic)
+                continue
+            last_push = loop.time()
+            yield ServerSentEventMessage(
+                event=topic, data=json.dumps(data, default=str, ensure_ascii=False)
+            )
+    finally:
+        _clients.discard(client)
+
+
+async def _listen() -> None:
+    while True:
+        pubsub = await get_pubsub()
+        try:
+            await pubsub.subscribe(LIVE_CHANNEL)
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    dispatch(json.loads(message["data"])["topics"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("ライブ更新の購読が切断されました")
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+
+
+async def start_live() -> None:
+    global _task
+    if LIVE_UPDATES_ENABLED and _task is None:
+        _task = asyncio.create_task(_listen())
+
+
+async def stop_live() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
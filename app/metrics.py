@@ -0,0 +1,270 @@
+"""Prometheus形式のメトリクス
+
+各ワーカーはプロセス内の辞書に加算し (イベントループ内で完結するためロック不要)、
+FLUSH_INTERVAL 秒ごとに差分をRedisへまとめて書き込む。/metrics は全ワーカー分を
+Redisから読み出して合算する。Redisに届かないときはこのワーカー分だけを返す。
+- カウンタ・ヒストグラム: metrics:counters (HINCRBYFLOAT で全ワーカー累積)
+- ゲージ: metrics:gauges:<ワーカーID> (ワーカー停止後はTTLで消える)
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from litestar.middleware import MiddlewareProtocol
+from litestar.types import ASGIApp, Message, Receive, Scope, Send
+from redis.exceptions import RedisError
+
+from app.redis_client import WORKER_ID, get_redis
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_KEY = "metrics:counters"
+GAUGES_KEY = "metrics:gauges"
+FLUSH_INTERVAL = 5
+GAUGE_TTL = FLUSH_INTERVAL * 6
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# メトリクス名 → (種別, 説明)
+METRICS = {
+    "http_request_duration_seconds": ("histogram", "ルート別のレスポンス時間"),
+    "http_responses_total": ("counter", "ルート・ステータス別のレスポンス数"),
+    "cache_requests_total": ("counter", "キープレフィックス別のキャッシュ読み書き"),
+    "session_l1_requests_total": ("counter", "セッションのメモリキャッシュ参照"),
+    "db_pool_connections": ("gauge", "DB接続プールの接続数"),
+    "chat_websocket_connections": ("gauge", "接続中のチャットWebSocket数"),
+    "chat_websocket_messages_total": ("counter", "WebSocketで配信したメッセージ数"),
+    "notification_queue_depth": ("gauge", "送信待ち・送信中の通知数"),
+    "image_processing_seconds": ("histogram", "プロフィール画像の変換時間"),
+    "circuit_breaker_state": ("gauge", "0=closed, 1=half_open, 2=open"),
+    "circuit_breaker_rejected_total": ("counter", "回路が開いていて拒否した呼び出し"),
+    "circuit_breaker_deferred": ("gauge", "復旧後に再実行する処理の数"),
+    "circuit_breaker_dropped_total": ("counter", "保留キューから溢れて捨てた処理"),
+}
+
+_counters: defaultdict[str, float] = defaultdict(float)
+# Redisへ書き込み済みの累積 (Redisに届かないときの /metrics 用)
+_flushed: defaultdict[str, float] = defaultdict(float)
+_gauges: defaultdict[str, float] = defaultdict(float)
+_task: asyncio.Task | None = None
+
+
+def _escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _series(name: str, labels: dict[str, object]) -> str:
+    if not labels:
+        return name
+    pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return f"{name}{{{pairs}}}"
+
+
+def inc(name: str, value: float = 1.0, **labels: object) -> None:
+    _counters[_series(name, labels)] += value
+
+
+def observe(name: str, seconds: float, **labels: object) -> None:
+    """ヒストグラムに1件記録 (累積バケット・合計・件数)"""
+    for le in LATENCY_BUCKETS:
+        inc(f"{name}_bucket", 1.0 if seconds <= le else 0.0, **labels, le=le)
+    inc(f"{name}_bucket", **labels, le="+Inf")
+    inc(f"{name}_sum", seconds, **labels)
+    inc(f"{name}_count", **labels)
+
+
+def add_gauge(name: str, delta: float, **labels: object) -> None:
+    _gauges[_series(name, labels)] += delta
+
+
+def set_gauge(name: str, value: float, **labels: object) -> None:
+    _gauges[_series(name, labels)] = value
+
+
+@contextmanager
+def timed(name: str, **labels: object) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+@contextmanager
+def in_flight(name: str, **labels: object) -> Iterator[None]:
+    """処理中の件数をゲージに反映"""
+    add_gauge(name, 1, **labels)
+    try:
+        yield
+    finally:
+        add_gauge(name, -1, **labels)
+
+
+def key_prefix(key: str) -> str:
+    """キャッシュキーの先頭セグメント (pcs:list → pcs)"""
+    return key.split(":", 1)[0]
+
+
+def _collect_pool() -> None:
+    from app.database import DB
+
+    if DB is not None and (pool := DB.pool) is not None:
+        set_gauge(
+            "db_pool_connections", pool.get_size() - pool.get_idle_size(), state="busy"
+        )
+        set_gauge("db_pool_connections", pool.get_idle_size(), state="idle")
+
+
+async def flush() -> None:
+    """このワーカーの差分カウンタとゲージをRedisへ書き込む"""
+    global _counters
+    _collect_pool()
+    pending, _counters = _counters, defaultdict(float)
+    gauges_key = f"{GAUGES_KEY}:{WORKER_ID}"
+    try:
+        redis = await get_redis()
+        async with redis.pipeline(transaction=False) as pipe:
+            for series, value in pending.items():
+                pipe.hincrbyfloat(COUNTERS_KEY, series, value)
+            pipe.delete(gauges_key)
+            if _gauges:
+                pipe.hset(gauges_key, mapping=dict(_gauges))
+                pipe.expire(gauges_key, GAUGE_TTL)
+            await pipe.execute()
+    except Exception:
+        # 書き込めなかった差分は次回に持ち越す
+        for series, value in pending.items():
+            _counters[series] += value
+        raise
+    for series, value in pending.items():
+        _flushed[series] += value
+
+
+def _sort_key(series: str) -> tuple[str, float]:
+    """バケットはleの数値順に並べる"""
+    head, sep, le = series.partition(',le="')
+    if not sep:
+        head, sep, le = series.partition('{le="')
+    return (head, float(le.split('"', 1)[0]) if sep else 0.0)
+
+
+async def _aggregated() -> dict[str, float]:
+    """Redis上の全ワーカー分の合算"""
+    # app.breaker・app.cache はこのモジュールを読み込むため関数内で読み込む
+    from app.breaker import CircuitBreakerError
+    from app.cache import redis_breaker
+
+    if not redis_breaker.available:
+        raise CircuitBreakerError("redis circuit is open")
+    await flush()
+    redis = await get_redis()
+    values: defaultdict[str, float] = defaultdict(float)
+    for series, value in (await redis.hgetall(COUNTERS_KEY)).items():
+        values[series] += float(value)
+    async for key in redis.scan_iter(match=f"{GAUGES_KEY}:*"):
+        for series, value in (await redis.hgetall(key)).items():
+            values[series] += float(value)
+    return values
+
+
+def _local() -> dict[str, float]:
+    """このワーカー分だけ (書き込み済みの累積 + 未書き込みの差分 + ゲージ)"""
+    _collect_pool()
+    values = defaultdict(float, _flushed)
+    for series, value in _counters.items():
+        values[series] += value
+    values.update(_gauges)
+    return values
+
+
+async def render() -> str:
+    """全ワーカー分を合算したテキスト形式 (Redisに届かなければこのワーカー分)"""
+    from app.breaker import CircuitBreakerError
+
+    try:
+        values = await _aggregated()
+        header = []
+    except (CircuitBreakerError, RedisError, OSError, TimeoutError):
+        logger.warning("メトリクスを集計できないため、このワーカー分だけを返します")
+        values = _local()
+        header = [f"# worker {WORKER_ID} only: redis unavailable"]
+
+    by_metric: defaultdict[str, list[str]] = defaultdict(list)
+    for series in sorted(values, key=_sort_key):
+        base = series.split("{", 1)[0]
+        for suffix in ("_bucket", "_sum", "_count"):
+            if base.endswith(suffix) and base.removesuffix(suffix) in METRICS:
+                base = base.removesuffix(suffix)
+        by_metric[base].append(f"{series} {values[series]:g}")
+
+    lines = header
+    for name, (kind, help_text) in METRICS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        lines += by_metric.get(name, [])
+    return "\n".join(lines) + "\n"
+
+
+async def _loop() -> None:
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        try:
+            await flush()
+        except Exception:
+            logger.exception("メトリクスの書き込みに失敗しました")
+
+
+async def start_metrics() -> None:
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_loop())
+
+
+async def stop_metrics() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
+    await (await get_redis()).delete(f"{GAUGES_KEY}:{WORKER_ID}")
+
+
+class RequestMetricsMiddleware(MiddlewareProtocol):
+    """ルート別のレスポンス時間とステータスを記録"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("path_template") or "unmatched"
+            method = scope["method"]
+            observe(
+                "http_request_duration_seconds",
+                time.perf_counter() - start,
+                method=method,
+                route=route,
+            )
+            inc("http_responses_total", method=method, route=route, status=status)
@@ -0,0 +1,111 @@
+"""月次パーティション管理コマンド
+
+uv run python -m app.partitions                  # 将来分作成 + 保持期間切れをデタッチ
+uv run python -m app.partitions --mode archive   # 保持期間切れを archive スキーマへ移動
+uv run python -m app.partitions --mode drop      # 保持期間切れを削除
+"""
+
+import argparse
+import asyncio
+import re
+from datetime import date
+
+from piccolo.querystring import QueryString
+
+from app.config import (
+    CHAT_RETENTION_MONTHS,
+    HISTORY_RETENTION_MONTHS,
+    PARTITION_MONTHS_AHEAD,
+)
+from app.database import DB
+
+# テーブル名 → 保持月数
+PARTITIONED_TABLES = {
+    "chat_messages": CHAT_RETENTION_MONTHS,
+    "pc_assignment_histories": HISTORY_RETENTION_MONTHS,
+}
+ARCHIVE_SCHEMA = "archive"
+
+_PARTITION_SUFFIX = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def add_months(d: date, months: int) -> date:
+    """月初日に丸めてmonthsヶ月加算"""
+    index = d.year * 12 + d.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def expired_partitions(names: list[str], cutoff: date) -> list[str]:
+    """cutoff月より前のパーティション名を抽出 (DEFAULTパーティションは対象外)"""
+    expired = []
+    for name in names:
+        if (m := _PARTITION_SUFFIX.search(name)) and date(
+            int(m[1]), int(m[2]), 1
+        ) < cutoff:
+            expired.append(name)
+    return sorted(expired)
+
+
+async def _fetch(sql: str, *args) -> list[dict]:
+    return await DB.run_querystring(QueryString(sql, *args))
+
+
+async def create_future_partitions(
+    months_ahead: int = PARTITION_MONTHS_AHEAD,
+) -> list[str]:
+    """当月からmonths_aheadヶ月先までのパーティションを作成"""
+    this_month = date.today().replace(day=1)
+    created = []
+    for table in PARTITIONED_TABLES:
+        for i in range(months_ahead + 1):
+            rows = await _fetch(
+                "SELECT create_monthly_partition({}, {}, {}) AS name",
+                table,
+                table,
+                add_months(this_month, i),
+            )
+            created.append(rows[0]["name"])
+    return created
+
+
+async def apply_retention(mode: str = "detach") -> list[str]:
+    """保持期間を過ぎたパーティションをデタッチ (archive/dropも可)"""
+    this_month = date.today().replace(day=1)
+    if mode == "archive":
+        await DB.run_ddl(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+
+    processed = []
+    for table, retention_months in PARTITIONED_TABLES.items():
+        rows = await _fetch(
+            "SELECT c.relname AS name FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = {}",
+            table,
+        )
+        cutoff = add_months(this_month, -retention_months)
+        for name in expired_partitions([r["name"] for r in rows], cutoff):
+            await DB.run_ddl(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+            if mode == "archive":
+                await DB.run_ddl(f'ALTER TABLE "{name}" SET SCHEMA {ARCHIVE_SCHEMA}')
+            elif mode == "drop":
+                await DB.run_ddl(f'DROP TABLE "{name}"')
+            processed.append(name)
+    return processed
+
+
+async def main(months_ahead: int, mode: str) -> None:
+    for name in await create_future_partitions(months_ahead):
+        print(f"ensured: {name}")
+    for name in await apply_retention(mode):
+        print(f"{mode}: {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="月次パーティション管理")
+    parser.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    parser.add_argument(
+        "--mode", choices=["detach", "archive", "drop"], default="detach"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.months_ahead, args.mode))
@@ -0,0 +1,188 @@
+"""リクエスト単位のクエリプロファイラ (QUERY_PROFILER=1 のときのみ有効)
+
+Piccoloエンジンとredis.asyncioをラップし、リクエストごとのクエリ数・DB時間・
+遅いクエリ上位・Redis往復回数を Server-Timing ヘッダーと構造化ログに出力する。
+SLOW_QUERY_MS を超えたクエリはパラメータを型名に置き換えてログに残す。
+"""
+
+import json
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from litestar.datastructures import MutableScopeHeaders
+from litestar.middleware import MiddlewareProtocol
+from litestar.types import ASGIApp, Message, Receive, Scope, Send
+from piccolo.engine.base import Engine
+from piccolo.engine.postgres import PostgresEngine
+from redis.asyncio.client import Pipeline, Redis
+
+from app.config import SLOW_QUERY_MS
+
+logger = logging.getLogger(__name__)
+
+# Server-Timing・ログに載せる遅いクエリの件数とSQLの最大長
+SLOWEST_LIMIT = 3
+SQL_PREVIEW_CHARS = 200
+
+
+@dataclass
+class RequestProfile:
+    queries: int = 0
+    db_ms: float = 0.0
+    redis_calls: int = 0
+    redis_ms: float = 0.0
+    slowest: list[tuple[float, str]] = field(default_factory=list)
+
+    def add_query(self, sql: str, ms: float) -> None:
+        self.queries += 1
+        self.db_ms += ms
+        if len(self.slowest) < SLOWEST_LIMIT or ms > self.slowest[-1][0]:
+            self.slowest.append((ms, sql[:SQL_PREVIEW_CHARS]))
+            self.slowest.sort(key=lambda q: q[0], reverse=True)
+            del self.slowest[SLOWEST_LIMIT:]
+
+    def add_redis(self, ms: float) -> None:
+        self.redis_calls += 1
+        self.redis_ms += ms
+
+    def server_timing(self, total_ms: float) -> str:
+        return ", ".join(
+            [
+                f'db;dur={self.db_ms:.1f};desc="{self.queries} queries"',
+                f'redis;dur={self.redis_ms:.1f};desc="{self.redis_calls} calls"',
+                f"total;dur={total_ms:.1f}",
+            ]
+        )
+
+
+_current: ContextVar[RequestProfile | None] = ContextVar(
+    "request_profile", default=None
+)
+_originals: dict = {}
+
+
+def current_profile() -> RequestProfile | None:
+    return _current.get()
+
+
+def _redact(args: list) -> list[str]:
+    """パラメータ値は出さず型名のみ"""
+    return [type(a).__name__ for a in args]
+
+
+def _wrap_engine(engine_cls: type[Engine]) -> None:
+    original = engine_cls.run_querystring
+
+    async def run_querystring(self, querystring, in_pool: bool = True):
+        start = time.perf_counter()
+        try:
+            return await original(self, querystring, in_pool=in_pool)
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            profile = _current.get()
+            slow = ms >= SLOW_QUERY_MS
+            if profile or slow:
+                sql, args = querystring.compile_string(engine_type=self.engine_type)
+            if profile:
+                profile.add_query(sql, ms)
+            if slow:
+                logger.warning(
+                    json.dumps(
+                        {
+                            "event": "slow_query",
+                            "ms": round(ms, 1),
+                            "sql": sql,
+                            "params": _redact(args),
+                        },
+                        ensure_ascii=False,
+                    )
+                )
+
+    _originals[(engine_cls, "run_querystring")] = original
+    engine_cls.run_querystring = run_querystring
+
+
+def _wrap_redis(cls: type, name: str) -> None:
+    original = getattr(cls, name)
+
+    async def call(self, *args, **kwargs):
+        if (profile := _current.get()) is None:
+            return await original(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return await original(self, *args, **kwargs)
+        finally:
+            profile.add_redis((time.perf_counter() - start) * 1000)
+
+    _originals[(cls, name)] = original
+    setattr(cls, name, call)
+
+
+def install_profiler(*engine_classes: type[Engine]) -> None:
+    """エンジンとRedisクライアントに計測用のラッパーを差し込む (1回のみ)"""
+    if _originals:
+        return
+    for engine_cls in engine_classes or (PostgresEngine,):
+        _wrap_engine(engine_cls)
+    # パイプラインはexecute1回で1往復として数える
+    _wrap_redis(Redis, "execute_command")
+    _wrap_redis(Pipeline, "execute")
+
+
+def uninstall_profiler() -> None:
+    for (cls, name), original in _originals.items():
+        setattr(cls, name, original)
+    _originals.clear()
+
+
+class QueryProfilerMiddleware(MiddlewareProtocol):
+    """リクエストごとの計測結果をServer-Timingヘッダーとログに出力"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        start = time.perf_counter()
+        status = 0
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                total_ms = (time.perf_counter() - start) * 1000
+                headers = MutableScopeHeaders.from_message(message)
+                headers.add("Server-Timing", profile.server_timing(total_ms))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            logger.info(
+                json.dumps(
+                    {
+                        "event": "request_profile",
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status,
+                        "total_ms": round((time.perf_counter() - start) * 1000, 1),
+                        "queries": profile.queries,
+                        "db_ms": round(profile.db_ms, 1),
+                        "redis_calls": profile.redis_calls,
+                        "redis_ms": round(profile.redis_ms, 1),
+                        "slowest": [
+                            {"ms": round(ms, 1), "sql": sql}
+                            for ms, sql in profile.slowest
+                        ],
+                    },
+                    ensure_ascii=False,
+                )
+            )
@@ -0,0 +1,113 @@
+"""Redisのレート制限 (GCRA、Luaスクリプトで1往復)
+
+キーごとに「次に許可される理論到着時刻 (TAT)」だけを保存する。window秒あたり
+limit回までのバーストを許し、以降は window/limit 秒ごとに1回ずつ回復する。
+拒否された試行はTATを進めないため、試行し続けても制限時間が延びることはない。
+"""
+
+import hashlib
+from dataclasses import dataclass
+
+from litestar.connection import ASGIConnection
+from litestar.exceptions import TooManyRequestsException
+from litestar.middleware import DefineMiddleware, MiddlewareProtocol
+from litestar.types import ASGIApp, Receive, Scope, Send
+
+from app.breaker import CircuitBreakerError
+from app.cache import run_script
+from app.config import RATE_LIMIT_ENABLED
+
+# KEYS[1]: TATのキー / ARGV: 1回あたりの間隔(ms), 許容バースト(ms)
+# 戻り値: {許可=1, 再試行までのms, 残り回数}
+_GCRA_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = now_parts[1] * 1000 + math.floor(now_parts[2] / 1000)
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or 0), now)
+local new_tat = tat + interval
+local allow_at = new_tat - burst
+if allow_at > now then
+    return {0, allow_at - now, 0}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+return {1, 0, math.floor((now - allow_at) / interval)}
+"""
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    retry_after: int
+    remaining: int
+
+
+async def hit(key: str, limit: int, window: int) -> RateLimitResult:
+    """keyの試行を1回記録 (window秒あたりlimit回まで、Redis停止中は制限しない)"""
+    interval = window * 1000 // limit
+    try:
+        allowed, retry_ms, remaining = await run_script(
+            _GCRA_SCRIPT, [f"rate:{key}"], [interval, interval * limit]
+        )
+    except CircuitBreakerError:
+        return RateLimitResult(True, 0, limit)
+    return RateLimitResult(bool(allowed), -(-int(retry_ms) // 1000), int(remaining))
+
+
+async def check_rate_limit(key: str, limit: int, window: int) -> None:
+    """上限を超えていれば429 (Retry-After付き)"""
+    result = await hit(key, limit, window)
+    if not result.allowed:
+        raise TooManyRequestsException(
+            detail="試行回数の上限に達しました",
+            headers={"Retry-After": str(result.retry_after)},
+        )
+
+
+def client_ip(connection: ASGIConnection) -> str:
+    return connection.client.host if connection.client else "unknown"
+
+
+def session_or_ip(connection: ASGIConnection) -> str:
+    """ログイン中はセッション単位、未ログインはIP単位"""
+    if session_id := connection.cookies.get("session_id"):
+        return "s:" + hashlib.sha1(session_id.encode()).hexdigest()[:16]
+    return client_ip(connection)
+
+
+class RateLimitMiddleware(MiddlewareProtocol):
+    """ルーター・ハンドラー単位のレート制限 (RATE_LIMIT=0 で無効)"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        name: str,
+        limit: int,
+        window: int,
+        identify=client_ip,
+    ) -> None:
+        self.app = app
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.identify = identify
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and RATE_LIMIT_ENABLED:
+            identity = self.identify(ASGIConnection(scope))
+            await check_rate_limit(f"{self.name}:{identity}", self.limit, self.window)
+        await self.app(scope, receive, send)
+
+
+def rate_limit(name: str, limit: int, window: int, identify=client_ip):
+    return DefineMiddleware(
+        RateLimitMiddleware, name=name, limit=limit, window=window, identify=identify
+    )
+
+
+# /auth/* (IP単位、メール単位の制限はハンドラー内)
+AUTH_RATE_LIMIT = rate_limit("auth", 30, 60)
+# チャット送信 (セッション単位)
+CHAT_RATE_LIMIT = rate_limit("chat", 60, 60, identify=session_or_ip)
+# Bearer API (IP単位)
+API_RATE_LIMIT = rate_limit("api", 600, 60)
@@ -1,21 +1,124 @@
-from redis.asyncio import Redis
+"""アプリ全体で共有するRedisクライアント
 
-from app.config import REDIS_URL
+接続方式は環境変数で切り替える。
+- 単一ノード: REDIS_URL
+- Sentinel: REDIS_SENTINELS=host:port,host:port と REDIS_SENTINEL_SERVICE
+- Cluster: REDIS_CLUSTER=1 (REDIS_URL は任意のノード)
 
-_redis_client: Redis | None = None
+Cluster では複数キーのLuaスクリプト・トランザクションは同一スロットのキーに限られる。
+Pub/Sub はクラスタ全体に配信されるため、get_pubsub() は既定ノードで購読する。
+"""
+
+import logging
+import os
+import socket
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from uuid import uuid4
+
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.client import Pipeline, PubSub
+from redis.asyncio.cluster import RedisCluster
+from redis.asyncio.retry import Retry
+from redis.asyncio.sentinel import Sentinel
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError, TimeoutError
+
+from app.config import (
+    REDIS_CLUSTER,
+    REDIS_HEALTH_CHECK_INTERVAL,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_RETRIES,
+    REDIS_SENTINEL_SERVICE,
+    REDIS_SENTINELS,
+    REDIS_SOCKET_TIMEOUT,
+    REDIS_STARTUP_CHECK,
+    REDIS_URL,
+)
+
+logger = logging.getLogger(__name__)
+
+# Redis上でワーカー (プロセス) を識別するID
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+
+def _connection_options() -> dict:
+    return {
+        "decode_responses": True,
+        "socket_timeout": REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": REDIS_SOCKET_TIMEOUT,
+        "socket_keepalive": True,
+        "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+        "retry": Retry(ExponentialBackoff(cap=1.0, base=0.05), REDIS_RETRIES),
+        "retry_on_error": [ConnectionError, TimeoutError],
+    }
+
+
+def create_redis() -> Redis | RedisCluster:
+    """設定に応じたクライアントを作成 (接続は最初のコマンド実行時)"""
+    options = _connection_options()
+    if REDIS_CLUSTER:
+        return RedisCluster.from_url(
+            REDIS_URL, max_connections=REDIS_MAX_CONNECTIONS, **options
+        )
+    if REDIS_SENTINELS:
+        sentinels = [
+            (host, int(port))
+            for host, _, port in (s.partition(":") for s in REDIS_SENTINELS.split(","))
+        ]
+        return Sentinel(sentinels, **options).master_for(
+            REDIS_SENTINEL_SERVICE, max_connections=REDIS_MAX_CONNECTIONS
+        )
+    # 上限に達したら空くまで待つ (既定のプールは即座にエラーになる)
+    pool = BlockingConnectionPool.from_url(
+        REDIS_URL,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_SOCKET_TIMEOUT,
+        **options,
+    )
+    return Redis(connection_pool=pool)
+
+
+redis = create_redis()
 
 
 async def get_redis() -> Redis:
     """Redis接続を取得"""
-    global _redis_client
-    if _redis_client is None:
-        _redis_client = Redis.from_url(REDIS_URL, decode_responses=True)
-    return _redis_client
+    return redis
+
+
+async def get_pubsub() -> PubSub:
+    if isinstance(redis, RedisCluster):
+        await redis.initialize()
+        return redis.get_redis_connection(redis.get_default_node()).pubsub()
+    return redis.pubsub()
+
+
+@asynccontextmanager
+async def pipeline(transaction: bool = False) -> AsyncIterator[Pipeline]:
+    """ブロック内で積んだコマンドを抜けるときに1往復で実行
+
+    結果が必要な場合はブロック内で execute() を呼ぶ (実行済みなら再実行しない)。
+    """
+    async with redis.pipeline(transaction=transaction) as pipe:
+        yield pipe
+        if len(pipe):
+            await pipe.execute()
+
+
+async def open_redis() -> None:
+    """起動時の疎通確認 (失敗しても起動は続ける)"""
+    if not REDIS_STARTUP_CHECK:
+        return
+    try:
+        await redis.ping()
+    except Exception:
+        logger.exception("Redisに接続できません")
 
 
 async def close_redis() -> None:
     """Redis接続を閉じる"""
-    global _redis_client
-    if _redis_client:
-        await _redis_client.aclose()
-        _redis_client = None
+    if isinstance(redis, RedisCluster):
+        await redis.aclose()
+    else:
+        await redis.aclose(close_connection_pool=True)
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+from uuid import UUID
+
+from app.cache import bump_version, get_version
+from app.repository import (
+    department_repo,
+    employee_repo,
+    meeting_room_repo,
+    tag_repo,
+)
+from models import Department, Employee, MeetingRoom, Tag
+from models import DepartmentTable as D
+from models import EmployeeTable as E
+from models import MeetingRoomTable as MR
+from models import TagTable as T
+
+REFDATA_VERSION_KEY = "refdata:version"
+
+# 社員は名前表示・選択肢用の軽量な射影 (画像・日付は含まない)
+EMPLOYEE_COLUMNS = (E.id, E.name, E.email, E.department_id, E.role)
+
+# Redisが消えてバージョンが戻った場合に備えた再読み込み間隔 (秒)
+MAX_AGE = 300
+# 他ワーカーでの変更 (バージョン) を確認する間隔 (秒)
+VERSION_CHECK_SECONDS = 1.0
+
+
+@dataclass(frozen=True)
+class RefData:
+    """部署・会議室・タグ・社員のスナップショット (ID→モデル、名前順)"""
+
+    version: int | None
+    departments: Mapping[UUID, Department]
+    meeting_rooms: Mapping[UUID, MeetingRoom]
+    tags: Mapping[UUID, Tag]
+    employees: Mapping[UUID, Employee]
+
+
+_snapshot: RefData | None = None
+_loaded_at = 0.0
+_checked_at = 0.0
+_load_lock = asyncio.Lock()
+
+
+async def _load(version: int) -> RefData:
+    departments, rooms, tags, employees = await asyncio.gather(
+        D.select().order_by(D.name),
+        MR.select().order_by(MR.name),
+        T.select().order_by(T.name),
+        E.select(*EMPLOYEE_COLUMNS).order_by(E.name),
+    )
+
+    def freeze(rows, repo):
+        return MappingProxyType({r["id"]: repo.to_model(r) for r in rows})
+
+    return RefData(
+        version=version,
+        departments=freeze(departments, department_repo),
+        meeting_rooms=freeze(rooms, meeting_room_repo),
+        tags=freeze(tags, tag_repo),
+        employees=freeze(employees, employee_repo),
+    )
+
+
+async def get_refdata() -> RefData:
+    """ワーカー内のスナップショット (Redisのバージョンが変わったら再読み込み)
+
+    バージョンの確認は VERSION_CHECK_SECONDS に1回まで。同時に古くなったことに
+    気付いたリクエストは1回の読み込みを待ち合わせる。
+    """
+    global _snapshot, _loaded_at, _checked_at
+    if (
+        _snapshot is not None
+        and time.monotonic() - _checked_at < VERSION_CHECK_SECONDS
+        and time.monotonic() - _loaded_at < MAX_AGE
+    ):
+        return _snapshot
+    version = await get_version(REFDATA_VERSION_KEY)
+    if not _is_fresh(version):
+        async with _load_lock:
+            # 待っている間に他のリクエストが読み込んでいればそれを使う
+            if not _is_fresh(version):
+                _snapshot = await _load(version)
+                _loaded_at = time.monotonic()
+    _checked_at = time.monotonic()
+    return _snapshot
+
+
+def _is_fresh(version: int | None) -> bool:
+    """version が None (Redis停止中) なら読み込みからの経過時間だけで判断"""
+    return (
+        _snapshot is not None
+        and version in (None, _snapshot.version)
+        and time.monotonic() - _loaded_at < MAX_AGE
+    )
+
+
+def clear_refdata() -> None:
+    """このワーカーのスナップショットを破棄"""
+    global _snapshot, _load_lock
+    _snapshot = None
+    # テストではイベントループごとに作り直す
+    _load_lock = asyncio.Lock()
+
+
+async def invalidate_refdata() -> None:
+    """部署・会議室・タグ・社員の変更後に全ワーカーのスナップショットを無効化"""
+    clear_refdata()
+    await bump_version(REFDATA_VERSION_KEY)
@@ -0,0 +1,136 @@
+from typing import Generic, TypeVar
+from uuid import UUID
+
+import msgspec
+from litestar.exceptions import NotFoundException
+from piccolo.columns import Column
+from piccolo.table import Table
+
+from app.statements import PreparedQuery
+from models import (
+    PC,
+    BlogPost,
+    Department,
+    Employee,
+    MeetingRoom,
+    MeetingRoomReservation,
+    Tag,
+)
+from models import BlogPostTable as B
+from models import DepartmentTable as D
+from models import EmployeeTable as E
+from models import MeetingRoomReservationTable as MRR
+from models import MeetingRoomTable as MR
+from models import PCTable as P
+from models import TagTable as T
+
+ModelT = TypeVar("ModelT")
+
+
+class Repository(Generic[ModelT]):
+    """Piccoloテーブルの1件取得・カラム射影・モデル (msgspec.Struct) 変換"""
+
+    def __init__(
+        self,
+        table: type[Table],
+        model: type[ModelT],
+        label: str,
+        exclude: tuple[Column, ...] = (),
+        prepared: bool = False,
+    ):
+        self.table = table
+        self.model = model
+        self.label = label
+        # 明示的に指定しない限り取得しないカラム (bytea等)
+        excluded = {c._meta.name for c in exclude}
+        self.default_columns = [
+            c for c in table._meta.columns if c._meta.name not in excluded
+        ]
+        # prepared=True なら既定カラムの1件取得をプリペアドステートメントで行う
+        self._by_pk = self._prepare_by_pk() if prepared else None
+
+    def _prepare_by_pk(self) -> PreparedQuery:
+        tablename = self.table._meta.tablename
+        pk_column = self.table._meta.primary_key
+        names = ", ".join(f'"{c._meta.db_column_name}"' for c in self.default_columns)
+        return PreparedQuery(
+            f"{tablename}_by_pk",
+            f'SELECT {names} FROM "{tablename}" '
+            f'WHERE "{pk_column._meta.db_column_name}" = $1',
+            lambda pk: self.table.select(*self.default_columns).where(pk_column == pk),
+        )
+
+    async def get(self, pk: UUID, *columns: Column) -> dict | None:
+        """1件取得 (カラム未指定なら除外カラム以外すべて)"""
+        if self._by_pk is not None and not columns:
+            row = await self._by_pk.fetchrow(pk)
+            return dict(row) if row is not None else None
+        pk_column = self.table._meta.primary_key
+        return (
+            await self.table.select(*(columns or self.default_columns))
+            .where(pk_column == pk)
+            .first()
+        )
+
+    async def get_or_404(self, pk: UUID, *columns: Column) -> dict:
+        """1件取得、存在しなければ404エラー (1クエリ)"""
+        if (row := await self.get(pk, *columns)) is None:
+            raise NotFoundException(detail=f"{self.label} with ID {pk} not found")
+        return row
+
+    async def ensure_exists(self, pk: UUID) -> None:
+        """存在確認のみ (主キーだけを取得)"""
+        await self.get_or_404(pk, self.table._meta.primary_key)
+
+    async def update_or_404(self, pk: UUID, values: dict, *returning: Column) -> dict:
+        """1件更新 (UPDATE ... RETURNING の1クエリ)、存在しなければ404エラー
+
+        returning を指定すれば更新後のそのカラムを返す。
+        """
+        pk_column = self.table._meta.primary_key
+        rows = await (
+            self.table.update(values)
+            .where(pk_column == pk)
+            .returning(*(returning or (pk_column,)))
+        )
+        return self._first_or_404(pk, rows)
+
+    async def delete_or_404(self, pk: UUID, *returning: Column) -> dict:
+        """1件削除 (DELETE ... RETURNING の1クエリ)、存在しなければ404エラー
+
+        returning を指定すれば削除した行のそのカラムを返す。
+        """
+        pk_column = self.table._meta.primary_key
+        rows = await (
+            self.table.delete()
+            .where(pk_column == pk)
+            .returning(*(returning or (pk_column,)))
+        )
+        return self._first_or_404(pk, rows)
+
+    def _first_or_404(self, pk: UUID, rows: list[dict]) -> dict:
+        if not rows:
+            raise NotFoundException(detail=f"{self.label} with ID {pk} not found")
+        return rows[0]
+
+    async def get_model_or_404(self, pk: UUID) -> ModelT:
+        return self.to_model(await self.get_or_404(pk))
+
+    def to_model(self, row: dict) -> ModelT:
+        """取得行をモデルに変換 (行に無いフィールドは既定値、余分なキーは無視)"""
+        return msgspec.convert(row, self.model)
+
+    def to_models(self, rows: list[dict]) -> list[ModelT]:
+        """取得行をまとめてモデルに変換 (1回の呼び出しで型変換・検証)"""
+        return msgspec.convert(rows, list[self.model])
+
+
+blog_post_repo = Repository(B, BlogPost, "Blog post")
+department_repo = Repository(D, Department, "Department")
+employee_repo = Repository(
+    E, Employee, "Employee", exclude=(E.profile_image,), prepared=True
+)
+meeting_room_repo = Repository(MR, MeetingRoom, "Meeting room")
+pc_repo = Repository(P, PC, "PC", prepared=True)
+reservation_repo = Repository(MRR, MeetingRoomReservation, "Reservation")
+tag_repo = Repository(T, Tag, "Tag")
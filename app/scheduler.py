@@ -0,0 +1,108 @@
+"""アプリ内スケジューラ (Redisのリーダーロックを持つ1ワーカーだけがジョブを実行)"""
+
+import asyncio
+import logging
+from contextlib import suppress
+from datetime import date, datetime
+
+from app.alerts import refresh_alert_digest
+from app.breaker import CircuitBreakerError
+from app.cache import _UNLOCK_SCRIPT, _call, run_script
+from app.config import ALERT_DIGEST_HOUR, ALERT_SCHEDULER_ENABLED
+from app.redis_client import WORKER_ID
+from app.slack import format_alert_digest, notify_slack
+
+logger = logging.getLogger(__name__)
+
+LEADER_KEY = "scheduler:leader"
+LEADER_TTL = 60
+TICK_SECONDS = 30
+# 日次ダイジェストの送信済みフラグ (リーダーが交代しても二重送信しない)
+DIGEST_SENT_KEY = "alerts:digest:sent"
+
+# 空いていれば取得、自分が保持していれば延長 (1往復)
+_ACQUIRE_SCRIPT = """
+local owner = redis.call('GET', KEYS[1])
+if not owner then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    return 1
+end
+if owner == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_task: asyncio.Task | None = None
+
+
+async def acquire_leadership() -> bool:
+    """リーダーロックを取得または延長 (取れない・Redisが使えなければFalse)"""
+    try:
+        return bool(
+            await run_script(_ACQUIRE_SCRIPT, [LEADER_KEY], [WORKER_ID, LEADER_TTL])
+        )
+    except CircuitBreakerError:
+        return False
+
+
+async def release_leadership() -> None:
+    # 解放できなくてもTTLで消える
+    with suppress(CircuitBreakerError):
+        await run_script(_UNLOCK_SCRIPT, [LEADER_KEY], [WORKER_ID])
+
+
+async def send_daily_digest(today: date) -> dict | None:
+    """当日分のダイジェストを計算・保存し、Slackへ1回だけ通知
+
+    送信済みフラグを先に取って二重送信を防ぎ、送信までに失敗したらフラグを消して
+    次の周回で再送する。Redisが使えなければ CircuitBreakerError (この周回は見送り)。
+    """
+    key = f"{DIGEST_SENT_KEY}:{today}"
+    if not await _call("set", key, WORKER_ID, nx=True, ex=2 * 86400):
+        return None
+    try:
+        digest = await refresh_alert_digest()
+        if digest["resignations"] or digest["transfers"]:
+            await notify_slack(format_alert_digest(digest))
+    except Exception:
+        with suppress(CircuitBreakerError):
+            await _call("delete", key)
+        raise
+    return digest
+
+
+async def run_due_jobs(now: datetime) -> None:
+    if not await acquire_leadership():
+        return
+    if now.hour >= ALERT_DIGEST_HOUR:
+        with suppress(CircuitBreakerError):
+            await send_daily_digest(now.date())
+
+
+async def _loop() -> None:
+    while True:
+        try:
+            await run_due_jobs(datetime.now())
+        except Exception:
+            logger.exception("スケジューラのジョブに失敗しました")
+        await asyncio.sleep(TICK_SECONDS)
+
+
+async def start_scheduler() -> None:
+    global _task
+    if ALERT_SCHEDULER_ENABLED and _task is None:
+        _task = asyncio.create_task(_loop())
+
+
+async def stop_scheduler() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
+    await release_leadership()
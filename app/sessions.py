@@ -0,0 +1,240 @@
+"""ログインセッション
+
+SESSION_MODE で保存方式を切り替える。
+- redis: ランダムなIDをCookieに入れ、内容はRedisに保存 (プロセス内で60秒キャッシュ)
+- signed: ユーザー情報と有効期限をHMAC署名してCookieに入れる (検証にI/O不要)
+
+ログアウトは Pub/Sub で全ワーカーへ通知し、各ワーカーはメモリキャッシュから
+外す (redis) か失効リストに加える (signed)。signed の失効リストは途中起動・
+再接続したワーカー用に有効期限付きでRedisのソート済みセットにも残す。
+redis 方式のTTL延長は SYNC_INTERVAL 秒ごとにパイプラインでまとめて反映する。
+Redis停止中 (サーキットブレーカーが open) は、読み込んだことのあるセッションを
+SESSION_GRACE_TTL 秒まで使い続け、ログアウトの反映は復旧後に行う。
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import time
+from datetime import datetime
+
+from cachetools import TTLCache
+
+from app.breaker import CircuitBreakerError
+from app.cache import fetch_cached, redis_breaker, set_cached
+from app.config import (
+    SESSION_GRACE_TTL,
+    SESSION_MODE,
+    SESSION_SECRET,
+    SESSION_SYNC_ENABLED,
+)
+from app.metrics import inc
+from app.redis_client import get_pubsub, get_redis, pipeline
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL = 86400
+REVOKED_CHANNEL = "sessions:revoked"
+REVOKED_KEY = "sessions:revoked"
+SYNC_INTERVAL = 30
+
+session_cache = TTLCache(maxsize=10000, ttl=60)
+# Redis停止中に使う、より長く保持するコピー
+session_grace = TTLCache(maxsize=10000, ttl=SESSION_GRACE_TTL)
+# signed: 失効したセッションID → Cookieの有効期限 (期限後は不要)
+_revoked: dict[str, float] = {}
+# redis: TTLを延長するセッションID
+_pending_refresh: set[str] = set()
+_tasks: list[asyncio.Task] = []
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _signature(payload: str) -> str:
+    digest = hmac.new(SESSION_SECRET.encode(), payload.encode(), hashlib.sha256)
+    return _b64encode(digest.digest())
+
+
+def sign_session(data: dict) -> str:
+    payload = _b64encode(json.dumps(data, separators=(",", ":")).encode())
+    return f"{payload}.{_signature(payload)}"
+
+
+def unsign_session(token: str) -> dict | None:
+    """署名と有効期限を検証 (不正・期限切れはNone)"""
+    payload, _, signature = token.partition(".")
+    if not hmac.compare_digest(signature, _signature(payload)):
+        return None
+    try:
+        data = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    return data if data.get("exp", 0) > time.time() else None
+
+
+async def create_session(user: dict) -> str:
+    """user: user_id/email/role。Cookieに入れる値を返す"""
+    now = datetime.now()
+    if SESSION_MODE == "signed":
+        return sign_session(
+            {
+                **user,
+                "sid": secrets.token_urlsafe(16),
+                "created_at": now.isoformat(),
+                "exp": int(now.timestamp()) + SESSION_TTL,
+            }
+        )
+    session_id = secrets.token_urlsafe(32)
+    await set_cached(
+        f"session:{session_id}",
+        {**user, "created_at": now.isoformat()},
+        SESSION_TTL,
+    )
+    return session_id
+
+
+async def load_session(token: str) -> dict | None:
+    if SESSION_MODE == "signed":
+        if (data := unsign_session(token)) and data["sid"] not in _revoked:
+            return data
+        return None
+
+    # メモリキャッシュ→Redis の順でチェック
+    session_data = session_cache.get(token)
+    inc("session_l1_requests_total", result="hit" if session_data else "miss")
+    if not session_data:
+        try:
+            session_data = await fetch_cached(f"session:{token}")
+        except CircuitBreakerError:
+            return session_grace.get(token)
+        if not session_data:
+            return None
+        session_cache[token] = session_grace[token] = session_data
+        _pending_refresh.add(token)
+    return session_data
+
+
+async def revoke_session(token: str) -> None:
+    """ログアウト (全ワーカーへ通知、Redis停止中は復旧後に通知)"""
+    if SESSION_MODE == "signed":
+        if not (data := unsign_session(token)):
+            return
+        revoked_id, expires = data["sid"], data["exp"]
+    else:
+        revoked_id, expires = token, 0
+    _apply_revocation(revoked_id, expires)
+    try:
+        await redis_breaker.call(_publish_revocation, revoked_id, expires)
+    except CircuitBreakerError:
+        redis_breaker.defer(_publish_revocation, revoked_id, expires)
+
+
+async def _publish_revocation(revoked_id: str, expires: float) -> None:
+    async with pipeline() as pipe:
+        if SESSION_MODE == "signed":
+            pipe.zadd(REVOKED_KEY, {revoked_id: expires})
+            pipe.zremrangebyscore(REVOKED_KEY, "-inf", time.time())
+        else:
+            pipe.delete(f"session:{revoked_id}")
+        pipe.publish(REVOKED_CHANNEL, json.dumps({"id": revoked_id, "exp": expires}))
+
+
+def _apply_revocation(revoked_id: str, expires: float) -> None:
+    if SESSION_MODE == "signed":
+        _revoked[revoked_id] = expires
+    else:
+        session_cache.pop(revoked_id, None)
+        session_grace.pop(revoked_id, None)
+        _pending_refresh.discard(revoked_id)
+
+
+def clear_sessions() -> None:
+    """このワーカーのセッション関連のメモリを破棄"""
+    session_cache.clear()
+    session_grace.clear()
+    _revoked.clear()
+    _pending_refresh.clear()
+
+
+async def _load_revoked() -> None:
+    redis = await get_redis()
+    for revoked_id, expires in await redis.zrangebyscore(
+        REVOKED_KEY, time.time(), "+inf", withscores=True
+    ):
+        _revoked[revoked_id] = expires
+
+
+async def _listen() -> None:
+    """失効通知を購読 (切断時は失効リストを読み直して再購読)"""
+    while True:
+        pubsub = await get_pubsub()
+        try:
+            await pubsub.subscribe(REVOKED_CHANNEL)
+            if SESSION_MODE == "signed":
+                await _load_revoked()
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    revoked = json.loads(message["data"])
+                    _apply_revocation(revoked["id"], revoked["exp"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("セッション失効通知の購読が切断されました")
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+
+
+async def flush_refresh() -> None:
+    """溜まったセッションのTTL延長を1往復で反映し、期限切れの失効情報を捨てる"""
+    now = time.time()
+    for revoked_id in [r for r, expires in _revoked.items() if expires <= now]:
+        del _revoked[revoked_id]
+    if not _pending_refresh:
+        return
+    pending = list(_pending_refresh)
+    _pending_refresh.clear()
+    async with pipeline() as pipe:
+        for session_id in pending:
+            pipe.expire(f"session:{session_id}", SESSION_TTL)
+
+
+async def _sync_loop() -> None:
+    while True:
+        await asyncio.sleep(SYNC_INTERVAL)
+        try:
+            await flush_refresh()
+        except Exception:
+            logger.exception("セッションTTLの延長に失敗しました")
+
+
+async def start_sessions() -> None:
+    if SESSION_MODE == "signed" and not SESSION_SECRET:
+        raise RuntimeError("SESSION_MODE=signed には SESSION_SECRET が必要です")
+    if SESSION_SYNC_ENABLED and not _tasks:
+        _tasks.extend(
+            [asyncio.create_task(_listen()), asyncio.create_task(_sync_loop())]
+        )
+
+
+async def stop_sessions() -> None:
+    for task in _tasks:
+        task.cancel()
+    for task in _tasks:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    _tasks.clear()
+    if _pending_refresh:
+        await flush_refresh()
@@ -3,6 +3,8 @@ from uuid import UUID
 
 import httpx
 
+from app.metrics import in_flight
+
 SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK", "")
 
 
@@ -10,8 +12,9 @@ async def notify_slack(blocks: list[dict]) -> None:
     if not SLACK_WEBHOOK_URL:
         return
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            await client.post(SLACK_WEBHOOK_URL, json={"blocks": blocks})
+        with in_flight("notification_queue_depth", channel="slack"):
+            async with httpx.AsyncClient(timeout=5.0) as client:
+                await client.post(SLACK_WEBHOOK_URL, json={"blocks": blocks})
     except Exception:
         pass
 
@@ -86,3 +89,44 @@ def format_pc_deleted(pc_name: str, pc_id: UUID, model: str, serial: str) -> lis
             "elements": [{"type": "mrkdwn", "text": f"ID: `{pc_id}`"}],
         },
     ]
+
+
+def format_alert_digest(digest: dict) -> list[dict]:
+    """退職・異動アラートの日次サマリー"""
+    kinds = {"resignations": "退職", "transfers": "異動"}
+    lines = [
+        f"{kinds[kind]}予定: {len(digest[kind])}名"
+        for kind in ("resignations", "transfers")
+    ]
+    blocks = [
+        {
+            "type": "header",
+            "text": {
+                "type": "plain_text",
+                "text": f"⚠️ 退職・異動アラート (今後{digest['days']}日間)",
+            },
+        },
+        {"type": "section", "text": {"type": "mrkdwn", "text": "\n".join(lines)}},
+    ]
+    if digest["pc_returns"]:
+        returns = [
+            f"• *{r['name']}* ({kinds[r['kind']]} {r['date']}, あと{r['days_left']}日): "
+            + ", ".join(r["pcs"])
+            for r in digest["pc_returns"]
+        ]
+        blocks.append(
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": "*PC未返却:*\n" + "\n".join(returns),
+                },
+            }
+        )
+    blocks.append(
+        {
+            "type": "context",
+            "elements": [{"type": "mrkdwn", "text": f"{digest['date']} 時点"}],
+        }
+    )
+    return blocks
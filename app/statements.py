@@ -0,0 +1,78 @@
+"""ホットパス用の名前付きプリペアドステートメント
+
+PreparedQuery に登録したSQLは、asyncpgの接続ごとのステートメントキャッシュにより
+接続ごとに最初の1回だけ prepare され、以降は同じ接続で名前付きステートメントを
+使い回す (テーブル定義の変更後はasyncpgが作り直す)。Piccoloのクエリ組み立て・
+dict変換を通らず、結果はasyncpgのRecord (model 指定時は msgspec.Struct) で返す。
+PreparedStatement オブジェクトはプールへの返却で使えなくなるため保持しない。
+接続プールが無いとき (テストのSQLite等) は fallback のPiccoloクエリで同じ結果を返す。
+"""
+
+import time
+from collections.abc import Awaitable, Callable, Sequence
+
+import msgspec
+
+from app.database import DB
+from app.profiler import current_profile
+
+registry: dict[str, "PreparedQuery"] = {}
+
+
+def fast_path_available() -> bool:
+    return DB is not None and DB.pool is not None
+
+
+class PreparedQuery:
+    """名前付きのプリペアドステートメント (名前はプロセス内で一意)
+
+    sql はasyncpgの $1, $2 ... 形式。fallback は同じ引数で同じ列を返すPiccoloのクエリ。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        sql: str,
+        fallback: Callable[..., Awaitable[Sequence]],
+    ):
+        if name in registry:
+            raise ValueError(f"prepared query {name!r} is already registered")
+        self.name = name
+        self.sql = sql
+        self.fallback = fallback
+        registry[name] = self
+
+    async def _run(self, method: str, args: tuple):
+        start = time.perf_counter()
+        async with DB.pool.acquire() as connection:
+            result = await getattr(connection, method)(self.sql, *args)
+        if (profile := current_profile()) is not None:
+            profile.add_query(self.sql, (time.perf_counter() - start) * 1000)
+        return result
+
+    async def fetch(self, *args) -> Sequence:
+        """全行 (Record、fallback時はdict)"""
+        if not fast_path_available():
+            return await self.fallback(*args)
+        return await self._run("fetch", args)
+
+    async def fetchrow(self, *args):
+        """先頭行 (無ければNone)"""
+        if not fast_path_available():
+            rows = await self.fallback(*args)
+            return rows[0] if rows else None
+        return await self._run("fetchrow", args)
+
+    async def fetchval(self, *args):
+        """先頭行の先頭列 (無ければNone)"""
+        if not fast_path_available():
+            rows = await self.fallback(*args)
+            return next(iter(rows[0].values())) if rows else None
+        return await self._run("fetchval", args)
+
+    async def fetch_models(self, model: type, *args) -> list:
+        """全行をmodelのリストで返す (SELECTの列はモデルのフィールド順)"""
+        if not fast_path_available():
+            return msgspec.convert(await self.fallback(*args), list[model])
+        # 列の並びがフィールドと同じなので、dictを作らず位置引数で組み立てる
+        return [model(*record) for record in await self._run("fetch", args)]
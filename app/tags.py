@@ -0,0 +1,56 @@
+from datetime import datetime
+from uuid import UUID
+
+from app.refdata import get_refdata, invalidate_refdata
+from models import Tag
+from models import TagTable as T
+
+# 指定タグ集合との差分だけを削除・追加する (使用数はトリガーで更新)
+_SET_POST_TAGS_SQL = """
+WITH wanted AS (
+    SELECT DISTINCT unnest({}::uuid[]) AS tag_id
+), deleted AS (
+    DELETE FROM blog_post_tags
+    WHERE blog_post_id = {} AND tag_id NOT IN (SELECT tag_id FROM wanted)
+    RETURNING tag_id
+), inserted AS (
+    INSERT INTO blog_post_tags (id, blog_post_id, tag_id, post_created_at)
+    SELECT gen_random_uuid(), {}, w.tag_id, {}
+    FROM wanted w JOIN tags t ON t.id = w.tag_id
+    ON CONFLICT (blog_post_id, tag_id) DO NOTHING
+    RETURNING tag_id
+)
+SELECT (SELECT COUNT(*) FROM deleted) + (SELECT COUNT(*) FROM inserted) AS changed
+"""
+
+
+def parse_tag_ids(value: str) -> list[UUID]:
+    """カンマ区切りのタグIDを重複なしで変換"""
+    return list(dict.fromkeys(UUID(t.strip()) for t in value.split(",") if t.strip()))
+
+
+async def get_all_tags() -> list[Tag]:
+    """全タグ一覧 (名前順・使用数付き)"""
+    return list((await get_refdata()).tags.values())
+
+
+async def invalidate_tags() -> None:
+    """タグの作成・変更・削除後に全ワーカーのタグキャッシュを無効化
+
+    投稿のタグ付けが変わった場合も使用数 (usage_count) が変わるため呼ぶ
+    (トランザクションのコミット後に呼ぶこと)。
+    """
+    await invalidate_refdata()
+
+
+async def set_post_tags(
+    blog_post_id: UUID, post_created_at: datetime, tag_ids: list[UUID]
+) -> bool:
+    """投稿のタグを1文で差し替え (呼び出し側のトランザクション内で実行)
+
+    タグ付けが変わった (使用数が変わった) かを返す。
+    """
+    rows = await T.raw(
+        _SET_POST_TAGS_SQL, tag_ids, blog_post_id, blog_post_id, post_created_at
+    )
+    return bool(rows[0]["changed"])
@@ -1,6 +1,8 @@
+import html
 import logging
 import os
 import random
+import re
 import smtplib
 from email.mime.text import MIMEText
 from io import BytesIO
@@ -8,10 +10,12 @@ from io import BytesIO
 from PIL import Image
 
 from app.config import SMTP_HOST, SMTP_PASSWORD, SMTP_PORT, SMTP_USER
+from app.metrics import in_flight, timed
 
 logger = logging.getLogger(__name__)
 
 
+@timed("image_processing_seconds")
 def process_profile_image(image_data: bytes, max_size: int = 5 * 1024 * 1024) -> bytes:
     """プロフィール画像を圧縮・リサイズ (5MB以上はエラー)"""
     if len(image_data) > max_size:
@@ -25,6 +29,29 @@ def process_profile_image(image_data: bytes, max_size: int = 5 * 1024 * 1024) ->
     return buf.getvalue()
 
 
+_EXCERPT_PATTERNS = [
+    (re.compile(r"```.*?```", re.DOTALL), " "),  # コードブロック
+    (re.compile(r"<[^>]+>"), " "),  # HTMLタグ
+    (re.compile(r"!\[([^\]]*)\]\([^)]*\)"), r"\1"),  # 画像
+    (re.compile(r"\[([^\]]*)\]\([^)]*\)"), r"\1"),  # リンク
+    (
+        re.compile(r"^\s{0,3}(#{1,6}|>|[-*+]|\d+\.)\s+", re.MULTILINE),
+        "",
+    ),  # 見出し・引用・リスト
+    (re.compile(r"[*_~`]+"), ""),  # 強調・インラインコード
+    (re.compile(r"\s+"), " "),
+]
+
+
+def make_excerpt(content: str, length: int = 200) -> str:
+    """Markdown/HTMLを除去した一覧表示用の抜粋を作成"""
+    text = html.unescape(content)
+    for pattern, repl in _EXCERPT_PATTERNS:
+        text = pattern.sub(repl, text)
+    text = text.strip()
+    return text if len(text) <= length else text[:length].rstrip() + "…"
+
+
 def generate_random_pc_name() -> str:
     """ランダムなPC名を生成 (形容詞-名詞-数字 形式)"""
     adjectives = [
@@ -133,7 +160,8 @@ async def send_otp_email(to: str, otp: str) -> None:
     msg["From"] = SMTP_USER
     msg["To"] = to
 
-    with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-        server.starttls()
-        server.login(SMTP_USER, SMTP_PASSWORD)
-        server.send_message(msg)
+    with in_flight("notification_queue_depth", channel="email"):
+        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
+            server.starttls()
+            server.login(SMTP_USER, SMTP_PASSWORD)
+            server.send_message(msg)
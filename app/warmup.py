@@ -0,0 +1,115 @@
+"""キャッシュのウォームアップ
+
+@cache_loader でキャッシュの作り方をキーごとに登録し、ハンドラーは load_cached で
+読み込む (無ければ作って保存)。登録したキーは
+- 起動時: リクエストを受け付ける前に並行して作成 (最初に起動したワーカーのみ)
+- 無効化後: delete_cached の直後にバックグラウンドで作り直す (ワーカー間で排他)
+"""
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from contextvars import Context
+
+from app.breaker import CircuitBreakerError
+from app.cache import get_cached, invalidation_hooks, redis_lock, set_cached
+from app.config import CACHE_WARMUP_ENABLED
+
+logger = logging.getLogger(__name__)
+
+# 起動時のウォームアップを1ワーカーに限る時間 (この間に起動したワーカーは省略)
+STARTUP_LOCK_TTL = 60
+# 作り直しのロック (ローダーの最大実行時間の目安)
+REWARM_LOCK_TTL = 30
+# 続けて無効化されたときにまとめて1回作り直すための待ち時間 (秒)
+REWARM_DELAY = 0.5
+
+# キー → (ローダー, TTL)
+_loaders: dict[str, tuple[Callable[[], Awaitable], int]] = {}
+_running: dict[str, asyncio.Task] = {}
+# 作り直しの実行中に再度無効化されたキー
+_dirty: set[str] = set()
+
+
+def cache_loader(key: str, ttl: int = 300):
+    """keyのキャッシュを作る関数を登録"""
+
+    def decorator(func: Callable[[], Awaitable]):
+        _loaders[key] = (func, ttl)
+        return func
+
+    return decorator
+
+
+async def _load(key: str):
+    func, ttl = _loaders[key]
+    value = await func()
+    await set_cached(key, value, ttl)
+    return value
+
+
+async def load_cached(key: str, type=None):
+    """キャッシュがあればそれを、無ければローダーで作って保存した値を返す
+
+    type はキャッシュから読むときの型 (ローダーはその型の値を返すこと)。
+    """
+    if (cached := await get_cached(key, type)) is not None:
+        return cached
+    return await _load(key)
+
+
+async def warm_up() -> None:
+    """登録済みのキャッシュを並行して作成 (起動フック)"""
+    if not CACHE_WARMUP_ENABLED:
+        return
+    try:
+        async with redis_lock(
+            "warmup:startup", STARTUP_LOCK_TTL, release=False
+        ) as acquired:
+            if not acquired:
+                return
+            keys = list(_loaders)
+            results = await asyncio.gather(
+                *(_load(key) for key in keys), return_exceptions=True
+            )
+    except CircuitBreakerError:
+        logger.warning("Redisが使えないためウォームアップを省略しました")
+        return
+    for key, result in zip(keys, results):
+        if isinstance(result, Exception):
+            logger.error("%s のウォームアップに失敗しました", key, exc_info=result)
+
+
+async def _rewarm(key: str) -> None:
+    try:
+        while True:
+            await asyncio.sleep(REWARM_DELAY)
+            _dirty.discard(key)
+            async with redis_lock(
+                f"warmup:{key}", REWARM_LOCK_TTL, wait=REWARM_LOCK_TTL
+            ) as acquired:
+                if acquired:
+                    await _load(key)
+            if key not in _dirty:
+                break
+    except Exception:
+        logger.exception("%s の再作成に失敗しました", key)
+    finally:
+        _running.pop(key, None)
+
+
+def _on_invalidate(keys: list[str]) -> None:
+    for key in keys:
+        if key not in _loaders:
+            continue
+        if key in _running:
+            _dirty.add(key)
+            continue
+        # リクエストのコンテキスト (プロファイラ等) を引き継がない
+        _running[key] = asyncio.get_running_loop().create_task(
+            _rewarm(key), context=Context()
+        )
+
+
+if CACHE_WARMUP_ENABLED:
+    invalidation_hooks.append(_on_invalidate)
@@ -4,13 +4,19 @@ from uuid import UUID
 
 from litestar import Request, Router, get, post
 from litestar.enums import RequestEncodingType
-from litestar.exceptions import NotFoundException
-from litestar.pagination import ClassicPagination
+from litestar.exceptions import NotFoundException, ValidationException
+from litestar.pagination import ClassicPagination, CursorPagination
 from litestar.params import Body
-from litestar.response import Redirect, Template
+from litestar.response import Redirect, Response, Template
+from markupsafe import Markup
 
 from app.auth import session_auth_guard
-from app.cache import delete_cached
+from app.cache import delete_cached, get_cached, get_version, set_cached
+from app.likes import add_like, forget_post, remove_like
+from app.refdata import REFDATA_VERSION_KEY
+from app.repository import blog_post_repo
+from app.tags import get_all_tags, invalidate_tags, parse_tag_ids, set_post_tags
+from app.utils import make_excerpt
 from models import (
     BlogLikeTable as BLT,
 )
@@ -25,20 +31,47 @@ from models import (
 from models import (
     BlogPostTagTable as BPT,
 )
-from models import (
-    EmployeeTable as E,
-)
 from models import (
     TagTable as T,
 )
 
 FormData = Annotated[dict[str, str], Body(media_type=RequestEncodingType.URL_ENCODED)]
 
-
-async def _get_or_404(blog_id: UUID) -> dict:
-    if not await B.exists().where(B.id == blog_id):
-        raise NotFoundException(detail=f"Blog post with ID {blog_id} not found")
-    return await B.select().where(B.id == blog_id).first()
+_MAX_UUID = UUID(int=(1 << 128) - 1)
+
+# タグ別一覧 (blog_post_tags ⋈ blog_posts をキーセットで1ページ分)
+_TAG_PAGE_SQL = """
+SELECT b.id, b.author_id, b.title, b.excerpt, b.created_at, b.updated_at,
+       b.like_count, e.name AS author_name
+FROM blog_post_tags t
+JOIN blog_posts b ON b.id = t.blog_post_id
+LEFT JOIN employees e ON e.id = b.author_id
+WHERE t.tag_id = {} AND (t.post_created_at, t.blog_post_id) < ({}, {})
+ORDER BY t.post_created_at DESC, t.blog_post_id DESC
+LIMIT {}
+"""
+
+# 詳細ページの検証用 (本文は取得しない)
+_DETAIL_META_SQL = """
+SELECT b.author_id, b.updated_at, b.like_count,
+       EXISTS (
+           SELECT 1 FROM blog_likes l
+           WHERE l.blog_post_id = b.id AND l.employee_id = {}
+       ) AS is_liked
+FROM blog_posts b
+WHERE b.id = {}
+"""
+
+# 一覧表示用カラム (本文は取得しない)
+_LIST_COLUMNS = (
+    B.id,
+    B.author_id,
+    B.title,
+    B.excerpt,
+    B.created_at,
+    B.updated_at,
+    B.like_count,
+)
 
 
 async def _load_tags(blog_ids: list[UUID]) -> dict[UUID, list[Tag]]:
@@ -48,11 +81,7 @@ async def _load_tags(blog_ids: list[UUID]) -> dict[UUID, list[Tag]]:
     tag_relations = await BPT.select(BPT.blog_post_id, BPT.tag_id).where(
         BPT.blog_post_id.is_in(blog_ids)
     )
-    tag_ids = {r["tag_id"] for r in tag_relations}
-    tags_dict = {}
-    if tag_ids:
-        tags_data = await T.select().where(T.id.is_in(tag_ids))
-        tags_dict = {t["id"]: Tag(id=t["id"], name=t["name"]) for t in tags_data}
+    tags_dict = {t.id: t for t in await get_all_tags()} if tag_relations else {}
     result: dict[UUID, list[Tag]] = {bid: [] for bid in blog_ids}
     for rel in tag_relations:
         if tag := tags_dict.get(rel["tag_id"]):
@@ -60,24 +89,83 @@ async def _load_tags(blog_ids: list[UUID]) -> dict[UUID, list[Tag]]:
     return result
 
 
-async def _load_likes(blog_ids: list[UUID], user_id: UUID) -> dict[UUID, dict]:
-    """複数ブログのいいね情報を一括読み込み"""
-    if not blog_ids:
-        return {}
-    # 全いいねを一括取得してカウント
-    all_likes = await BLT.select(BLT.blog_post_id, BLT.employee_id).where(
-        BLT.blog_post_id.is_in(blog_ids)
+def _to_list_post(
+    b: dict, tags_map: dict[UUID, list[Tag]], liked_ids: set[UUID]
+) -> BlogPost:
+    """一覧表示用のBlogPostに変換 (本文の代わりに抜粋を使用)"""
+    return BlogPost(
+        id=b["id"],
+        author_id=b["author_id"],
+        title=b["title"],
+        excerpt=b["excerpt"],
+        created_at=b["created_at"],
+        updated_at=b["updated_at"],
+        tags=tags_map.get(b["id"], []),
+        like_count=b["like_count"],
+        is_liked=b["id"] in liked_ids,
     )
-    like_counts: dict[UUID, int] = {}
-    liked_ids: set[UUID] = set()
-    for like in all_likes:
-        blog_id = like["blog_post_id"]
-        like_counts[blog_id] = like_counts.get(blog_id, 0) + 1
-        if like["employee_id"] == user_id:
-            liked_ids.add(blog_id)
+
+
+def _detail_headers(etag: str) -> dict[str, str]:
+    """詳細ページは毎回再検証させる (ETagが一致すれば304)"""
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+async def _render_detail_fragment(
+    request: Request, blog_id: UUID, version: str
+) -> dict:
+    """本文・メタ情報の描画結果 (投稿ID単位でキャッシュ、更新日時とタグ版で検証)"""
+    key = f"blogs:detail:{blog_id}"
+    if (cached := await get_cached(key)) and cached["version"] == version:
+        return cached
+    result = (
+        await B.select(B.all_columns(), B.author_id.name).where(B.id == blog_id).first()
+    )
+    if not result:
+        raise NotFoundException(detail=f"Blog post with ID {blog_id} not found")
+    tags_map = await _load_tags([blog_id])
+    post = BlogPost(
+        id=result["id"],
+        author_id=result["author_id"],
+        title=result["title"],
+        content=result["content"],
+        created_at=result["created_at"],
+        updated_at=result["updated_at"],
+        tags=tags_map.get(blog_id, []),
+    )
+    author = (
+        Employee(id=result["author_id"], name=result.get("author_id.name", "不明"))
+        if result["author_id"]
+        else None
+    )
+    html = request.app.template_engine.get_template("blog_detail_body.html").render(
+        post=post, author=author
+    )
+    fragment = {"version": version, "title": post.title, "html": html}
+    await set_cached(key, fragment, ttl=3600)
+    return fragment
+
+
+def _parse_tag_cursor(cursor: str | None) -> tuple[datetime, UUID]:
+    """タグ別一覧のカーソルを (投稿日時, ID) に変換 (未指定は先頭)"""
+    if not cursor:
+        return datetime.max, _MAX_UUID
+    try:
+        created_at, blog_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(created_at), UUID(blog_id)
+    except ValueError:
+        raise ValidationException(detail="カーソルが不正です")
+
+
+async def _load_liked_ids(blog_ids: list[UUID], user_id: UUID) -> set[UUID]:
+    """ログインユーザーがいいね済みのブログIDを一括取得 (件数はlike_countを使用)"""
+    if not blog_ids:
+        return set()
     return {
-        bid: {"count": like_counts.get(bid, 0), "is_liked": bid in liked_ids}
-        for bid in blog_ids
+        like["blog_post_id"]
+        for like in await BLT.select(BLT.blog_post_id).where(
+            BLT.blog_post_id.is_in(blog_ids) & (BLT.employee_id == user_id)
+        )
     }
 
 
@@ -85,7 +173,7 @@ async def _load_likes(blog_ids: list[UUID], user_id: UUID) -> dict[UUID, dict]:
 async def view_blogs(request: Request, page: int = 1) -> Template:
     page_size, total = 10, await B.count()
     blogs = (
-        await B.select(B.all_columns(), B.author_id.name)
+        await B.select(*_LIST_COLUMNS, B.author_id.name)
         .order_by(B.created_at, ascending=False)
         .limit(page_size)
         .offset((page - 1) * page_size)
@@ -99,21 +187,8 @@ async def view_blogs(request: Request, page: int = 1) -> Template:
     }
     blog_ids = [b["id"] for b in blogs]
     tags_map = await _load_tags(blog_ids)
-    likes_map = await _load_likes(blog_ids, request.state.user_id)
-    posts = [
-        BlogPost(
-            id=b["id"],
-            author_id=b["author_id"],
-            title=b["title"],
-            content=b["content"],
-            created_at=b["created_at"],
-            updated_at=b["updated_at"],
-            tags=tags_map.get(b["id"], []),
-            like_count=likes_map.get(b["id"], {}).get("count", 0),
-            is_liked=likes_map.get(b["id"], {}).get("is_liked", False),
-        )
-        for b in blogs
-    ]
+    liked_ids = await _load_liked_ids(blog_ids, request.state.user_id)
+    posts = [_to_list_post(b, tags_map, liked_ids) for b in blogs]
     pagination = ClassicPagination(
         items=posts,
         page_size=page_size,
@@ -125,6 +200,7 @@ async def view_blogs(request: Request, page: int = 1) -> Template:
         context={
             "pagination": pagination,
             "authors": authors,
+            "tag_cloud": [t for t in await get_all_tags() if t.usage_count],
             "user_id": request.state.user_id,
             "user_role": request.state.role.value,
         },
@@ -132,107 +208,85 @@ async def view_blogs(request: Request, page: int = 1) -> Template:
 
 
 @get("/blogs/{blog_id:uuid}/detail")
-async def view_blog_detail(request: Request, blog_id: UUID) -> Template:
-    result = (
-        await B.select(B.all_columns(), B.author_id.name).where(B.id == blog_id).first()
-    )
-    if not result:
+async def view_blog_detail(request: Request, blog_id: UUID) -> Template | Response:
+    # 更新日時・いいね状態だけを先に取得し、変化が無ければ描画せず304を返す
+    meta = await B.raw(_DETAIL_META_SQL, request.state.user_id, blog_id)
+    if not meta:
         raise NotFoundException(detail=f"Blog post with ID {blog_id} not found")
-    tags_map = await _load_tags([blog_id])
-    likes_map = await _load_likes([blog_id], request.state.user_id)
-    post = BlogPost(
-        id=result["id"],
-        author_id=result["author_id"],
-        title=result["title"],
-        content=result["content"],
-        created_at=result["created_at"],
-        updated_at=result["updated_at"],
-        tags=tags_map.get(blog_id, []),
-        like_count=likes_map.get(blog_id, {}).get("count", 0),
-        is_liked=likes_map.get(blog_id, {}).get("is_liked", False),
+    meta = meta[0]
+    # 投稿の更新日時と参照データ (タグ名・社員名) の版で検証
+    refdata_version = await get_version(REFDATA_VERSION_KEY)
+    version = f"{meta['updated_at'].timestamp()}-{refdata_version}"
+    can_edit = (
+        str(meta["author_id"]) == str(request.state.user_id)
+        or request.state.role.value == "admin"
     )
-    author = (
-        Employee(id=result["author_id"], name=result.get("author_id.name", "不明"))
-        if result["author_id"]
-        else None
+    etag = (
+        f'W/"{blog_id}-{version}-{meta["like_count"]}'
+        f'-{int(bool(meta["is_liked"]))}-{int(can_edit)}"'
+    )
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (t.strip() for t in if_none_match.split(",")):
+        return Response(content=None, status_code=304, headers=_detail_headers(etag))
+
+    fragment = await _render_detail_fragment(request, blog_id, version)
+    post = BlogPost(
+        id=blog_id,
+        author_id=meta["author_id"],
+        title=fragment["title"],
+        like_count=meta["like_count"],
+        is_liked=bool(meta["is_liked"]),
     )
     return Template(
         "blog_detail.html",
         context={
+            "title": fragment["title"],
+            "post_html": Markup(fragment["html"]),
             "post": post,
-            "author": author,
             "user_id": request.state.user_id,
             "user_role": request.state.role.value,
         },
+        headers=_detail_headers(etag),
     )
 
 
 @get("/blogs/tag/{tag_id:uuid}")
-async def view_blogs_by_tag(request: Request, tag_id: UUID, page: int = 1) -> Template:
+async def view_blogs_by_tag(
+    request: Request, tag_id: UUID, cursor: str | None = None
+) -> Template:
     tag = await T.select().where(T.id == tag_id).first()
     if not tag:
         raise NotFoundException(detail=f"Tag with ID {tag_id} not found")
     tag_obj = Tag(id=tag["id"], name=tag["name"])
     page_size = 10
-    # タグに紐づくブログIDを取得
-    blog_post_relations = await BPT.select(BPT.blog_post_id).where(BPT.tag_id == tag_id)
-    blog_ids = [r["blog_post_id"] for r in blog_post_relations]
-    if not blog_ids:
-        return Template(
-            "blog_tag_list.html",
-            context={
-                "tag": tag_obj,
-                "pagination": ClassicPagination(
-                    items=[], page_size=page_size, current_page=page, total_pages=0
-                ),
-                "authors": {},
-                "user_id": request.state.user_id,
-                "user_role": request.state.role.value,
-            },
-        )
-    total = len(blog_ids)
-    offset = (page - 1) * page_size
-    paginated_ids = blog_ids[offset : offset + page_size]
-    blogs = (
-        await B.select()
-        .where(B.id.is_in(paginated_ids))
-        .order_by(B.created_at, ascending=False)
+    # カーソル (投稿日時_ID) より古い投稿を (tag_id, post_created_at) 索引で取得
+    after_created_at, after_id = _parse_tag_cursor(cursor)
+    blogs = await BPT.raw(
+        _TAG_PAGE_SQL, tag_id, after_created_at, after_id, page_size + 1
     )
-    author_ids = {b["author_id"] for b in blogs}
-    authors = {}
-    if author_ids:
-        authors = {
-            e["id"]: Employee(id=e["id"], name=e["name"])
-            for e in await E.select(E.id, E.name).where(E.id.is_in(author_ids))
-        }
-    blog_ids_list = [b["id"] for b in blogs]
-    tags_map = await _load_tags(blog_ids_list)
-    likes_map = await _load_likes(blog_ids_list, request.state.user_id)
-    posts = [
-        BlogPost(
-            id=b["id"],
-            author_id=b["author_id"],
-            title=b["title"],
-            content=b["content"],
-            created_at=b["created_at"],
-            updated_at=b["updated_at"],
-            tags=tags_map.get(b["id"], []),
-            like_count=likes_map.get(b["id"], {}).get("count", 0),
-            is_liked=likes_map.get(b["id"], {}).get("is_liked", False),
-        )
+    next_cursor = None
+    if len(blogs) > page_size:
+        blogs = blogs[:page_size]
+        next_cursor = f"{blogs[-1]['created_at'].isoformat()}_{blogs[-1]['id']}"
+    authors = {
+        b["author_id"]: Employee(id=b["author_id"], name=b["author_name"] or "不明")
         for b in blogs
-    ]
-    pagination = ClassicPagination(
-        items=posts,
-        page_size=page_size,
-        current_page=page,
-        total_pages=(total + page_size - 1) // page_size,
+    }
+    blog_ids = [b["id"] for b in blogs]
+    tags_map = await _load_tags(blog_ids)
+    liked_ids = await _load_liked_ids(blog_ids, request.state.user_id)
+    pagination = CursorPagination(
+        items=[_to_list_post(b, tags_map, liked_ids) for b in blogs],
+        results_per_page=page_size,
+        cursor=next_cursor,
     )
     return Template(
         "blog_tag_list.html",
         context={
             "tag": tag_obj,
             "pagination": pagination,
+            "current_cursor": cursor or "",
+            "total": tag["usage_count"],
             "authors": authors,
             "user_id": request.state.user_id,
             "user_role": request.state.role.value,
@@ -246,7 +300,7 @@ async def view_my_blogs(request: Request, page: int = 1) -> Template:
     page_size = 10
     total = await B.count().where(B.author_id == user_id)
     blogs = (
-        await B.select()
+        await B.select(*_LIST_COLUMNS)
         .where(B.author_id == user_id)
         .order_by(B.created_at, ascending=False)
         .limit(page_size)
@@ -254,21 +308,8 @@ async def view_my_blogs(request: Request, page: int = 1) -> Template:
     )
     blog_ids = [b["id"] for b in blogs]
     tags_map = await _load_tags(blog_ids)
-    likes_map = await _load_likes(blog_ids, user_id)
-    posts = [
-        BlogPost(
-            id=b["id"],
-            author_id=b["author_id"],
-            title=b["title"],
-            content=b["content"],
-            created_at=b["created_at"],
-            updated_at=b["updated_at"],
-            tags=tags_map.get(b["id"], []),
-            like_count=likes_map.get(b["id"], {}).get("count", 0),
-            is_liked=likes_map.get(b["id"], {}).get("is_liked", False),
-        )
-        for b in blogs
-    ]
+    liked_ids = await _load_liked_ids(blog_ids, user_id)
+    posts = [_to_list_post(b, tags_map, liked_ids) for b in blogs]
     pagination = ClassicPagination(
         items=posts,
         page_size=page_size,
@@ -287,7 +328,7 @@ async def view_my_blogs(request: Request, page: int = 1) -> Template:
 
 @get("/blogs/register")
 async def show_blog_register_form() -> Template:
-    all_tags = [Tag(id=t["id"], name=t["name"]) for t in await T.select()]
+    all_tags = await get_all_tags()
     return Template("blog_register.html", context={"success": False, "tags": all_tags})
 
 
@@ -297,30 +338,33 @@ async def register_blog(request: Request, data: FormData) -> Template:
         author_id=request.state.user_id,
         title=data["title"],
         content=data["content"],
+        excerpt=make_excerpt(data["content"]),
         created_at=datetime.now(),
         updated_at=datetime.now(),
     )
-    await B(
-        id=post.id,
-        author_id=post.author_id,
-        title=post.title,
-        content=post.content,
-        created_at=post.created_at,
-        updated_at=post.updated_at,
-    ).save()
-    # タグ関連を保存
-    tag_ids = data.get("tag_ids", "").split(",")
-    for tag_id in filter(None, tag_ids):
-        await BPT(blog_post_id=post.id, tag_id=UUID(tag_id.strip())).save()
-    await delete_cached("blogs:list")
-    await delete_cached("dashboard:stats")
-    all_tags = [Tag(id=t["id"], name=t["name"]) for t in await T.select()]
+    async with B._meta.db.transaction():
+        await B(
+            id=post.id,
+            author_id=post.author_id,
+            title=post.title,
+            content=post.content,
+            excerpt=post.excerpt,
+            created_at=post.created_at,
+            updated_at=post.updated_at,
+        ).save()
+        # タグ関連を保存
+        tag_ids = parse_tag_ids(data.get("tag_ids", ""))
+        tags_changed = await set_post_tags(post.id, post.created_at, tag_ids)
+    await delete_cached("blogs:list", "dashboard:stats")
+    if tags_changed:
+        await invalidate_tags()
+    all_tags = await get_all_tags()
     return Template("blog_register.html", context={"success": True, "tags": all_tags})
 
 
 @get("/blogs/{blog_id:uuid}/edit")
 async def show_blog_edit_form(request: Request, blog_id: UUID) -> Template:
-    result = await _get_or_404(blog_id)
+    result = await blog_post_repo.get_or_404(blog_id)
     if (
         str(result["author_id"]) != str(request.state.user_id)
         and request.state.role.value != "admin"
@@ -336,61 +380,59 @@ async def show_blog_edit_form(request: Request, blog_id: UUID) -> Template:
         updated_at=result["updated_at"],
         tags=tags_map.get(blog_id, []),
     )
-    all_tags = [Tag(id=t["id"], name=t["name"]) for t in await T.select()]
+    all_tags = await get_all_tags()
     return Template("blog_edit.html", context={"post": post, "tags": all_tags})
 
 
 @post("/blogs/{blog_id:uuid}/edit")
 async def edit_blog(request: Request, blog_id: UUID, data: FormData) -> Redirect:
-    result = await _get_or_404(blog_id)
+    result = await blog_post_repo.get_or_404(blog_id)
     if (
         str(result["author_id"]) != str(request.state.user_id)
         and request.state.role.value != "admin"
     ):
         raise NotFoundException(detail="You don't have permission to edit this post")
-    await B.update(
-        {
-            B.title: data["title"],
-            B.content: data["content"],
-            B.updated_at: datetime.now(),
-        }
-    ).where(B.id == blog_id)
-    # タグ関連を更新
-    await BPT.delete().where(BPT.blog_post_id == blog_id)
-    tag_ids = data.get("tag_ids", "").split(",")
-    for tag_id in filter(None, tag_ids):
-        await BPT(blog_post_id=blog_id, tag_id=UUID(tag_id.strip())).save()
-    await delete_cached("blogs:list")
-    await delete_cached("dashboard:stats")
+    async with B._meta.db.transaction():
+        await B.update(
+            {
+                B.title: data["title"],
+                B.content: data["content"],
+                B.excerpt: make_excerpt(data["content"]),
+                B.updated_at: datetime.now(),
+            }
+        ).where(B.id == blog_id)
+        # タグ関連は差分のみ更新
+        tag_ids = parse_tag_ids(data.get("tag_ids", ""))
+        tags_changed = await set_post_tags(blog_id, result["created_at"], tag_ids)
+    await delete_cached("blogs:list", f"blogs:detail:{blog_id}", "dashboard:stats")
+    if tags_changed:
+        await invalidate_tags()
     return Redirect(path="/blogs/view")
 
 
 @post("/blogs/{blog_id:uuid}/delete")
 async def delete_blog(request: Request, blog_id: UUID) -> Redirect:
-    result = await _get_or_404(blog_id)
+    result = await blog_post_repo.get_or_404(blog_id)
     if (
         str(result["author_id"]) != str(request.state.user_id)
         and request.state.role.value != "admin"
     ):
         raise NotFoundException(detail="You don't have permission to delete this post")
     await B.delete().where(B.id == blog_id)
-    await delete_cached("blogs:list")
-    await delete_cached("dashboard:stats")
+    await forget_post(blog_id)
+    await delete_cached("blogs:list", f"blogs:detail:{blog_id}", "dashboard:stats")
+    # タグ付けもCASCADEで消えるため使用数を読み直す
+    await invalidate_tags()
     return Redirect(path="/blogs/view")
 
 
 @post("/blogs/{blog_id:uuid}/like")
 async def like_blog(request: Request, blog_id: UUID, data: FormData) -> Redirect:
     """いいねを追加"""
-    await _get_or_404(blog_id)
-    employee_id = request.state.user_id
-    # 既にいいね済みか確認
-    if not await BLT.exists().where(
-        (BLT.blog_post_id == blog_id) & (BLT.employee_id == employee_id)
-    ):
-        await BLT(
-            blog_post_id=blog_id, employee_id=employee_id, created_at=datetime.now()
-        ).save()
+    added, like_count = await add_like(blog_id, request.state.user_id)
+    if like_count is None:
+        raise NotFoundException(detail=f"Blog post with ID {blog_id} not found")
+    if added:
         await delete_cached("dashboard:stats")
     # リダイレクト先を取得
     redirect_path = data.get("redirect", "/blogs/view")
@@ -400,12 +442,10 @@ async def like_blog(request: Request, blog_id: UUID, data: FormData) -> Redirect
 @post("/blogs/{blog_id:uuid}/unlike")
 async def unlike_blog(request: Request, blog_id: UUID, data: FormData) -> Redirect:
     """いいねを削除"""
-    await _get_or_404(blog_id)
-    employee_id = request.state.user_id
-    deleted = await BLT.delete().where(
-        (BLT.blog_post_id == blog_id) & (BLT.employee_id == employee_id)
-    )
-    if deleted:
+    removed, like_count = await remove_like(blog_id, request.state.user_id)
+    if like_count is None:
+        raise NotFoundException(detail=f"Blog post with ID {blog_id} not found")
+    if removed:
         await delete_cached("dashboard:stats")
     # リダイレクト先を取得
     redirect_path = data.get("redirect", "/blogs/view")
@@ -4,21 +4,30 @@ from litestar import Request, Router, get
 from litestar.response import Template
 
 from app.auth import session_auth_guard
-from models import ChatMessageTable, EmployeeTable
+from app.directory import get_directory
+from app.statements import PreparedQuery
+from models import ChatMessageTable
+
+_UNREAD_COUNTS_SQL = (
+    "SELECT sender_id, COUNT(*) as count FROM chat_messages "
+    "WHERE receiver_id = {} AND is_read = FALSE GROUP BY sender_id"
+)
+# 送信者ごとの未読件数 (チャット画面を開くたびに実行される)
+_unread_counts = PreparedQuery(
+    "chat_unread_counts",
+    _UNREAD_COUNTS_SQL.format("$1"),
+    lambda user_id: ChatMessageTable.raw(_UNREAD_COUNTS_SQL, user_id),
+)
 
 
 @get("/chat")
 async def view_chat(request: Request) -> Template:
     """チャット画面"""
     current_user_id = UUID(request.state.user_id)
-    employees = await EmployeeTable.select().order_by(EmployeeTable.name)
+    employees = list((await get_directory()).values())
 
     # 全社員の未読件数を1クエリで取得
-    unread_msgs = await ChatMessageTable.raw(
-        "SELECT sender_id, COUNT(*) as count FROM chat_messages "
-        "WHERE receiver_id = {} AND is_read = FALSE GROUP BY sender_id",
-        current_user_id,
-    )
+    unread_msgs = await _unread_counts.fetch(current_user_id)
     unread_counts = {str(row["sender_id"]): row["count"] for row in unread_msgs}
 
     return Template(
@@ -35,10 +44,9 @@ async def view_chat(request: Request) -> Template:
 async def view_chat_with_user(user_id: UUID, request: Request) -> Template:
     """特定ユーザーとのチャット画面"""
     current_user_id = UUID(request.state.user_id)
-    employees = await EmployeeTable.select().order_by(EmployeeTable.name)
-    selected_user = (
-        await EmployeeTable.select().where(EmployeeTable.id == user_id).first()
-    )
+    directory = await get_directory()
+    employees = list(directory.values())
+    selected_user = directory.get(user_id)
 
     # 選択中ユーザーのメッセージを既読にする
     await ChatMessageTable.update({ChatMessageTable.is_read: True}).where(
@@ -47,11 +55,7 @@ async def view_chat_with_user(user_id: UUID, request: Request) -> Template:
     )
 
     # 全社員の未読件数を1クエリで取得
-    unread_msgs = await ChatMessageTable.raw(
-        "SELECT sender_id, COUNT(*) as count FROM chat_messages "
-        "WHERE receiver_id = {} AND is_read = FALSE GROUP BY sender_id",
-        current_user_id,
-    )
+    unread_msgs = await _unread_counts.fetch(current_user_id)
     unread_counts = {str(row["sender_id"]): row["count"] for row in unread_msgs}
 
     return Template(
@@ -1,20 +1,22 @@
-from datetime import date, timedelta
+import asyncio
 from uuid import UUID
 
-from litestar import Router, get
-from litestar.response import Template
+from litestar import Request, Router, get
+from litestar.response import ServerSentEvent, Template
 
+from app.alerts import get_alert_digest
 from app.auth import session_auth_guard
-from app.cache import get_cached, set_cached
+from app.directory import get_employee_name
+from app.likes import get_top_liked
+from app.live import live_events
+from app.refdata import get_refdata
+from app.warmup import cache_loader, load_cached
 from models import (
     BlogLikeTable as BLT,
 )
 from models import (
     BlogPostTable as B,
 )
-from models import (
-    DepartmentTable as D,
-)
 from models import (
     EmployeeTable as E,
 )
@@ -23,18 +25,16 @@ from models import (
 )
 
 
-@get("/dashboard")
-async def view_dashboard() -> Template:
-    if cached := await get_cached("dashboard:stats"):
-        return Template(template_name="dashboard.html", context=cached)
-
-    departments = await D.select()
-    employees = await E.select(E.all_columns())
+@cache_loader("dashboard:stats")
+async def load_dashboard_stats() -> dict:
+    # バージョン番号とダイジェストの読み込みは1回のMGETにまとまる
+    refdata, digest = await asyncio.gather(get_refdata(), get_alert_digest())
+    departments = refdata.departments.values()
+    employees = await E.select(E.id, E.department_id)
     pcs = await P.select(P.all_columns())
 
     dept_stats: dict[UUID, dict[str, str | int]] = {
-        d["id"]: {"name": d["name"], "employee_count": 0, "pc_count": 0}
-        for d in departments
+        d.id: {"name": d.name, "employee_count": 0, "pc_count": 0} for d in departments
     }
 
     for emp in employees:
@@ -53,37 +53,15 @@ async def view_dashboard() -> Template:
         elif not pc["assigned_to"]:
             unassigned_pc_count += 1
 
-    # アラート取得(7日以内)
-    today = date.today()
-    target_date = today + timedelta(days=7)
-    alerts = {"resignations": [], "transfers": []}
-
-    # PC割り当て状況を取得
-    pc_assignments = {pc["assigned_to"]: pc for pc in pcs if pc["assigned_to"]}
-
-    for emp in employees:
-        has_pc = emp["id"] in pc_assignments
-        if emp["resignation_date"] and today <= emp["resignation_date"] <= target_date:
-            alerts["resignations"].append(
-                {
-                    "name": emp["name"],
-                    "date": emp["resignation_date"].isoformat(),
-                    "days_left": (emp["resignation_date"] - today).days,
-                    "returned": not has_pc,
-                }
-            )
-        if emp["transfer_date"] and today <= emp["transfer_date"] <= target_date:
-            alerts["transfers"].append(
-                {
-                    "name": emp["name"],
-                    "date": emp["transfer_date"].isoformat(),
-                    "days_left": (emp["transfer_date"] - today).days,
-                    "returned": not has_pc,
-                }
-            )
+    # 退職・異動アラート (スケジューラが保存した当日分のダイジェスト)
+    alerts = {
+        "days": digest["days"],
+        "resignations": digest["resignations"],
+        "transfers": digest["transfers"],
+    }
 
     # ブログ統計: 投稿数トップ5
-    blog_posts = await B.select()
+    blog_posts = await B.select(B.author_id)
     author_post_counts: dict[UUID, int] = {}
     for post in blog_posts:
         author_id = post["author_id"]
@@ -92,35 +70,22 @@ async def view_dashboard() -> Template:
     top_authors = sorted(author_post_counts.items(), key=lambda x: x[1], reverse=True)[
         :5
     ]
-    top_authors_data = []
-    if top_authors:
-        author_ids = [author_id for author_id, _ in top_authors]
-        authors_info = {
-            e["id"]: e["name"]
-            for e in await E.select(E.id, E.name).where(E.id.is_in(author_ids))
-        }
-        top_authors_data = [
-            {"name": authors_info.get(author_id, "不明"), "count": count}
-            for author_id, count in top_authors
-        ]
+    # 並べて取得し、バージョン番号の確認を1回にまとめる
+    names = await asyncio.gather(*(get_employee_name(a) for a, _ in top_authors))
+    top_authors_data = [
+        {"name": name, "count": count} for name, (_, count) in zip(names, top_authors)
+    ]
 
-    # ブログ統計: いいね数トップ5
-    blog_ids = [post["id"] for post in blog_posts]
-    blog_like_counts: dict[UUID, int] = {}
-    if blog_ids:
-        likes = await BLT.select(BLT.blog_post_id).where(
-            BLT.blog_post_id.is_in(blog_ids)
-        )
-        for like in likes:
-            blog_id = like["blog_post_id"]
-            blog_like_counts[blog_id] = blog_like_counts.get(blog_id, 0) + 1
-
-    top_liked_blogs = sorted(
-        blog_like_counts.items(), key=lambda x: x[1], reverse=True
-    )[:5]
+    # ブログ統計: いいね数トップ5 (Redisのランキングから取得)
+    top_liked_blogs = await get_top_liked(5)
     top_liked_data = []
     if top_liked_blogs:
-        blogs_dict = {post["id"]: post["title"] for post in blog_posts}
+        blogs_dict = {
+            b["id"]: b["title"]
+            for b in await B.select(B.id, B.title).where(
+                B.id.is_in([blog_id for blog_id, _ in top_liked_blogs])
+            )
+        }
         top_liked_data = [
             {"title": blogs_dict.get(blog_id, "不明")[:30], "likes": likes}
             for blog_id, likes in top_liked_blogs
@@ -134,16 +99,40 @@ async def view_dashboard() -> Template:
         "total_departments": len(departments),
         "alerts": alerts,
         "total_blog_posts": len(blog_posts),
-        "total_blog_likes": sum(blog_like_counts.values()),
+        "total_blog_likes": await BLT.count(),
         "top_authors": top_authors_data,
         "top_liked_blogs": top_liked_data,
     }
-    await set_cached("dashboard:stats", context)
-    return Template(template_name="dashboard.html", context=context)
+    return context
+
+
+@get("/dashboard")
+async def view_dashboard() -> Template:
+    return Template(
+        template_name="dashboard.html", context=await load_cached("dashboard:stats")
+    )
+
+
+@get("/dashboard/events")
+async def dashboard_events(request: Request) -> ServerSentEvent:
+    """ダッシュボードのライブ更新 (統計と再描画済みのアラート・部署別詳細)"""
+    engine = request.app.template_engine
+
+    async def build() -> dict:
+        stats = await load_cached("dashboard:stats")
+        return {
+            **stats,
+            "alerts_html": engine.get_template("dashboard_alerts.html").render(**stats),
+            "departments_html": engine.get_template(
+                "dashboard_departments.html"
+            ).render(**stats),
+        }
+
+    return ServerSentEvent(live_events("dashboard", build))
 
 
 dashboard_web_router = Router(
     path="",
-    route_handlers=[view_dashboard],
+    route_handlers=[view_dashboard, dashboard_events],
     guards=[session_auth_guard],
 )
@@ -3,26 +3,20 @@ from uuid import UUID
 
 from litestar import Request, Router, get, post
 from litestar.enums import RequestEncodingType
-from litestar.exceptions import NotFoundException
 from litestar.pagination import ClassicPagination
 from litestar.params import Body
 from litestar.response import Redirect, Template
 
 from app.auth import admin_guard, session_auth_guard
 from app.cache import delete_cached
+from app.refdata import invalidate_refdata
+from app.repository import department_repo
 from models import Department
 from models import DepartmentTable as D
 
 FormData = Annotated[dict[str, str], Body(media_type=RequestEncodingType.URL_ENCODED)]
 
 
-async def _get_or_404(department_id: UUID) -> dict:
-    """部署を取得、存在しなければ404エラー"""
-    if not await D.exists().where(D.id == department_id):
-        raise NotFoundException(detail=f"Department with ID {department_id} not found")
-    return await D.select().where(D.id == department_id).first()
-
-
 @get("/departments/view")
 async def view_departments(request: Request, page: int = 1) -> Template:
     page_size, total = 10, await D.count()
@@ -54,12 +48,13 @@ async def register_department(data: FormData) -> Template:
     dept = Department(name=data["name"])
     await D(id=dept.id, name=dept.name).save()
     await delete_cached("departments:list", "dashboard:stats")
+    await invalidate_refdata()
     return Template(template_name="department_register.html", context={"success": True})
 
 
 @get("/departments/{department_id:uuid}/edit", guards=[admin_guard])
 async def show_department_edit_form(department_id: UUID) -> Template:
-    result = await _get_or_404(department_id)
+    result = await department_repo.get_or_404(department_id)
     return Template(
         template_name="department_edit.html",
         context={"department": Department(id=result["id"], name=result["name"])},
@@ -68,17 +63,17 @@ async def show_department_edit_form(department_id: UUID) -> Template:
 
 @post("/departments/{department_id:uuid}/edit", guards=[admin_guard])
 async def edit_department_form(department_id: UUID, data: FormData) -> Redirect:
-    await _get_or_404(department_id)
-    await D.update({D.name: data["name"]}).where(D.id == department_id)
+    await department_repo.update_or_404(department_id, {D.name: data["name"]})
     await delete_cached("departments:list", "dashboard:stats")
+    await invalidate_refdata()
     return Redirect(path="/departments/view")
 
 
 @post("/departments/{department_id:uuid}/delete", guards=[admin_guard])
 async def delete_department_form(department_id: UUID) -> Redirect:
-    await _get_or_404(department_id)
-    await D.delete().where(D.id == department_id)
+    await department_repo.delete_or_404(department_id)
     await delete_cached("departments:list", "dashboard:stats")
+    await invalidate_refdata()
     return Redirect(path="/departments/view")
 
 
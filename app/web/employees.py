@@ -3,48 +3,33 @@ from uuid import UUID
 
 from litestar import Request, Router, get, post
 from litestar.enums import RequestEncodingType
-from litestar.exceptions import NotFoundException
 from litestar.pagination import ClassicPagination
 from litestar.params import Body
 from litestar.response import Redirect, Response, Template
+from piccolo.query.functions import Length
 
+from app.alerts import DIGEST_KEY
 from app.auth import admin_guard, session_auth_guard
 from app.cache import delete_cached
+from app.directory import invalidate_directory
+from app.likes import invalidate_top_liked
+from app.refdata import get_refdata
+from app.repository import employee_repo
 from app.utils import process_profile_image
 from models import Department, Employee, Role
-from models import DepartmentTable as D
 from models import EmployeeTable as E
 
 FormData = Annotated[dict[str, str], Body(media_type=RequestEncodingType.URL_ENCODED)]
 
 
-async def _get_or_404(employee_id: UUID) -> dict:
-    if not await E.exists().where(E.id == employee_id):
-        raise NotFoundException(detail=f"Employee with ID {employee_id} not found")
-    return await E.select().where(E.id == employee_id).first()
-
-
 async def _get_departments() -> list[Department]:
-    return [Department(id=d["id"], name=d["name"]) for d in await D.select()]
+    return list((await get_refdata()).departments.values())
 
 
 @get("/employees/{employee_id:uuid}/show")
 async def show_employee_detail(employee_id: UUID) -> Template:
-    result = await _get_or_404(employee_id)
-    emp = Employee(
-        id=result["id"],
-        name=result["name"],
-        email=result["email"],
-        department_id=result["department_id"],
-        resignation_date=result.get("resignation_date"),
-        transfer_date=result.get("transfer_date"),
-        role=Role(result.get("role", Role.USER.value)),
-    )
-    department = None
-    if emp.department_id and (
-        dept := await D.select().where(D.id == emp.department_id).first()
-    ):
-        department = Department(id=dept["id"], name=dept["name"])
+    emp = await employee_repo.get_model_or_404(employee_id)
+    department = (await get_refdata()).departments.get(emp.department_id)
     return Template(
         "employee_detail.html", context={"employee": emp, "department": department}
     )
@@ -62,11 +47,11 @@ async def view_employees(request: Request, page: int = 1) -> Template:
             resignation_date=e.get("resignation_date"),
             transfer_date=e.get("transfer_date"),
         )
-        for e in await E.select().limit(page_size).offset((page - 1) * page_size)
+        for e in await E.select(*employee_repo.default_columns)
+        .limit(page_size)
+        .offset((page - 1) * page_size)
     ]
-    departments = {
-        d["id"]: Department(id=d["id"], name=d["name"]) for d in await D.select()
-    }
+    departments = (await get_refdata()).departments
     pagination = ClassicPagination(
         items=employees,
         page_size=page_size,
@@ -134,7 +119,8 @@ async def register_employee(request: Request) -> Template:
         transfer_date=emp.transfer_date,
         role=emp.role.value,
     ).save()
-    await delete_cached("employees:list", "dashboard:stats")
+    await delete_cached("employees:list", "dashboard:stats", DIGEST_KEY)
+    await invalidate_directory()
     return Template(
         template_name="employee_register.html",
         context={"success": True, "departments": await _get_departments()},
@@ -143,16 +129,7 @@ async def register_employee(request: Request) -> Template:
 
 @get("/employees/{employee_id:uuid}/edit", guards=[admin_guard])
 async def show_employee_edit_form(employee_id: UUID) -> Template:
-    result = await _get_or_404(employee_id)
-    emp = Employee(
-        id=result["id"],
-        name=result["name"],
-        email=result["email"],
-        department_id=result["department_id"],
-        resignation_date=result.get("resignation_date"),
-        transfer_date=result.get("transfer_date"),
-        role=Role(result.get("role", Role.USER.value)),
-    )
+    emp = await employee_repo.get_model_or_404(employee_id)
     return Template(
         template_name="employee_edit.html",
         context={"employee": emp, "departments": await _get_departments()},
@@ -163,7 +140,6 @@ async def show_employee_edit_form(employee_id: UUID) -> Template:
 async def edit_employee_form(employee_id: UUID, data: FormData) -> Redirect:
     from datetime import datetime
 
-    await _get_or_404(employee_id)
     dept_id = UUID(data["department_id"]) if data.get("department_id") else None
     resignation_date = (
         datetime.fromisoformat(data["resignation_date"]).date()
@@ -176,7 +152,8 @@ async def edit_employee_form(employee_id: UUID, data: FormData) -> Redirect:
         else None
     )
     role = Role(data.get("role", Role.USER.value))
-    await E.update(
+    await employee_repo.update_or_404(
+        employee_id,
         {
             E.name: data["name"],
             E.email: data["email"],
@@ -184,36 +161,39 @@ async def edit_employee_form(employee_id: UUID, data: FormData) -> Redirect:
             E.resignation_date: resignation_date,
             E.transfer_date: transfer_date,
             E.role: role.value,
-        }
-    ).where(E.id == employee_id)
-    await delete_cached("employees:list", "dashboard:stats")
+        },
+    )
+    await delete_cached("employees:list", "dashboard:stats", DIGEST_KEY)
+    await invalidate_directory()
     return Redirect(path="/employees/view")
 
 
 @post("/employees/{employee_id:uuid}/delete", guards=[admin_guard])
 async def delete_employee_form(employee_id: UUID) -> Redirect:
-    await _get_or_404(employee_id)
-    await E.delete().where(E.id == employee_id)
-    await delete_cached("employees:list", "dashboard:stats")
+    await employee_repo.delete_or_404(employee_id)
+    await delete_cached("employees:list", "dashboard:stats", DIGEST_KEY)
+    await invalidate_directory()
+    # CASCADEで消えたいいねをランキングに反映
+    await invalidate_top_liked()
     return Redirect(path="/employees/view")
 
 
 @post("/employees/{employee_id:uuid}/upload-image", guards=[admin_guard])
 async def upload_employee_image(employee_id: UUID, request: Request) -> Redirect:
-    await _get_or_404(employee_id)
     form = await request.form()
     if file := form.get("data"):
         try:
             processed = process_profile_image(await file.read())
-            await E.update({E.profile_image: processed}).where(E.id == employee_id)
         except ValueError:
             pass
+        else:
+            await employee_repo.update_or_404(employee_id, {E.profile_image: processed})
     return Redirect(path=f"/employees/{employee_id}/edit")
 
 
 @get("/employees/{employee_id:uuid}/image")
 async def get_employee_image(employee_id: UUID) -> Response:
-    emp = await _get_or_404(employee_id)
+    emp = await employee_repo.get_or_404(employee_id, E.profile_image)
     if not (img := emp.get("profile_image")):
         # 1x1透明GIF
         return Response(
@@ -228,19 +208,14 @@ async def view_mypage(request: Request) -> Template:
     from models import PCTable as P
 
     user_id = request.state.user_id
-    emp = await _get_or_404(user_id)
-    employee = Employee(
-        id=emp["id"],
-        name=emp["name"],
-        email=emp["email"],
-        department_id=emp["department_id"],
-        profile_image=emp.get("profile_image"),
-        role=Role(emp.get("role", Role.USER.value)),
+    # 画像本体は取得せず、有無だけを判定
+    emp = await employee_repo.get_or_404(
+        user_id,
+        *employee_repo.default_columns,
+        Length(E.profile_image, alias="profile_image_size"),
     )
-    department = None
-    if emp["department_id"]:
-        if dept := await D.select().where(D.id == emp["department_id"]).first():
-            department = Department(id=dept["id"], name=dept["name"])
+    employee = employee_repo.to_model(emp)
+    department = (await get_refdata()).departments.get(emp["department_id"])
     assigned_pc = None
     if pc := await P.select().where(P.assigned_to == user_id).first():
         from models import PC
@@ -255,6 +230,7 @@ async def view_mypage(request: Request) -> Template:
         "mypage.html",
         context={
             "employee": employee,
+            "has_profile_image": bool(emp["profile_image_size"]),
             "department": department,
             "assigned_pc": assigned_pc,
         },
@@ -3,26 +3,20 @@ from uuid import UUID
 
 from litestar import Request, Router, get, post
 from litestar.enums import RequestEncodingType
-from litestar.exceptions import NotFoundException
 from litestar.pagination import ClassicPagination
 from litestar.params import Body
 from litestar.response import Redirect, Template
 
 from app.auth import admin_guard, session_auth_guard
 from app.cache import delete_cached
+from app.refdata import invalidate_refdata
+from app.repository import meeting_room_repo
 from models import MeetingRoom
 from models import MeetingRoomTable as MR
 
 FormData = Annotated[dict[str, str], Body(media_type=RequestEncodingType.URL_ENCODED)]
 
 
-async def _get_or_404(room_id: UUID) -> dict:
-    """会議室を取得、存在しなければ404エラー"""
-    if not await MR.exists().where(MR.id == room_id):
-        raise NotFoundException(detail=f"Meeting room with ID {room_id} not found")
-    return await MR.select().where(MR.id == room_id).first()
-
-
 @get("/meeting_rooms/view")
 async def view_meeting_rooms(request: Request, page: int = 1) -> Template:
     page_size, total = 10, await MR.count()
@@ -71,6 +65,7 @@ async def register_meeting_room(data: FormData) -> Template:
         equipment=room.equipment,
     ).save()
     await delete_cached("meeting_rooms:list")
+    await invalidate_refdata()
     return Template(
         template_name="meeting_room_register.html", context={"success": True}
     )
@@ -78,7 +73,7 @@ async def register_meeting_room(data: FormData) -> Template:
 
 @get("/meeting_rooms/{room_id:uuid}/edit", guards=[admin_guard])
 async def show_meeting_room_edit_form(room_id: UUID) -> Template:
-    result = await _get_or_404(room_id)
+    result = await meeting_room_repo.get_or_404(room_id)
     return Template(
         template_name="meeting_room_edit.html",
         context={
@@ -95,24 +90,25 @@ async def show_meeting_room_edit_form(room_id: UUID) -> Template:
 
 @post("/meeting_rooms/{room_id:uuid}/edit", guards=[admin_guard])
 async def edit_meeting_room_form(room_id: UUID, data: FormData) -> Redirect:
-    await _get_or_404(room_id)
-    await MR.update(
+    await meeting_room_repo.update_or_404(
+        room_id,
         {
             MR.name: data["name"],
             MR.capacity: int(data["capacity"]),
             MR.location: data["location"],
             MR.equipment: data.get("equipment", ""),
-        }
-    ).where(MR.id == room_id)
+        },
+    )
     await delete_cached("meeting_rooms:list")
+    await invalidate_refdata()
     return Redirect(path="/meeting_rooms/view")
 
 
 @post("/meeting_rooms/{room_id:uuid}/delete", guards=[admin_guard])
 async def delete_meeting_room_form(room_id: UUID) -> Redirect:
-    await _get_or_404(room_id)
-    await MR.delete().where(MR.id == room_id)
+    await meeting_room_repo.delete_or_404(room_id)
     await delete_cached("meeting_rooms:list")
+    await invalidate_refdata()
     return Redirect(path="/meeting_rooms/view")
 
 
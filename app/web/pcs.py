@@ -1,35 +1,36 @@
-from datetime import datetime
+import asyncio
+from collections.abc import Mapping
+from datetime import date, datetime, time, timedelta
 from typing import Annotated
 from uuid import UUID, uuid4
 
 from litestar import Request, Router, get, post
 from litestar.enums import RequestEncodingType
-from litestar.exceptions import NotFoundException
+from litestar.exceptions import NotFoundException, ValidationException
 from litestar.pagination import ClassicPagination
 from litestar.params import Body
-from litestar.response import Redirect, Response, Template
+from litestar.response import Redirect, Response, ServerSentEvent, Template
 from pydantic import BaseModel
 
+from app.alerts import DIGEST_KEY
 from app.auth import admin_guard, session_auth_guard
 from app.cache import delete_cached
+from app.directory import get_directory, get_employee_name
+from app.live import live_events
+from app.refdata import get_refdata
+from app.repository import pc_repo
 from app.slack import (
     format_pc_created,
     format_pc_deleted,
     format_pc_updated,
     notify_slack,
 )
+from app.statements import PreparedQuery
 from app.utils import generate_random_pc_name
 from models import (
     PC,
     Department,
     Employee,
-    PCAssignmentHistory,
-)
-from models import (
-    DepartmentTable as D,
-)
-from models import (
-    EmployeeTable as E,
 )
 from models import (
     PCAssignmentHistoryTable as H,
@@ -51,23 +52,58 @@ async def _get_pc_or_404(pc_id: UUID) -> dict:
     return result
 
 
+def _history_rows():
+    """割り当て履歴とPC・社員・部署名を1クエリで取得 (新しい順)"""
+    return H.select(
+        H.id,
+        H.pc_id,
+        H.employee_id,
+        H.assigned_at,
+        H.pc_id.name.as_alias("pc_name"),
+        H.pc_id.model.as_alias("pc_model"),
+        H.employee_id.name.as_alias("employee_name"),
+        H.employee_id.department_id.as_alias("department_id"),
+        H.employee_id.department_id.name.as_alias("department_name"),
+    ).order_by(H.assigned_at, H.id, ascending=False)
+
+
+def _history_in_range(query, since: date | None, until: date | None):
+    """割り当て日時で絞り込み (パーティションプルーニング用)"""
+    if since:
+        query = query.where(H.assigned_at >= datetime.combine(since, time.min))
+    if until:
+        query = query.where(
+            H.assigned_at < datetime.combine(until + timedelta(days=1), time.min)
+        )
+    return query
+
+
+def _history_filtered(
+    query,
+    pc_id: UUID | None,
+    employee_id: str | None,
+    department_id: UUID | None,
+):
+    """PC・社員 ("unassigned" は未割り当て)・部署で絞り込み"""
+    if pc_id:
+        query = query.where(H.pc_id == pc_id)
+    if employee_id == "unassigned":
+        query = query.where(H.employee_id.is_null())
+    elif employee_id:
+        try:
+            query = query.where(H.employee_id == UUID(employee_id))
+        except ValueError:
+            raise ValidationException(detail=f"invalid employee_id: {employee_id}")
+    if department_id:
+        query = query.where(H.employee_id.department_id == department_id)
+    return query
+
+
 async def _get_employees_and_departments() -> tuple[
-    list[Employee], dict[UUID, Department]
+    list[Employee], Mapping[UUID, Department]
 ]:
-    employees = [
-        Employee(
-            id=e["id"],
-            name=e["name"],
-            email=e["email"],
-            department_id=e["department_id"],
-        )
-        for e in await E.select(E.id, E.name, E.email, E.department_id)
-    ]
-    departments = {
-        d["id"]: Department(id=d["id"], name=d["name"])
-        for d in await D.select(D.id, D.name)
-    }
-    return employees, departments
+    refdata = await get_refdata()
+    return list(refdata.employees.values()), refdata.departments
 
 
 @get("/pcs/{pc_id:uuid}/show")
@@ -80,32 +116,44 @@ async def show_pc_detail(pc_id: UUID) -> Template:
         serial_number=result["serial_number"],
         assigned_to=result["assigned_to"],
     )
-    assigned_employee = None
-    if pc.assigned_to and (
-        emp := await E.select().where(E.id == pc.assigned_to).first()
-    ):
-        assigned_employee = Employee(
-            id=emp["id"],
-            name=emp["name"],
-            email=emp["email"],
-            department_id=emp["department_id"],
-        )
+    assigned_employee = (await get_directory()).get(pc.assigned_to)
     return Template("pc_detail.html", context={"pc": pc, "employee": assigned_employee})
 
 
-@get("/pcs/view")
-async def view_pcs(request: Request, page: int = 1) -> Template:
-    page_size, total = 10, await P.count()
-    pc_data = (
-        await P.select(
+PC_PAGE_SIZE = 10
+
+
+# 総件数 (一覧の表示とライブ更新のたびに実行される)
+_PC_COUNT_SQL = "SELECT COUNT(*) AS count FROM pcs"
+_pc_count = PreparedQuery("pcs_count", _PC_COUNT_SQL, lambda: P.raw(_PC_COUNT_SQL))
+
+
+async def _pc_page(page: int) -> tuple[list[dict], int]:
+    """一覧の1ページ分 (割り当て先の社員情報付き) と総件数"""
+    pc_data, total = await asyncio.gather(
+        P.select(
             P.all_columns(),
             P.assigned_to.name,
             P.assigned_to.email,
             P.assigned_to.department_id,
         )
-        .limit(page_size)
-        .offset((page - 1) * page_size)
+        .limit(PC_PAGE_SIZE)
+        .offset((page - 1) * PC_PAGE_SIZE),
+        _pc_count.fetchval(),
     )
+    return pc_data, total
+
+
+def _assigned_label(pc: Mapping) -> str:
+    if not pc["assigned_to"]:
+        return "未割り当て"
+    return pc.get("assigned_to.name") or f"(不明なID: {pc['assigned_to']})"
+
+
+@get("/pcs/view")
+async def view_pcs(request: Request, page: int = 1) -> Template:
+    page_size = PC_PAGE_SIZE
+    pc_data, total = await _pc_page(page)
 
     pcs = [
         PC(
@@ -143,6 +191,29 @@ async def view_pcs(request: Request, page: int = 1) -> Template:
     )
 
 
+@get("/pcs/view/events")
+async def pc_list_events(page: int = 1) -> ServerSentEvent:
+    """PC一覧のライブ更新 (表示中のページの各PCと割り当て先)"""
+
+    async def build() -> dict:
+        pc_data, total = await _pc_page(page)
+        return {
+            "total": total,
+            "pcs": [
+                {
+                    "id": str(p["id"]),
+                    "name": p["name"],
+                    "model": p["model"],
+                    "serial_number": p["serial_number"],
+                    "assigned": _assigned_label(p),
+                }
+                for p in pc_data
+            ],
+        }
+
+    return ServerSentEvent(live_events("pcs", build, key=f"pcs:{page}"))
+
+
 @get("/pcs/register", guards=[admin_guard])
 async def show_register_form() -> Template:
     employees, departments = await _get_employees_and_departments()
@@ -174,13 +245,10 @@ async def register_pc(data: FormData) -> Template:
         await H(id=uuid4(), pc_id=pc.id, employee_id=assigned_to).save()
 
     # キャッシュ削除
-    await delete_cached("pcs:list", "history:all", "dashboard:stats")
+    await delete_cached("pcs:list", "history:all", "dashboard:stats", DIGEST_KEY)
 
     # Slack通知
-    assigned_name = None
-    if assigned_to:
-        if emp := await E.select().where(E.id == assigned_to).first():
-            assigned_name = emp["name"]
+    assigned_name = await get_employee_name(assigned_to, default=None)
     await notify_slack(
         format_pc_created(pc.name, pc.id, pc.model, pc.serial_number, assigned_name)
     )
@@ -225,13 +293,10 @@ async def edit_pc(pc_id: UUID, data: FormData) -> Redirect:
     ).where(P.id == pc_id)
 
     # キャッシュ削除
-    await delete_cached("pcs:list", "history:all", "dashboard:stats")
+    await delete_cached("pcs:list", "history:all", "dashboard:stats", DIGEST_KEY)
 
     # Slack通知
-    assigned_name = None
-    if assigned_to:
-        if emp := await E.select().where(E.id == assigned_to).first():
-            assigned_name = emp["name"]
+    assigned_name = await get_employee_name(assigned_to, default=None)
     await notify_slack(
         format_pc_updated(
             data["name"], pc_id, data["model"], data["serial_number"], assigned_name
@@ -243,11 +308,10 @@ async def edit_pc(pc_id: UUID, data: FormData) -> Redirect:
 
 @post("/pcs/{pc_id:uuid}/delete", guards=[admin_guard])
 async def delete_pc_form(pc_id: UUID) -> Redirect:
-    pc = await _get_pc_or_404(pc_id)
-    await P.delete().where(P.id == pc_id)
+    pc = await pc_repo.delete_or_404(pc_id, P.name, P.model, P.serial_number)
 
     # キャッシュ削除
-    await delete_cached("pcs:list", "history:all", "dashboard:stats")
+    await delete_cached("pcs:list", "history:all", "dashboard:stats", DIGEST_KEY)
 
     # Slack通知
     await notify_slack(
@@ -263,100 +327,79 @@ async def bulk_delete_pcs(data: BulkDeleteRequest) -> Response:
 
     pc_ids = [UUID(id) for id in data.pc_ids]
     await P.delete().where(P.id.is_in(pc_ids))
-    await delete_cached("pcs:list", "history:all", "dashboard:stats")
+    await delete_cached("pcs:list", "history:all", "dashboard:stats", DIGEST_KEY)
     return Response(content=f"{len(pc_ids)}台のPCを削除しました", status_code=200)
 
 
 @get("/pcs/{pc_id:uuid}/history/view")
 async def view_pc_assignment_history(pc_id: UUID) -> Template:
-    result = await _get_pc_or_404(pc_id)
-    pc = PC(
-        id=result["id"],
-        name=result["name"],
-        model=result["model"],
-        serial_number=result["serial_number"],
-        assigned_to=result["assigned_to"],
+    pc = await pc_repo.get_or_404(
+        pc_id,
+        P.id,
+        P.name,
+        P.model,
+        P.serial_number,
+        P.assigned_to,
+        P.assigned_to.name.as_alias("assigned_name"),
     )
-    histories = [
-        PCAssignmentHistory(
-            id=h["id"],
-            pc_id=h["pc_id"],
-            employee_id=h["employee_id"],
-            assigned_at=h["assigned_at"],
-            notes=h["notes"],
+    histories = await (
+        H.select(
+            H.id,
+            H.employee_id,
+            H.assigned_at,
+            H.employee_id.name.as_alias("employee_name"),
         )
-        for h in await H.select()
         .where(H.pc_id == pc_id)
-        .order_by(H.assigned_at, ascending=False)
-    ]
-    employees = {
-        e["id"]: Employee(
-            id=e["id"],
-            name=e["name"],
-            email=e["email"],
-            department_id=e["department_id"],
-        )
-        for e in await E.select(E.id, E.name, E.email, E.department_id)
-    }
+        .order_by(H.assigned_at, H.id, ascending=False)
+    )
     return Template(
         template_name="pc_history.html",
-        context={"pc": pc, "histories": histories, "employees": employees},
+        context={"pc": pc, "histories": histories},
     )
 
 
 @get("/history/view")
-async def view_all_assignment_history(page: int = 1) -> Template:
-    page_size, total = 10, await H.count()
-    histories = [
-        PCAssignmentHistory(
-            id=h["id"],
-            pc_id=h["pc_id"],
-            employee_id=h["employee_id"],
-            assigned_at=h["assigned_at"],
-            notes=h["notes"],
-        )
-        for h in await H.select()
-        .order_by(H.assigned_at, ascending=False)
+async def view_all_assignment_history(
+    page: int = 1,
+    since: date | None = None,
+    until: date | None = None,
+    pc_id: UUID | None = None,
+    employee_id: str | None = None,
+    department_id: UUID | None = None,
+) -> Template:
+    page_size = 10
+    filters = (pc_id, employee_id, department_id)
+    total, pcs, histories, refdata = await asyncio.gather(
+        _history_filtered(_history_in_range(H.count(), since, until), *filters),
+        P.select(P.id, P.name, P.model).order_by(P.name),
+        _history_filtered(_history_in_range(_history_rows(), since, until), *filters)
         .limit(page_size)
-        .offset((page - 1) * page_size)
-    ]
-    pcs = {
-        p["id"]: PC(
-            id=p["id"],
-            name=p["name"],
-            model=p["model"],
-            serial_number=p["serial_number"],
-            assigned_to=p["assigned_to"],
-        )
-        for p in await P.select(P.id, P.name, P.model, P.serial_number, P.assigned_to)
-    }
-    employees = {
-        e["id"]: Employee(
-            id=e["id"],
-            name=e["name"],
-            email=e["email"],
-            department_id=e["department_id"],
-        )
-        for e in await E.select(E.id, E.name, E.email, E.department_id)
-    }
-    departments = {
-        d["id"]: Department(id=d["id"], name=d["name"])
-        for d in await D.select(D.id, D.name)
-    }
+        .offset((page - 1) * page_size),
+        get_refdata(),
+    )
     pagination = ClassicPagination(
         items=histories,
         page_size=page_size,
         current_page=page,
         total_pages=(total + page_size - 1) // page_size,
     )
+    # 絞り込みの選択肢は全PC・全社員・全部署 (社員・部署は参照データのスナップショット)
+    # 絞り込みはページをまたいでサーバー側で行う
     return Template(
         template_name="assignment_history.html",
         context={
             "pagination": pagination,
             "total": total,
+            "pc_count": len(pcs),
+            "employee_count": len(refdata.employees),
             "pcs": pcs,
-            "employees": employees,
-            "departments": departments,
+            "employees": list(refdata.employees.values()),
+            "departments": list(refdata.departments.values()),
+            "since": since,
+            "until": until,
+            "pc_id": pc_id,
+            "employee_id": employee_id,
+            "department_id": department_id,
         },
     )
 
@@ -373,15 +416,7 @@ async def export_pcs_tsv() -> Response:
         )
         for p in await P.select(P.id, P.name, P.model, P.serial_number, P.assigned_to)
     ]
-    employees = {
-        e["id"]: Employee(
-            id=e["id"],
-            name=e["name"],
-            email=e["email"],
-            department_id=e["department_id"],
-        )
-        for e in await E.select(E.id, E.name, E.email, E.department_id)
-    }
+    employees = await get_directory()
 
     headers = ["ID", "名前", "モデル", "シリアル番号", "割り当て先"]
     rows = ["\t".join(headers)]
@@ -414,56 +449,23 @@ async def get_random_pc_name_web() -> Response:
 
 
 @get("/history/export")
-async def export_history_tsv() -> Response:
-    histories = [
-        PCAssignmentHistory(
-            id=h["id"],
-            pc_id=h["pc_id"],
-            employee_id=h["employee_id"],
-            assigned_at=h["assigned_at"],
-            notes=h["notes"],
-        )
-        for h in await H.select().order_by(H.assigned_at, ascending=False)
-    ]
-    pcs = {
-        p["id"]: PC(
-            id=p["id"],
-            name=p["name"],
-            model=p["model"],
-            serial_number=p["serial_number"],
-            assigned_to=p["assigned_to"],
-        )
-        for p in await P.select(P.id, P.name, P.model, P.serial_number, P.assigned_to)
-    }
-    employees = {
-        e["id"]: Employee(
-            id=e["id"],
-            name=e["name"],
-            email=e["email"],
-            department_id=e["department_id"],
-        )
-        for e in await E.select(E.id, E.name, E.email, E.department_id)
-    }
-    departments = {
-        d["id"]: Department(id=d["id"], name=d["name"])
-        for d in await D.select(D.id, D.name)
-    }
+async def export_history_tsv(
+    since: date | None = None, until: date | None = None
+) -> Response:
+    histories = await _history_in_range(_history_rows(), since, until)
 
     headers = ["割り当て日時", "PC名", "PCモデル", "割り当て先社員", "部署"]
     rows = ["\t".join(headers)]
 
     for history in histories:
-        assigned_at = history.assigned_at.strftime("%Y-%m-%d %H:%M:%S")
-        pc_name = pcs[history.pc_id].name if history.pc_id in pcs else "(削除済み)"
-        pc_model = pcs[history.pc_id].model if history.pc_id in pcs else "-"
-
-        if history.employee_id and history.employee_id in employees:
-            employee_name = employees[history.employee_id].name
-            dept_id = employees[history.employee_id].department_id
-            department_name = (
-                departments[dept_id].name if dept_id and dept_id in departments else "-"
-            )
-        elif history.employee_id:
+        assigned_at = history["assigned_at"].strftime("%Y-%m-%d %H:%M:%S")
+        pc_name = history["pc_name"] or "(削除済み)"
+        pc_model = history["pc_model"] or "-"
+
+        if history["employee_name"] is not None:
+            employee_name = history["employee_name"]
+            department_name = history["department_name"] or "-"
+        elif history["employee_id"]:
             employee_name = "(削除済み)"
             department_name = "-"
         else:
@@ -490,6 +492,7 @@ pc_web_router = Router(
     route_handlers=[
         show_pc_detail,
         view_pcs,
+        pc_list_events,
         show_register_form,
         register_pc,
         show_edit_form,
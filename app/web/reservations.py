@@ -1,25 +1,24 @@
+import asyncio
+from collections.abc import Mapping
 from datetime import datetime, timedelta
 from typing import Annotated
 from uuid import UUID
 
 from litestar import Request, Router, get, post
 from litestar.enums import RequestEncodingType
-from litestar.exceptions import NotFoundException
 from litestar.pagination import ClassicPagination
 from litestar.params import Body
 from litestar.response import Redirect, Template
 
 from app.auth import session_auth_guard
 from app.cache import delete_cached
-from models import (
-    EmployeeTable as E,
-)
+from app.directory import get_directory
+from app.refdata import get_refdata
+from app.repository import reservation_repo
+from models import Employee
 from models import (
     MeetingRoomReservationTable as MRR,
 )
-from models import (
-    MeetingRoomTable as MR,
-)
 from models import (
     ReservationParticipantTable as RP,
 )
@@ -27,55 +26,51 @@ from models import (
 FormData = Annotated[dict[str, str], Body(media_type=RequestEncodingType.URL_ENCODED)]
 
 
-async def _get_or_404(reservation_id: UUID) -> dict:
-    """予約を取得、存在しなければ404エラー"""
-    if not await MRR.exists().where(MRR.id == reservation_id):
-        raise NotFoundException(
-            detail=f"Reservation with ID {reservation_id} not found"
-        )
-    return await MRR.select().where(MRR.id == reservation_id).first()
-
-
-async def _get_participants(reservation_id: UUID) -> list[dict]:
-    """予約の参加者情報を取得"""
-    participants = await RP.select(RP.employee_id).where(
-        RP.reservation_id == reservation_id
+async def _get_participants(
+    reservation_ids: list[UUID], employees: Mapping[UUID, Employee]
+) -> dict[UUID, list[dict]]:
+    """予約ごとの参加者情報 (全予約分を1クエリで取得)"""
+    participants = {rid: [] for rid in reservation_ids}
+    if not reservation_ids:
+        return participants
+    rows = await RP.select(RP.reservation_id, RP.employee_id).where(
+        RP.reservation_id.is_in(reservation_ids)
     )
-    result = []
-    for p in participants:
-        emp = await E.select().where(E.id == p["employee_id"]).first()
-        if emp:
-            result.append({"id": emp["id"], "name": emp["name"]})
-    return result
+    for p in rows:
+        if emp := employees.get(p["employee_id"]):
+            participants[p["reservation_id"]].append({"id": emp.id, "name": emp.name})
+    return participants
 
 
 @get("/reservations/view")
 async def view_reservations(request: Request, page: int = 1) -> Template:
     """予約一覧表示"""
-    page_size, total = 10, await MRR.count()
-
-    reservations_data = (
-        await MRR.select()
+    page_size = 10
+    total, reservations_data, refdata = await asyncio.gather(
+        MRR.count(),
+        MRR.select()
         .order_by(MRR.start_time, ascending=False)
         .limit(page_size)
-        .offset((page - 1) * page_size)
+        .offset((page - 1) * page_size),
+        get_refdata(),
+    )
+    participants = await _get_participants(
+        [r["id"] for r in reservations_data], refdata.employees
     )
 
     reservations = []
     for r in reservations_data:
-        room = await MR.select().where(MR.id == r["meeting_room_id"]).first()
-        creator = await E.select().where(E.id == r["created_by"]).first()
-        participants = await _get_participants(r["id"])
-
+        room = refdata.meeting_rooms.get(r["meeting_room_id"])
+        creator = refdata.employees.get(r["created_by"])
         reservations.append(
             {
                 "id": r["id"],
                 "title": r["title"],
-                "room_name": room["name"] if room else "不明",
+                "room_name": room.name if room else "不明",
                 "start_time": r["start_time"],
                 "end_time": r["end_time"],
-                "creator_name": creator["name"] if creator else "不明",
-                "participants": participants,
+                "creator_name": creator.name if creator else "不明",
+                "participants": participants[r["id"]],
             }
         )
 
@@ -95,8 +90,8 @@ async def view_reservations(request: Request, page: int = 1) -> Template:
 @get("/reservations/register")
 async def show_reservation_register_form(request: Request) -> Template:
     """予約登録フォーム表示"""
-    rooms = [{"id": r["id"], "name": r["name"]} for r in await MR.select()]
-    employees = [{"id": e["id"], "name": e["name"]} for e in await E.select()]
+    rooms = list((await get_refdata()).meeting_rooms.values())
+    employees = list((await get_directory()).values())
 
     return Template(
         template_name="reservation_register.html",
@@ -137,8 +132,8 @@ async def register_reservation(request: Request, data: FormData) -> Template:
 
     await delete_cached("reservations:list")
 
-    rooms = [{"id": r["id"], "name": r["name"]} for r in await MR.select()]
-    employees = [{"id": e["id"], "name": e["name"]} for e in await E.select()]
+    rooms = list((await get_refdata()).meeting_rooms.values())
+    employees = list((await get_directory()).values())
 
     return Template(
         template_name="reservation_register.html",
@@ -149,12 +144,14 @@ async def register_reservation(request: Request, data: FormData) -> Template:
 @get("/reservations/{reservation_id:uuid}/edit")
 async def show_reservation_edit_form(reservation_id: UUID) -> Template:
     """予約編集フォーム表示"""
-    result = await _get_or_404(reservation_id)
-    room = await MR.select().where(MR.id == result["meeting_room_id"]).first()
-    participants = await _get_participants(reservation_id)
-
-    rooms = [{"id": r["id"], "name": r["name"]} for r in await MR.select()]
-    employees = [{"id": e["id"], "name": e["name"]} for e in await E.select()]
+    result = await reservation_repo.get_or_404(reservation_id)
+    refdata = await get_refdata()
+    participants = (await _get_participants([reservation_id], refdata.employees))[
+        reservation_id
+    ]
+    rooms = list(refdata.meeting_rooms.values())
+    room = refdata.meeting_rooms.get(result["meeting_room_id"])
+    employees = list(refdata.employees.values())
 
     return Template(
         template_name="reservation_edit.html",
@@ -163,7 +160,7 @@ async def show_reservation_edit_form(reservation_id: UUID) -> Template:
                 "id": result["id"],
                 "title": result["title"],
                 "meeting_room_id": result["meeting_room_id"],
-                "room_name": room["name"] if room else "不明",
+                "room_name": room.name if room else "不明",
                 "start_time": result["start_time"].strftime("%Y-%m-%dT%H:%M"),
                 "end_time": result["end_time"].strftime("%Y-%m-%dT%H:%M"),
             },
@@ -177,16 +174,15 @@ async def show_reservation_edit_form(reservation_id: UUID) -> Template:
 @post("/reservations/{reservation_id:uuid}/edit")
 async def edit_reservation_form(reservation_id: UUID, data: FormData) -> Redirect:
     """予約編集処理"""
-    await _get_or_404(reservation_id)
-
-    await MRR.update(
+    await reservation_repo.update_or_404(
+        reservation_id,
         {
             MRR.title: data["title"],
             MRR.meeting_room_id: UUID(data["meeting_room_id"]),
             MRR.start_time: datetime.fromisoformat(data["start_time"]),
             MRR.end_time: datetime.fromisoformat(data["end_time"]),
-        }
-    ).where(MRR.id == reservation_id)
+        },
+    )
 
     # 参加者を更新
     await RP.delete().where(RP.reservation_id == reservation_id)
@@ -206,9 +202,8 @@ async def edit_reservation_form(reservation_id: UUID, data: FormData) -> Redirec
 @post("/reservations/{reservation_id:uuid}/delete")
 async def delete_reservation_form(reservation_id: UUID) -> Redirect:
     """予約削除処理"""
-    await _get_or_404(reservation_id)
     await RP.delete().where(RP.reservation_id == reservation_id)
-    await MRR.delete().where(MRR.id == reservation_id)
+    await reservation_repo.delete_or_404(reservation_id)
     await delete_cached("reservations:list")
     return Redirect(path="/reservations/view")
 
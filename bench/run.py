@@ -0,0 +1,232 @@
+"""主要エンドポイントの負荷計測
+
+各エンドポイントを指定の同時実行数で叩き、p50/p95/p99・スループット・
+1リクエストあたりのクエリ数 (Server-Timing) をJSONに記録する。
+--base-url を省略するとアプリをプロセス内で起動して計測する (クエリ数も取得)。
+別プロセスのサーバーを計測する場合は QUERY_PROFILER=1 で起動するとクエリ数が入る。
+
+uv run python -m bench.seed
+uv run python -m bench.run --concurrency 20 --requests 300
+uv run python -m bench.run --compare bench/results/baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# 計測対象 (名前 → パス)
+ENDPOINTS = {
+    "pcs": "/pcs",
+    "pcs_view": "/pcs/view",
+    "dashboard": "/dashboard",
+    "search": "/api/search?q=PC",
+    "chat_conversations": "/chat/conversations",
+    "reservations_view": "/reservations/view",
+    "pcs_export": "/pcs/export",
+}
+
+# 02_insert_item.sql の管理者 (bench.seed のチャットデータもこのユーザー宛て)
+BENCH_USER = {
+    "user_id": "e0000001-0000-0000-0000-000000000001",
+    "email": "yamada.taro@example.com",
+    "role": "admin",
+}
+
+_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def _percentile(sorted_ms: list[float], p: float) -> float:
+    if not sorted_ms:
+        return 0.0
+    index = min(len(sorted_ms) - 1, max(0, round(p / 100 * len(sorted_ms)) - 1))
+    return sorted_ms[index]
+
+
+async def _login() -> str:
+    """ベンチ用ユーザーのセッションを作成 (SESSION_MODE はサーバーと揃える)"""
+    from app.sessions import create_session
+
+    return await create_session(BENCH_USER)
+
+
+def _client(base_url: str | None, token: str, session_id: str) -> httpx.AsyncClient:
+    headers = {"Authorization": f"Bearer {token}"}
+    cookies = {"session_id": session_id}
+    if base_url:
+        return httpx.AsyncClient(
+            base_url=base_url, headers=headers, cookies=cookies, timeout=30
+        )
+
+    from main import create_app
+
+    transport = httpx.ASGITransport(app=create_app())
+    return httpx.AsyncClient(
+        transport=transport,
+        base_url="http://bench",
+        headers=headers,
+        cookies=cookies,
+        timeout=30,
+    )
+
+
+async def bench_endpoint(
+    client: httpx.AsyncClient, path: str, requests: int, concurrency: int, warmup: int
+) -> dict:
+    for _ in range(warmup):
+        await client.get(path)
+
+    latencies: list[float] = []
+    queries: list[int] = []
+    statuses: dict[str, int] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            res = await client.get(path)
+            await res.aread()
+            latencies.append((time.perf_counter() - start) * 1000)
+        statuses[str(res.status_code)] = statuses.get(str(res.status_code), 0) + 1
+        if m := _QUERIES.search(res.headers.get("server-timing", "")):
+            queries.append(int(m[1]))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "path": path,
+        "requests": requests,
+        "concurrency": concurrency,
+        "statuses": statuses,
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p95_ms": round(_percentile(latencies, 95), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "throughput_rps": round(requests / elapsed, 1),
+        "queries_per_request": (
+            {"mean": round(statistics.fmean(queries), 1), "max": max(queries)}
+            if queries
+            else None
+        ),
+    }
+
+
+async def _dataset() -> dict[str, int]:
+    """計測時点の件数 (結果の比較用)"""
+    from piccolo.querystring import QueryString
+
+    from app.database import DB
+
+    tables = [
+        "employees",
+        "pcs",
+        "pc_assignment_histories",
+        "chat_messages",
+        "blog_posts",
+        "blog_likes",
+        "meeting_room_reservations",
+    ]
+    sql = " UNION ALL ".join(
+        f"SELECT '{t}' AS name, COUNT(*) AS count FROM {t}" for t in tables
+    )
+    return {r["name"]: r["count"] for r in await DB.run_querystring(QueryString(sql))}
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _compare(current: dict, baseline: dict) -> None:
+    """ベースラインとのp95・スループット・クエリ数の差を表示"""
+    print(f"{'endpoint':<20} {'p95 ms':<27} {'rps':<27} queries")
+    for name, now in current["results"].items():
+        if not (before := baseline["results"].get(name)):
+            continue
+
+        def delta(key: str) -> str:
+            old, new = before[key], now[key]
+            change = (new - old) / old * 100 if old else 0.0
+            return f"{old:>7} → {new:<7} ({change:+.0f}%)".ljust(27)
+
+        q_old = (before["queries_per_request"] or {}).get("mean", "-")
+        q_new = (now["queries_per_request"] or {}).get("mean", "-")
+        print(
+            f"{name:<20} {delta('p95_ms')} {delta('throughput_rps')} {q_old} → {q_new}"
+        )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", help="計測するサーバー (省略時はプロセス内)")
+    parser.add_argument("--token", default=os.getenv("API_TOKEN", "bench-token"))
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200, help="エンドポイントごと")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument(
+        "--endpoints", nargs="*", choices=ENDPOINTS, default=list(ENDPOINTS)
+    )
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--compare", type=Path, help="比較するベースラインのJSON")
+    args = parser.parse_args()
+
+    if not args.base_url:
+        # プロセス内計測ではクエリ数を取るためプロファイラを有効化
+        os.environ["QUERY_PROFILER"] = "1"
+        import app.auth
+
+        app.auth.API_TOKEN = args.token
+
+    session_id = await _login()
+    results = {}
+    async with _client(args.base_url, args.token, session_id) as client:
+        for name in args.endpoints:
+            results[name] = await bench_endpoint(
+                client, ENDPOINTS[name], args.requests, args.concurrency, args.warmup
+            )
+            r = results[name]
+            print(
+                f"{name:<20} p50={r['p50_ms']}ms p95={r['p95_ms']}ms "
+                f"p99={r['p99_ms']}ms {r['throughput_rps']}rps "
+                f"queries={r['queries_per_request']} {r['statuses']}"
+            )
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "target": args.base_url or "in-process",
+        "dataset": await _dataset(),
+        "results": results,
+    }
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    output = args.output or RESULTS_DIR / f"{stamp}-{report['revision']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"saved: {output}")
+
+    if args.compare:
+        _compare(report, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
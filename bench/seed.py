@@ -0,0 +1,165 @@
+"""ベンチマーク用の合成データ投入
+
+init_data/pg/02_insert_item.sql の初期データに、件数を指定した合成データを追加する。
+合成データは bench.example.com のメールアドレス・BENCH- のシリアル番号で識別し、
+投入前に前回分を削除するため何度でも投入し直せる。
+
+uv run python -m bench.seed --employees 1000 --pcs 1500 --history 50000
+uv run python -m bench.seed --reset-only
+"""
+
+import argparse
+import asyncio
+
+from piccolo.querystring import QueryString
+
+from app.alerts import DIGEST_KEY
+from app.cache import delete_cached
+from app.database import DB
+from app.refdata import invalidate_refdata
+
+EMAIL_DOMAIN = "bench.example.com"
+SERIAL_PREFIX = "BENCH-"
+# チャット一覧を計測するユーザー (02_insert_item.sql の管理者)
+CHAT_USER_ID = "e0000001-0000-0000-0000-000000000001"
+
+_EMPLOYEES = (
+    f"(SELECT array_agg(id) AS ids FROM employees WHERE email LIKE '%@{EMAIL_DOMAIN}')"
+)
+_PCS = f"(SELECT array_agg(id) AS ids FROM pcs WHERE serial_number LIKE '{SERIAL_PREFIX}%')"
+
+
+def _pick(alias: str) -> str:
+    """配列からランダムに1件選ぶSQL式"""
+    return f"{alias}.ids[1 + floor(random() * array_length({alias}.ids, 1))::int]"
+
+
+SEED_SQL = {
+    "employees": f"""
+        INSERT INTO employees (id, name, email, department_id, role)
+        SELECT gen_random_uuid(), 'ベンチ社員' || g, 'bench' || g || '@{EMAIL_DOMAIN}',
+               {_pick("d")}, 'user'
+        FROM generate_series(1, {{}}) g,
+             (SELECT array_agg(id) AS ids FROM departments) d
+    """,
+    "pcs": f"""
+        INSERT INTO pcs (id, name, model, serial_number, assigned_to)
+        SELECT gen_random_uuid(), 'ベンチPC-' || g, 'Model ' || (g % 20),
+               '{SERIAL_PREFIX}' || g,
+               CASE WHEN random() < 0.8 THEN {_pick("e")} END
+        FROM generate_series(1, {{}}) g, {_EMPLOYEES} e
+    """,
+    "history": f"""
+        INSERT INTO pc_assignment_histories (id, pc_id, employee_id, assigned_at, notes)
+        SELECT gen_random_uuid(), {_pick("p")}, {_pick("e")},
+               now() - random() * interval '365 days', ''
+        FROM generate_series(1, {{}}) g, {_PCS} p, {_EMPLOYEES} e
+    """,
+    "messages": f"""
+        INSERT INTO chat_messages (id, sender_id, receiver_id, content, created_at, is_read)
+        SELECT gen_random_uuid(),
+               CASE WHEN g % 10 = 0 THEN '{CHAT_USER_ID}'::uuid ELSE {_pick("e")} END,
+               CASE WHEN g % 10 = 5 THEN '{CHAT_USER_ID}'::uuid ELSE {_pick("e")} END,
+               'ベンチメッセージ ' || g,
+               now() - random() * interval '180 days',
+               random() < 0.7
+        FROM generate_series(1, {{}}) g, {_EMPLOYEES} e
+    """,
+    "posts": f"""
+        INSERT INTO blog_posts (id, author_id, title, content, excerpt, created_at, updated_at)
+        SELECT gen_random_uuid(), {_pick("e")}, 'ベンチ投稿 ' || g,
+               repeat('ベンチマーク用の本文です。', 40), repeat('ベンチマーク用の本文です。', 10),
+               ts, ts
+        FROM generate_series(1, {{}}) g, {_EMPLOYEES} e,
+             LATERAL (SELECT now() - random() * interval '365 days' AS ts) t
+    """,
+    "likes": f"""
+        INSERT INTO blog_likes (id, blog_post_id, employee_id)
+        SELECT gen_random_uuid(), {_pick("b")}, {_pick("e")}
+        FROM generate_series(1, {{}}) g, {_EMPLOYEES} e,
+             (SELECT array_agg(b.id) AS ids FROM blog_posts b
+              JOIN employees a ON a.id = b.author_id
+              WHERE a.email LIKE '%@{EMAIL_DOMAIN}') b
+        ON CONFLICT (blog_post_id, employee_id) DO NOTHING
+    """,
+    "reservations": f"""
+        INSERT INTO meeting_room_reservations
+            (id, meeting_room_id, title, start_time, end_time, created_by)
+        SELECT gen_random_uuid(), {_pick("r")}, 'ベンチ会議 ' || g, ts, ts + interval '1 hour',
+               {_pick("e")}
+        FROM generate_series(1, {{}}) g, {_EMPLOYEES} e,
+             (SELECT array_agg(id) AS ids FROM meeting_rooms) r,
+             LATERAL (SELECT date_trunc('hour', now() + (random() - 0.5) * interval '60 days') AS ts) t
+    """,
+}
+
+# いいね数の非正規化カラムを合成データ分だけ更新
+_LIKE_COUNT_SQL = f"""
+    UPDATE blog_posts b SET like_count = l.count
+    FROM (SELECT blog_post_id, COUNT(*) AS count FROM blog_likes GROUP BY blog_post_id) l
+    JOIN blog_posts p ON p.id = l.blog_post_id
+    JOIN employees a ON a.id = p.author_id AND a.email LIKE '%@{EMAIL_DOMAIN}'
+    WHERE b.id = l.blog_post_id
+"""
+
+# 社員の削除で投稿・いいね・メッセージ・予約が、PCの削除で履歴が連鎖削除される
+_RESET_SQL = [
+    f"DELETE FROM pcs WHERE serial_number LIKE '{SERIAL_PREFIX}%'",
+    f"DELETE FROM employees WHERE email LIKE '%@{EMAIL_DOMAIN}'",
+]
+
+
+async def reset() -> None:
+    async with DB.transaction():
+        for sql in _RESET_SQL:
+            await DB.run_querystring(QueryString(sql))
+
+
+async def seed(counts: dict[str, int], random_seed: float = 0.42) -> None:
+    """counts: テーブル種別 → 件数 (SEED_SQLのキー)"""
+    # setseed はセッション単位のため1トランザクション (1接続) で投入する
+    async with DB.transaction():
+        await DB.run_querystring(QueryString("SELECT setseed({})", random_seed))
+        for name, sql in SEED_SQL.items():
+            if counts.get(name):
+                await DB.run_querystring(QueryString(sql, counts[name]))
+                print(f"seeded: {name} x {counts[name]}")
+        await DB.run_querystring(QueryString(_LIKE_COUNT_SQL))
+    await DB.run_querystring(QueryString("ANALYZE"))
+
+
+async def invalidate_caches() -> None:
+    await delete_cached(
+        "pcs:list",
+        "employees:list",
+        "history:all",
+        "dashboard:stats",
+        "blogs:list",
+        DIGEST_KEY,
+    )
+    await invalidate_refdata()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--employees", type=int, default=500)
+    parser.add_argument("--pcs", type=int, default=800)
+    parser.add_argument("--history", type=int, default=20000)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--likes", type=int, default=10000)
+    parser.add_argument("--reservations", type=int, default=2000)
+    parser.add_argument("--seed", type=float, default=0.42, help="setseed の値 (-1〜1)")
+    parser.add_argument(
+        "--reset-only", action="store_true", help="合成データの削除のみ"
+    )
+    args = parser.parse_args()
+
+    await reset()
+    if not args.reset_only:
+        await seed({name: getattr(args, name) for name in SEED_SQL}, args.seed)
+    await invalidate_caches()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+"""一覧API (/pcs・/history) のモデル変換・シリアライズの計測
+
+DBを使わず、Piccoloの取得行と同じ形の行を --rows 件作り、一覧APIの処理を
+従来の方式 (dataclass に1行ずつ変換) と msgspec.Struct (msgspec.convert で一括変換)
+で比べる。各段階の所要時間 (最良値) と割り当てたメモリのピーク (tracemalloc) を表示する。
+
+- convert: 取得行 → モデルのリスト
+- cache:   モデルのリスト → キャッシュに保存するJSON
+- respond: キャッシュのJSON → モデルのリスト → レスポンスのJSON
+
+uv run python -m bench.serialize --rows 100000
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from uuid import UUID, uuid4
+
+import msgspec
+
+from models import PC, PCAssignmentHistory
+
+
+# 変更前の dataclass モデル (比較用)
+@dataclass
+class LegacyPC:
+    id: UUID = field(default_factory=uuid4)
+    name: str = ""
+    model: str = ""
+    serial_number: str = ""
+    assigned_to: UUID | None = None
+
+
+@dataclass
+class LegacyPCAssignmentHistory:
+    id: UUID = field(default_factory=uuid4)
+    pc_id: UUID = field(default_factory=uuid4)
+    employee_id: UUID | None = None
+    assigned_at: datetime = field(default_factory=datetime.now)
+    notes: str = ""
+
+
+def _pc_rows(n: int) -> list[dict]:
+    employees = [uuid4() for _ in range(max(n // 2, 1))]
+    return [
+        {
+            "id": uuid4(),
+            "name": f"PC-{i}",
+            "model": f"Model {i % 20}",
+            "serial_number": f"SN-{i:08d}",
+            "assigned_to": employees[i % len(employees)] if i % 5 else None,
+        }
+        for i in range(n)
+    ]
+
+
+def _history_rows(n: int) -> list[dict]:
+    start = datetime(2024, 1, 1)
+    pcs = [uuid4() for _ in range(max(n // 10, 1))]
+    return [
+        {
+            "id": uuid4(),
+            "pc_id": pcs[i % len(pcs)],
+            "employee_id": uuid4() if i % 4 else None,
+            "assigned_at": start + timedelta(minutes=i),
+            "notes": "",
+        }
+        for i in range(n)
+    ]
+
+
+def _legacy(model: type, rows: list[dict]) -> dict[str, Callable[[], object]]:
+    """変更前: 1行ずつ dataclass に変換し、__dict__ を json.dumps でキャッシュ"""
+    models = [model(**r) for r in rows]
+    cached = json.dumps([m.__dict__ for m in models], default=str)
+    encoder = msgspec.json.Encoder()
+    return {
+        "convert": lambda: [model(**r) for r in rows],
+        "cache": lambda: json.dumps([m.__dict__ for m in models], default=str),
+        "respond": lambda: encoder.encode([model(**d) for d in json.loads(cached)]),
+    }
+
+
+def _struct(model: type, rows: list[dict]) -> dict[str, Callable[[], object]]:
+    """変更後: msgspec.convert で一括変換し、キャッシュのJSONとモデルを直接相互変換"""
+    models = msgspec.convert(rows, list[model])
+    encoder = msgspec.json.Encoder(enc_hook=str)
+    cached = encoder.encode(models)
+    decoder = msgspec.json.Decoder(list[model])
+    return {
+        "convert": lambda: msgspec.convert(rows, list[model]),
+        "cache": lambda: encoder.encode(models),
+        "respond": lambda: encoder.encode(decoder.decode(cached)),
+    }
+
+
+def _measure(func: Callable[[], object], repeat: int) -> tuple[float, float]:
+    """(最良の所要時間 ms, 割り当てのピーク MB)"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round(best * 1000, 1), round(peak / 2**20, 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = {
+        "/pcs": (LegacyPC, PC, _pc_rows(args.rows)),
+        "/history": (
+            LegacyPCAssignmentHistory,
+            PCAssignmentHistory,
+            _history_rows(args.rows),
+        ),
+    }
+    print(f"rows={args.rows} (時間は{args.repeat}回の最良値)")
+    print(
+        f"{'endpoint':<10} {'stage':<8} {'dataclass':>22} {'msgspec':>22} {'時間':>6}"
+    )
+    for endpoint, (legacy_model, struct_model, rows) in cases.items():
+        legacy = _legacy(legacy_model, rows)
+        struct = _struct(struct_model, rows)
+        for stage in legacy:
+            old_ms, old_mb = _measure(legacy[stage], args.repeat)
+            new_ms, new_mb = _measure(struct[stage], args.repeat)
+            print(
+                f"{endpoint:<10} {stage:<8} {old_ms:>9}ms {old_mb:>8}MB "
+                f"{new_ms:>9}ms {new_mb:>8}MB {old_ms / new_ms:>5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""プリペアドステートメント (app.statements) の計測
+
+PreparedQuery に登録したホットパスのクエリを、同じ接続プールの上で
+従来のPiccoloのクエリ (fallback) とプリペアドステートメントで交互に実行し、
+スループット (ops/s) と1回あたりの平均時間を比べる。
+PostgreSQL (DATABASE_URL) に bench.seed のデータが入っている前提。
+
+uv run python -m bench.statements --iterations 2000 --concurrency 10
+"""
+
+import argparse
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+
+import app.api.chat  # noqa: F401  (PreparedQuery の登録)
+import app.api.pcs  # noqa: F401
+import app.web.chat  # noqa: F401
+import app.web.pcs  # noqa: F401
+from app.database import DB, close_db, open_db
+from app.repository import employee_repo, pc_repo
+from app.statements import registry
+from models import PC
+from models import EmployeeTable as E
+from models import PCTable as P
+
+
+async def _throughput(
+    call: Callable[[], Awaitable[object]], iterations: int, concurrency: int
+) -> float:
+    """ops/s (concurrency 本の並行で合計 iterations 回)"""
+
+    async def worker(n: int) -> None:
+        for _ in range(n):
+            await call()
+
+    per_worker = iterations // concurrency
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(per_worker) for _ in range(concurrency)))
+    return per_worker * concurrency / (time.perf_counter() - start)
+
+
+async def _cases() -> dict[str, tuple[Callable, Callable]]:
+    """名前 → (従来のクエリ, プリペアドステートメント)"""
+    pc = await P.select(P.id).first()
+    employees = await E.select(E.id).limit(2)
+    if pc is None or len(employees) < 2:
+        raise SystemExit("データがありません (uv run python -m bench.seed)")
+    employee, other = employees
+    pc_list, pc_count = registry["pcs_list"], registry["pcs_count"]
+    unread = registry["chat_unread_counts"]
+    messages = registry["chat_messages_between"]
+    return {
+        "pc_by_pk": (
+            lambda: pc_repo._by_pk.fallback(pc["id"]),
+            lambda: pc_repo.get(pc["id"]),
+        ),
+        "employee_by_pk": (
+            lambda: employee_repo._by_pk.fallback(employee["id"]),
+            lambda: employee_repo.get(employee["id"]),
+        ),
+        "pcs_count": (pc_count.fallback, pc_count.fetchval),
+        "pcs_list": (_orm_pc_list(pc_list), lambda: pc_list.fetch_models(PC)),
+        "chat_unread_counts": (
+            lambda: unread.fallback(employee["id"]),
+            lambda: unread.fetch(employee["id"]),
+        ),
+        "chat_messages_between": (
+            lambda: messages.fallback(employee["id"], other["id"]),
+            lambda: messages.fetch(employee["id"], other["id"]),
+        ),
+    }
+
+
+def _orm_pc_list(pc_list) -> Callable[[], Awaitable[list[PC]]]:
+    async def load() -> list[PC]:
+        return pc_repo.to_models(await pc_list.fallback())
+
+    return load
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    if DB is None:
+        raise SystemExit("TESTING 環境では計測できません")
+
+    await open_db()
+    try:
+        cases = await _cases()
+        print(
+            f"iterations={args.iterations} concurrency={args.concurrency} "
+            f"pool={DB.pool.get_max_size()}"
+        )
+        print(f"{'query':<24} {'ORM ops/s':>10} {'prepared':>10} {'速度':>6}")
+        for name, (orm, fast) in cases.items():
+            # 接続ごとの prepare を計測から除くため、先に全接続で1周させる
+            await _throughput(fast, args.concurrency * 2, args.concurrency)
+            await _throughput(orm, args.concurrency * 2, args.concurrency)
+            orm_ops = await _throughput(orm, args.iterations, args.concurrency)
+            fast_ops = await _throughput(fast, args.iterations, args.concurrency)
+            print(
+                f"{name:<24} {orm_ops:>10.0f} {fast_ops:>10.0f} "
+                f"{fast_ops / orm_ops:>5.1f}x"
+            )
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
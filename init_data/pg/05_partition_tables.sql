@@ -0,0 +1,109 @@
+-- chat_messages / pc_assignment_histories を月次レンジパーティションへ移行
+-- 移行手順の詳細は doc/partitioning.md を参照
+
+-- 月次パーティション作成関数 (partition_prefix_pYYYYMM)
+CREATE OR REPLACE FUNCTION create_monthly_partition(
+    parent_table TEXT,
+    partition_prefix TEXT,
+    month_start DATE
+) RETURNS TEXT AS $$
+DECLARE
+    from_date DATE := date_trunc('month', month_start)::DATE;
+    to_date DATE := (date_trunc('month', month_start) + INTERVAL '1 month')::DATE;
+    partition_name TEXT := format('%s_p%s', partition_prefix, to_char(from_date, 'YYYYMM'));
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, parent_table, from_date, to_date
+    );
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 既存テーブルをパーティションテーブルへ置き換える
+CREATE OR REPLACE FUNCTION migrate_to_monthly_partitions(
+    table_name TEXT,
+    partition_column TEXT,
+    columns_ddl TEXT,
+    months_ahead INTEGER DEFAULT 3
+) RETURNS VOID AS $$
+DECLARE
+    new_table TEXT := table_name || '_partitioned';
+    min_month DATE;
+    max_month DATE;
+    month_cursor DATE;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_partitioned_table p
+        JOIN pg_class c ON c.oid = p.partrelid
+        WHERE c.relname = table_name
+    ) THEN
+        RETURN;
+    END IF;
+
+    EXECUTE format(
+        'CREATE TABLE %I (%s, PRIMARY KEY (id, %I)) PARTITION BY RANGE (%I)',
+        new_table, columns_ddl, partition_column, partition_column
+    );
+
+    -- 既存データの範囲 + 現在月から months_ahead ヶ月先までを作成
+    EXECUTE format(
+        'SELECT date_trunc(''month'', min(%I))::DATE, date_trunc(''month'', max(%I))::DATE FROM %I',
+        partition_column, partition_column, table_name
+    ) INTO min_month, max_month;
+    min_month := LEAST(COALESCE(min_month, current_date), date_trunc('month', current_date)::DATE);
+    max_month := GREATEST(
+        COALESCE(max_month, current_date),
+        (date_trunc('month', current_date) + make_interval(months => months_ahead))::DATE
+    );
+    month_cursor := min_month;
+    WHILE month_cursor <= max_month LOOP
+        PERFORM create_monthly_partition(new_table, table_name, month_cursor);
+        month_cursor := (month_cursor + INTERVAL '1 month')::DATE;
+    END LOOP;
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I DEFAULT',
+        table_name || '_default', new_table
+    );
+
+    EXECUTE format('INSERT INTO %I SELECT * FROM %I', new_table, table_name);
+    EXECUTE format('DROP TABLE %I', table_name);
+    EXECUTE format('ALTER TABLE %I RENAME TO %I', new_table, table_name);
+    EXECUTE format('ALTER INDEX %I RENAME TO %I', new_table || '_pkey', table_name || '_pkey');
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT migrate_to_monthly_partitions(
+    'pc_assignment_histories',
+    'assigned_at',
+    'id UUID NOT NULL,
+     pc_id UUID NOT NULL REFERENCES pcs(id) ON DELETE CASCADE,
+     employee_id UUID REFERENCES employees(id) ON DELETE SET NULL,
+     assigned_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+     notes TEXT DEFAULT '''''
+);
+
+SELECT migrate_to_monthly_partitions(
+    'chat_messages',
+    'created_at',
+    'id UUID NOT NULL,
+     sender_id UUID NOT NULL REFERENCES employees(id) ON DELETE CASCADE,
+     receiver_id UUID NOT NULL REFERENCES employees(id) ON DELETE CASCADE,
+     content TEXT NOT NULL,
+     created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+     is_read BOOLEAN NOT NULL DEFAULT FALSE'
+);
+
+-- パーティション親テーブルにインデックスを再作成 (各パーティションへ自動伝播)
+CREATE INDEX IF NOT EXISTS idx_pc_assignment_histories_pc_id ON pc_assignment_histories(pc_id);
+CREATE INDEX IF NOT EXISTS idx_pc_assignment_histories_employee_id ON pc_assignment_histories(employee_id);
+CREATE INDEX IF NOT EXISTS idx_pc_assignment_histories_assigned_at ON pc_assignment_histories(assigned_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_chat_messages_sender_id ON chat_messages(sender_id);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_receiver_id ON chat_messages(receiver_id);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_created_at ON chat_messages(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_conversation ON chat_messages(sender_id, receiver_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_conversation_reverse ON chat_messages(receiver_id, sender_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_receiver_unread
+ON chat_messages(receiver_id, is_read, sender_id)
+WHERE is_read = FALSE;
@@ -0,0 +1,27 @@
+-- ブログいいね数の非正規化カラム
+
+ALTER TABLE blog_posts ADD COLUMN IF NOT EXISTS like_count INTEGER NOT NULL DEFAULT 0;
+
+-- 既存いいね数で初期化
+UPDATE blog_posts b
+SET like_count = l.count
+FROM (
+    SELECT blog_post_id, COUNT(*) AS count FROM blog_likes GROUP BY blog_post_id
+) l
+WHERE b.id = l.blog_post_id AND b.like_count <> l.count;
+
+-- ON CONFLICT (blog_post_id, employee_id) 用の一意制約 (古いDB向けに保証)
+DO $$ BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'blog_likes'::regclass AND contype = 'u'
+    ) THEN
+        ALTER TABLE blog_likes
+            ADD CONSTRAINT blog_likes_blog_post_id_employee_id_key
+            UNIQUE (blog_post_id, employee_id);
+    END IF;
+END $$;
+
+-- ランキング再構築用
+CREATE INDEX IF NOT EXISTS idx_blog_posts_like_count ON blog_posts(like_count DESC)
+WHERE like_count > 0;
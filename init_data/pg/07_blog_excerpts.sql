@@ -0,0 +1,20 @@
+-- ブログ一覧用の抜粋カラム (アプリ側で登録・更新時に app.utils.make_excerpt で作成)
+
+ALTER TABLE blog_posts ADD COLUMN IF NOT EXISTS excerpt TEXT NOT NULL DEFAULT '';
+
+-- 既存投稿の抜粋を作成 (HTMLタグ・Markdown記号を除去して先頭200文字)
+UPDATE blog_posts
+SET excerpt = CASE
+    WHEN char_length(stripped) > 200 THEN rtrim(left(stripped, 200)) || '…'
+    ELSE stripped
+END
+FROM (
+    SELECT id AS stripped_id, btrim(regexp_replace(regexp_replace(regexp_replace(regexp_replace(
+        content,
+        '```.*?```|<[^>]+>', ' ', 'g'),
+        '!?\[([^\]]*)\]\([^)]*\)', '\1', 'g'),
+        '(^|\n)\s{0,3}(#{1,6}|>|[-*+]|\d+\.)\s+|[*_~`]+', '\1', 'g'),
+        '\s+', ' ', 'g')) AS stripped
+    FROM blog_posts
+) s
+WHERE blog_posts.id = s.stripped_id AND blog_posts.excerpt = '';
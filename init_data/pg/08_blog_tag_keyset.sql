@@ -0,0 +1,14 @@
+-- タグ別ブログ一覧のキーセットページング用
+-- blog_post_tags に投稿日時を非正規化し (tag_id, post_created_at) で索引する
+
+ALTER TABLE blog_post_tags ADD COLUMN IF NOT EXISTS post_created_at TIMESTAMP;
+
+UPDATE blog_post_tags t
+SET post_created_at = b.created_at
+FROM blog_posts b
+WHERE b.id = t.blog_post_id AND t.post_created_at IS NULL;
+
+ALTER TABLE blog_post_tags ALTER COLUMN post_created_at SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_blog_post_tags_tag_created
+ON blog_post_tags(tag_id, post_created_at DESC, blog_post_id DESC);
@@ -0,0 +1,28 @@
+-- タグ使用数の非正規化カラム (タグクラウドをGROUP BY無しで描画するため)
+
+ALTER TABLE tags ADD COLUMN IF NOT EXISTS usage_count INTEGER NOT NULL DEFAULT 0;
+
+-- 既存の紐付け数で初期化
+UPDATE tags t
+SET usage_count = c.count
+FROM (
+    SELECT tag_id, COUNT(*) AS count FROM blog_post_tags GROUP BY tag_id
+) c
+WHERE t.id = c.tag_id AND t.usage_count <> c.count;
+
+-- 紐付けの追加・削除 (投稿削除のCASCADEを含む) に追従
+CREATE OR REPLACE FUNCTION update_tag_usage_count() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE tags SET usage_count = usage_count + 1 WHERE id = NEW.tag_id;
+    ELSE
+        UPDATE tags SET usage_count = usage_count - 1 WHERE id = OLD.tag_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_blog_post_tags_usage_count ON blog_post_tags;
+CREATE TRIGGER trg_blog_post_tags_usage_count
+AFTER INSERT OR DELETE ON blog_post_tags
+FOR EACH ROW EXECUTE FUNCTION update_tag_usage_count();
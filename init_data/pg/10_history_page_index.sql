@@ -0,0 +1,8 @@
+-- 割り当て履歴のページ取得用インデックス
+-- ORDER BY assigned_at DESC, id DESC LIMIT n を索引順に読み、結合キーも索引から取る
+
+CREATE INDEX IF NOT EXISTS idx_pc_assignment_histories_assigned_at_id
+    ON pc_assignment_histories(assigned_at DESC, id DESC) INCLUDE (pc_id, employee_id);
+
+-- 先頭カラムが同じ単独インデックスは不要
+DROP INDEX IF EXISTS idx_pc_assignment_histories_assigned_at;
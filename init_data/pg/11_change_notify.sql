@@ -0,0 +1,44 @@
+-- テーブル変更の通知 (アプリの app/changefeed.py が LISTEN してキャッシュを無効化する)
+-- アプリ外 (初期データ投入・管理者のSQL) の変更もキャッシュに反映するため。
+-- 文単位のトリガーのため一括INSERTでも1文につき1通知。同じトランザクション内の
+-- 同一内容の通知はPostgreSQLが1件にまとめる。
+
+CREATE OR REPLACE FUNCTION notify_table_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify(
+        'table_changes',
+        json_build_object(
+            'table', TG_TABLE_NAME,
+            'op', TG_OP,
+            'txid', txid_current()
+        )::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY[
+        'departments',
+        'employees',
+        'pcs',
+        'pc_assignment_histories',
+        'meeting_rooms',
+        'meeting_room_reservations',
+        'blog_posts',
+        'blog_likes',
+        'tags'
+    ] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_notify ON %I', t, t);
+        EXECUTE format(
+            'CREATE TRIGGER trg_%s_notify
+             AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I
+             FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change()',
+            t, t
+        );
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,27 @@
+-- ブログいいね数 (blog_posts.like_count) をトリガーで維持
+-- 社員削除のCASCADEで消えたいいねも反映する (アプリのいいね追加・削除もこれで加減算)
+
+-- 既存のずれを修正
+UPDATE blog_posts b
+SET like_count = COALESCE(l.count, 0)
+FROM blog_posts p
+LEFT JOIN (
+    SELECT blog_post_id, COUNT(*) AS count FROM blog_likes GROUP BY blog_post_id
+) l ON l.blog_post_id = p.id
+WHERE b.id = p.id AND b.like_count <> COALESCE(l.count, 0);
+
+CREATE OR REPLACE FUNCTION update_blog_like_count() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE blog_posts SET like_count = like_count + 1 WHERE id = NEW.blog_post_id;
+    ELSE
+        UPDATE blog_posts SET like_count = like_count - 1 WHERE id = OLD.blog_post_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_blog_likes_like_count ON blog_likes;
+CREATE TRIGGER trg_blog_likes_like_count
+AFTER INSERT OR DELETE ON blog_likes
+FOR EACH ROW EXECUTE FUNCTION update_blog_like_count();
@@ -14,11 +14,23 @@ from app.api.chat import chat_api_router
 from app.api.departments import department_api_router
 from app.api.employees import employee_api_router
 from app.api.meeting_rooms import meeting_room_api_router
+from app.api.metrics import metrics_router
 from app.api.pcs import pc_api_router
 from app.api.reservations import reservation_api_router
 from app.api.search import search_router
 from app.api.tags import tag_api_router
 from app.auth import SessionExpiredException
+from app.cache import CacheBatchMiddleware
+from app.changefeed import start_changefeed, stop_changefeed
+from app.config import METRICS_ENABLED, QUERY_PROFILER_ENABLED
+from app.database import close_db, open_db
+from app.live import start_live, stop_live
+from app.metrics import RequestMetricsMiddleware, start_metrics, stop_metrics
+from app.profiler import QueryProfilerMiddleware, install_profiler
+from app.redis_client import close_redis, open_redis
+from app.scheduler import start_scheduler, stop_scheduler
+from app.sessions import start_sessions, stop_sessions
+from app.warmup import warm_up
 from app.web.auth import auth_web_router
 from app.web.blogs import blog_web_router
 from app.web.chat import chat_web_router
@@ -38,6 +50,27 @@ def session_expired_handler(request: Request, exc: SessionExpiredException) -> R
 
 
 def create_app() -> Litestar:
+    middleware = [CacheBatchMiddleware]
+    route_handlers = []
+    on_startup = [
+        open_db,
+        open_redis,
+        warm_up,
+        start_sessions,
+        start_changefeed,
+        start_live,
+        start_scheduler,
+    ]
+    on_shutdown = [stop_sessions, stop_changefeed, stop_live, stop_scheduler]
+    if METRICS_ENABLED:
+        middleware.append(RequestMetricsMiddleware)
+        route_handlers.append(metrics_router)
+        on_startup.append(start_metrics)
+        on_shutdown.append(stop_metrics)
+    if QUERY_PROFILER_ENABLED:
+        install_profiler()
+        middleware.append(QueryProfilerMiddleware)
+    on_shutdown.extend([close_redis, close_db])
     return Litestar(
         plugins=[GranianPlugin()],
         route_handlers=[
@@ -62,8 +95,12 @@ def create_app() -> Litestar:
             tag_web_router,
             meeting_room_web_router,
             reservation_web_router,
+            *route_handlers,
         ],
         exception_handlers={SessionExpiredException: session_expired_handler},
+        middleware=middleware,
+        on_startup=on_startup,
+        on_shutdown=on_shutdown,
         template_config=TemplateConfig(
             directory=Path("templates"),
             engine=JinjaTemplateEngine,
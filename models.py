@@ -1,8 +1,8 @@
-from dataclasses import dataclass, field
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 from uuid import UUID, uuid4
 
+import msgspec
 from piccolo.columns import (
     UUID as PiccoloUUID,
 )
@@ -26,105 +26,96 @@ class Role(str, Enum):
     ADMIN = "admin"
 
 
-# Dataclassモデル (API入出力用)
-@dataclass
-class Department:
-    id: UUID = field(default_factory=uuid4)
+# API入出力用モデル (msgspec.Struct: 変更不可、行の一括変換は msgspec.convert)
+class Department(msgspec.Struct, frozen=True):
+    id: UUID = msgspec.field(default_factory=uuid4)
     name: str = ""
 
 
-@dataclass
-class Employee:
-    id: UUID = field(default_factory=uuid4)
+class Employee(msgspec.Struct, frozen=True):
+    id: UUID = msgspec.field(default_factory=uuid4)
     name: str = ""
     email: str = ""
     department_id: UUID | None = None
     profile_image: bytes | None = None
-    resignation_date: datetime | None = None
-    transfer_date: datetime | None = None
+    resignation_date: date | None = None
+    transfer_date: date | None = None
     role: Role = Role.USER
 
 
-@dataclass
-class PC:
-    id: UUID = field(default_factory=uuid4)
+class PC(msgspec.Struct, frozen=True):
+    id: UUID = msgspec.field(default_factory=uuid4)
     name: str = ""
     model: str = ""
     serial_number: str = ""
     assigned_to: UUID | None = None
 
 
-@dataclass
-class PCAssignmentHistory:
-    id: UUID = field(default_factory=uuid4)
-    pc_id: UUID = field(default_factory=uuid4)
+class PCAssignmentHistory(msgspec.Struct, frozen=True):
+    id: UUID = msgspec.field(default_factory=uuid4)
+    pc_id: UUID = msgspec.field(default_factory=uuid4)
     employee_id: UUID | None = None
-    assigned_at: datetime = field(default_factory=datetime.now)
+    assigned_at: datetime = msgspec.field(default_factory=datetime.now)
     notes: str = ""
 
 
-@dataclass
-class ChatMessage:
-    id: UUID = field(default_factory=uuid4)
-    sender_id: UUID = field(default_factory=uuid4)
-    receiver_id: UUID = field(default_factory=uuid4)
+class ChatMessage(msgspec.Struct, frozen=True):
+    id: UUID = msgspec.field(default_factory=uuid4)
+    sender_id: UUID = msgspec.field(default_factory=uuid4)
+    receiver_id: UUID = msgspec.field(default_factory=uuid4)
     content: str = ""
-    created_at: datetime = field(default_factory=datetime.now)
+    created_at: datetime = msgspec.field(default_factory=datetime.now)
     is_read: bool = False
 
 
-@dataclass
-class Tag:
-    id: UUID = field(default_factory=uuid4)
+class Tag(msgspec.Struct, frozen=True):
+    id: UUID = msgspec.field(default_factory=uuid4)
     name: str = ""
+    usage_count: int = 0
 
 
-@dataclass
-class BlogPost:
-    id: UUID = field(default_factory=uuid4)
-    author_id: UUID = field(default_factory=uuid4)
+class BlogPost(msgspec.Struct, frozen=True):
+    id: UUID = msgspec.field(default_factory=uuid4)
+    author_id: UUID = msgspec.field(default_factory=uuid4)
     title: str = ""
     content: str = ""
-    created_at: datetime = field(default_factory=datetime.now)
-    updated_at: datetime = field(default_factory=datetime.now)
-    tags: list[Tag] = field(default_factory=list)
+    excerpt: str = ""
+    created_at: datetime = msgspec.field(default_factory=datetime.now)
+    updated_at: datetime = msgspec.field(default_factory=datetime.now)
+    tags: list[Tag] = msgspec.field(default_factory=list)
     like_count: int = 0
     is_liked: bool = False
 
 
-@dataclass
-class BlogLike:
-    id: UUID = field(default_factory=uuid4)
-    blog_post_id: UUID = field(default_factory=uuid4)
-    employee_id: UUID = field(default_factory=uuid4)
-    created_at: datetime = field(default_factory=datetime.now)
+class BlogLike(msgspec.Struct, frozen=True):
+    id: UUID = msgspec.field(default_factory=uuid4)
+    blog_post_id: UUID = msgspec.field(default_factory=uuid4)
+    employee_id: UUID = msgspec.field(default_factory=uuid4)
+    created_at: datetime = msgspec.field(default_factory=datetime.now)
 
 
-@dataclass
-class MeetingRoom:
-    id: UUID = field(default_factory=uuid4)
+class MeetingRoom(msgspec.Struct, frozen=True):
+    id: UUID = msgspec.field(default_factory=uuid4)
     name: str = ""
     capacity: int = 0
     location: str = ""
     equipment: str = ""
 
 
-@dataclass
-class MeetingRoomReservation:
-    id: UUID = field(default_factory=uuid4)
-    meeting_room_id: UUID = field(default_factory=uuid4)
+class MeetingRoomReservation(msgspec.Struct, frozen=True):
+    id: UUID = msgspec.field(default_factory=uuid4)
+    meeting_room_id: UUID = msgspec.field(default_factory=uuid4)
     title: str = ""
-    start_time: datetime = field(default_factory=datetime.now)
-    end_time: datetime = field(default_factory=datetime.now)
-    created_by: UUID = field(default_factory=uuid4)
-    created_at: datetime = field(default_factory=datetime.now)
+    start_time: datetime = msgspec.field(default_factory=datetime.now)
+    end_time: datetime = msgspec.field(default_factory=datetime.now)
+    created_by: UUID = msgspec.field(default_factory=uuid4)
+    created_at: datetime = msgspec.field(default_factory=datetime.now)
 
 
-@dataclass
-class ReservationParticipant:
-    id: UUID = field(default_factory=uuid4)
-    reservation_id: UUID = field(default_factory=uuid4)
-    employee_id: UUID = field(default_factory=uuid4)
+class ReservationParticipant(msgspec.Struct, frozen=True):
+    id: UUID = msgspec.field(default_factory=uuid4)
+    reservation_id: UUID = msgspec.field(default_factory=uuid4)
+    employee_id: UUID = msgspec.field(default_factory=uuid4)
 
 
 # Piccoloテーブル (ORM)
@@ -174,19 +165,25 @@ class BlogPostTable(Table, tablename="blog_posts"):
     author_id = ForeignKey(references=EmployeeTable, null=False)
     title = Varchar(length=255, null=False)
     content = Text(null=False)
+    excerpt = Text(null=False, default="")
     created_at = Timestamp(null=False)
     updated_at = Timestamp(null=False)
+    like_count = Integer(null=False, default=0)
 
 
 class TagTable(Table, tablename="tags"):
     id = PiccoloUUID(primary_key=True)
     name = Varchar(length=255, null=False)
+    # blog_post_tags のトリガーで更新
+    usage_count = Integer(null=False, default=0)
 
 
 class BlogPostTagTable(Table, tablename="blog_post_tags"):
     id = PiccoloUUID(primary_key=True)
     blog_post_id = ForeignKey(references=BlogPostTable, null=False)
     tag_id = ForeignKey(references=TagTable, null=False)
+    # タグ別一覧のキーセットページング用 (blog_posts.created_at の複製)
+    post_created_at = Timestamp(null=False)
 
 
 class BlogLikeTable(Table, tablename="blog_likes"):
@@ -14,6 +14,8 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 # テスト環境であることを示す環境変数を設定（modelsインポート前に必要）
 os.environ["TESTING"] = "1"
 
+from app.refdata import clear_refdata
+from app.sessions import clear_sessions
 from main import create_app
 from models import (
     BlogLikeTable,
@@ -22,6 +24,7 @@ from models import (
     ChatMessageTable,
     DepartmentTable,
     EmployeeTable,
+    MeetingRoomTable,
     PCAssignmentHistoryTable,
     PCTable,
     TagTable,
@@ -41,10 +44,19 @@ def mock_redis():
     mock.get.return_value = None
     mock.setex.return_value = None
     mock.delete.return_value = None
+    mock.mget.side_effect = lambda *keys: [None] * len(keys)
     with patch("app.cache.redis", mock):
         yield mock
 
 
+@pytest.fixture(autouse=True)
+def clear_local_caches():
+    """プロセス内キャッシュをテスト間で持ち越さない"""
+    yield
+    clear_sessions()
+    clear_refdata()
+
+
 @pytest.fixture(autouse=True)
 def mock_slack():
     """Slack通知を無効化（全テストで自動適用）"""
@@ -58,6 +70,7 @@ async def setup_test_db() -> AsyncGenerator[None, None]:
     tables = [
         DepartmentTable,
         EmployeeTable,
+        MeetingRoomTable,
         PCTable,
         PCAssignmentHistoryTable,
         ChatMessageTable,
@@ -101,3 +114,17 @@ def auth_client():
 def auth_headers():
     """認証ヘッダー"""
     return {"Authorization": "Bearer test-token"}
+
+
+@pytest.fixture
+def query_log():
+    """実行されたSQLを記録（クエリ数の検証用）"""
+    queries = []
+    original = SQLiteEngine.run_querystring
+
+    async def run_querystring(self, querystring, in_pool=False):
+        queries.append(str(querystring))
+        return await original(self, querystring, in_pool=in_pool)
+
+    with patch.object(SQLiteEngine, "run_querystring", run_querystring):
+        yield queries
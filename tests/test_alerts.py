@@ -0,0 +1,102 @@
+"""退職・異動アラートのテスト"""
+
+from datetime import date, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.alerts import DIGEST_KEY, find_upcoming_alerts, get_alert_digest
+from app.scheduler import send_daily_digest
+from models import EmployeeTable, PCTable
+
+
+async def test_upcoming_alerts_with_pc_state(mock_redis):
+    """期間内の退職・異動予定者をPC割り当て状況付きで返し、ダイジェストを保存する"""
+    today = date.today()
+    leaving = EmployeeTable(
+        name="退職者",
+        email="a@example.com",
+        resignation_date=today + timedelta(days=3),
+        transfer_date=None,
+    )
+    moving = EmployeeTable(
+        name="異動者",
+        email="b@example.com",
+        resignation_date=None,
+        transfer_date=today + timedelta(days=1),
+    )
+    later = EmployeeTable(
+        name="対象外",
+        email="c@example.com",
+        resignation_date=today + timedelta(days=30),
+        transfer_date=None,
+    )
+    for emp in (leaving, moving, later):
+        await emp.save()
+    await PCTable(
+        name="PC-1", model="M", serial_number="S1", assigned_to=leaving.id
+    ).save()
+
+    alerts = await find_upcoming_alerts(7)
+    assert [
+        (a["name"], a["days_left"], a["has_pc"]) for a in alerts["resignations"]
+    ] == [("退職者", 3, True)]
+    assert [(a["name"], a["has_pc"]) for a in alerts["transfers"]] == [
+        ("異動者", False)
+    ]
+
+    digest = await get_alert_digest()
+    assert digest["date"] == today.isoformat()
+    key, ttl, _ = mock_redis.setex.call_args.args
+    assert key == DIGEST_KEY
+    assert 0 < ttl <= 86400
+
+
+async def test_daily_digest_sent_once(mock_redis):
+    """日次ダイジェストは送信済みフラグが取れたワーカーだけが1回通知する"""
+    today = date.today()
+    await EmployeeTable(
+        name="退職者",
+        email="a@example.com",
+        resignation_date=today + timedelta(days=1),
+        transfer_date=None,
+    ).save()
+    notify = AsyncMock()
+    with patch("app.scheduler.notify_slack", notify):
+        mock_redis.set.side_effect = [True, None]
+        digest = await send_daily_digest(today)
+        assert await send_daily_digest(today) is None
+
+    assert [a["name"] for a in digest["resignations"]] == ["退職者"]
+    assert digest["pc_returns"] == []
+    notify.assert_awaited_once()
+
+
+async def test_daily_digest_retried_after_failed_send(mock_redis):
+    """通知に失敗したら送信済みフラグを消し、次の呼び出しで送信する"""
+    today = date.today()
+    await EmployeeTable(
+        name="退職者",
+        email="a@example.com",
+        resignation_date=today + timedelta(days=1),
+        transfer_date=None,
+    ).save()
+    flags = set()
+
+    async def set_nx(key, value, nx=False, ex=None):
+        if key in flags:
+            return None
+        flags.add(key)
+        return True
+
+    mock_redis.set.side_effect = set_nx
+    mock_redis.delete.side_effect = lambda key: flags.discard(key)
+    notify = AsyncMock(side_effect=[RuntimeError("slack down"), None])
+    with patch("app.scheduler.notify_slack", notify):
+        with pytest.raises(RuntimeError):
+            await send_daily_digest(today)
+        assert flags == set()
+        assert await send_daily_digest(today) is not None
+        assert await send_daily_digest(today) is None
+
+    assert notify.await_count == 2
@@ -1,5 +1,13 @@
 """認証機能のテスト"""
 
+import hashlib
+import json
+from contextlib import asynccontextmanager
+from unittest.mock import MagicMock, patch
+
+from app import sessions
+from app.api.auth import _otp_record
+
 
 def test_api_bearer_auth_required(client):
     """API認証が必須であることの確認"""
@@ -18,3 +26,37 @@ def test_api_valid_bearer_token(auth_client, auth_headers):
     """正しいトークンで認証成功"""
     res = auth_client.get("/pcs", headers=auth_headers)
     assert res.status_code == 200
+
+
+async def test_signed_session_revocation():
+    """署名付きセッションはI/Oなしで検証し、失効後は無効になる"""
+    pipe = MagicMock()
+
+    @asynccontextmanager
+    async def pipeline():
+        yield pipe
+
+    with (
+        patch("app.sessions.SESSION_MODE", "signed"),
+        patch("app.sessions.SESSION_SECRET", "secret"),
+        patch("app.sessions.pipeline", pipeline),
+    ):
+        token = await sessions.create_session(
+            {"user_id": "u1", "email": "a@example.com", "role": "user"}
+        )
+        assert (await sessions.load_session(token))["user_id"] == "u1"
+        assert await sessions.load_session("x" + token) is None
+        pipe.assert_not_called()
+
+        await sessions.revoke_session(token)
+        pipe.publish.assert_called_once()
+        assert await sessions.load_session(token) is None
+
+
+def test_otp_is_stored_as_keyed_digest():
+    """OTPはコードを保存せず、OTPごとの鍵とのダイジェストで照合する"""
+    first, second = _otp_record("123456"), _otp_record("123456")
+    assert "123456" not in json.dumps(first)
+    assert first["key"] != second["key"] and first["digest"] != second["digest"]
+    expected = hashlib.sha1(f"{first['key']}123456".encode()).hexdigest()
+    assert first["digest"] == expected
@@ -0,0 +1,117 @@
+"""Redisのサーキットブレーカーのテスト"""
+
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app import sessions
+from app.breaker import CLOSED, OPEN, CircuitBreaker
+from app.cache import get_cached, publish
+
+
+class SlowRedis:
+    """応答までの遅延と接続エラーを差し込める最小のRedis"""
+
+    def __init__(self):
+        self.data = {}
+        self.published = []
+        self.calls = 0
+        self.latency = 0.0
+        self.down = False
+
+    async def _wait(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.down:
+            raise RedisConnectionError("connection refused")
+
+    async def get(self, key):
+        await self._wait()
+        return self.data.get(key)
+
+    async def setex(self, key, ttl, value):
+        await self._wait()
+        self.data[key] = value
+
+    async def publish(self, channel, message):
+        await self._wait()
+        self.published.append((channel, message))
+
+
+@pytest.fixture
+def slow_redis():
+    redis = SlowRedis()
+    breaker = CircuitBreaker(
+        "redis",
+        failure_threshold=2,
+        reset_timeout=0.1,
+        call_timeout=0.05,
+        errors=(RedisConnectionError, TimeoutError),
+    )
+    with patch("app.cache.redis", redis), patch("app.cache.redis_breaker", breaker):
+        yield redis, breaker
+
+
+async def test_stalled_redis_fails_open(slow_redis):
+    """応答しないRedisはタイムアウトで打ち切り、open後は問い合わせずにミス扱い"""
+    redis, breaker = slow_redis
+    redis.latency = 1.0
+
+    start = time.perf_counter()
+    assert await get_cached("pcs:list") is None
+    assert await get_cached("pcs:list") is None
+    assert breaker.state == OPEN
+    assert await get_cached("pcs:list") is None
+    assert time.perf_counter() - start < 0.5
+    assert redis.calls == 2
+
+
+async def test_half_open_probe_recovers_and_replays(slow_redis):
+    """復旧を1件の試行で確認し、停止中に保留した配信を再送する"""
+    redis, breaker = slow_redis
+    redis.down = True
+    await publish("chat:u1", "hello")
+    await publish("chat:u1", "again")
+    assert breaker.state == OPEN
+    assert redis.published == []
+
+    redis.down = False
+    await asyncio.sleep(0.1)
+    assert breaker.available
+    redis.data["pcs:list"] = json.dumps([1])
+    assert await get_cached("pcs:list") == [1]
+    assert breaker.state == CLOSED
+    await asyncio.sleep(0.01)
+    assert redis.published == [("chat:u1", "hello"), ("chat:u1", "again")]
+
+
+async def test_half_open_allows_single_probe(slow_redis):
+    """half_open中は1件だけRedisへ通し、残りは待たずにミス扱い"""
+    redis, breaker = slow_redis
+    redis.down = True
+    await get_cached("a")
+    await get_cached("a")
+    await asyncio.sleep(0.1)
+    redis.down, redis.latency = False, 0.02
+    calls = redis.calls
+    await asyncio.gather(get_cached("a"), get_cached("a"), get_cached("a"))
+    assert redis.calls == calls + 1
+    assert breaker.state == CLOSED
+
+
+async def test_session_grace_while_redis_down(slow_redis):
+    """Redis停止中も読み込み済みのセッションは猶予期間内なら有効"""
+    redis, _ = slow_redis
+    redis.data["session:tok"] = json.dumps(
+        {"user_id": "u1", "email": "a", "role": "user"}
+    )
+    assert (await sessions.load_session("tok"))["user_id"] == "u1"
+
+    sessions.session_cache.clear()
+    redis.down = True
+    assert (await sessions.load_session("tok"))["user_id"] == "u1"
+    assert await sessions.load_session("unknown") is None
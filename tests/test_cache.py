@@ -0,0 +1,178 @@
+"""キャッシュの一括操作・ウォームアップ・変更通知のテスト"""
+
+import asyncio
+import json
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+
+from app import cache, changefeed, warmup
+from app.repository import pc_repo
+from models import PC
+
+
+class RecordingRedis:
+    """実行したコマンドを記録する最小のRedis"""
+
+    def __init__(self):
+        self.data = {}
+        self.commands = []
+
+    async def get(self, key):
+        self.commands.append(("get", key))
+        return self.data.get(key)
+
+    async def mget(self, *keys):
+        self.commands.append(("mget", *keys))
+        return [self.data.get(k) for k in keys]
+
+    async def setex(self, key, ttl, value):
+        self.commands.append(("setex", key))
+        self.data[key] = value
+
+    async def set(self, key, value, nx=False, px=None, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def evalsha(self, sha, numkeys, key, token):
+        # ロック解放スクリプトのみ
+        if self.data.get(key) == token:
+            del self.data[key]
+        return 1
+
+    async def publish(self, channel, message):
+        self.commands.append(("publish", channel))
+
+    async def delete(self, *keys):
+        self.commands.append(("delete", *keys))
+        for key in keys:
+            self.data.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        return RecordingPipeline(self)
+
+
+class RecordingPipeline:
+    def __init__(self, redis):
+        self.redis, self.ops = redis, []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def setex(self, key, ttl, value):
+        self.ops.append((key, value))
+
+    async def execute(self):
+        self.redis.commands.append(("pipeline", len(self.ops)))
+        self.redis.data.update(self.ops)
+
+
+@pytest.fixture
+def redis():
+    redis = RecordingRedis()
+    with patch("app.cache.redis", redis):
+        yield redis
+
+
+async def test_many_round_trips(redis):
+    await cache.set_many({"pcs:list": [1], "employees:list": [2]})
+    assert await cache.get_many(["pcs:list", "employees:list", "missing"]) == {
+        "pcs:list": [1],
+        "employees:list": [2],
+        "missing": None,
+    }
+    await cache.delete_many(["pcs:list", "employees:list", "pcs:list"])
+    assert redis.commands == [
+        ("pipeline", 2),
+        ("mget", "pcs:list", "employees:list", "missing"),
+        ("delete", "pcs:list", "employees:list"),
+    ]
+
+
+async def test_batcher_merges_concurrent_lookups(redis):
+    """同じ周回のGETは1回のMGETになり、同じキーは1回だけ取得する"""
+    redis.data["a"] = json.dumps("A")
+    token = cache._batcher.set(cache.CacheBatcher())
+    try:
+        results = await asyncio.gather(
+            cache.get_cached("a"), cache.get_cached("b"), cache.get_cached("a")
+        )
+        assert await cache.get_cached("a") == "A"
+    finally:
+        cache._batcher.reset(token)
+    assert results == ["A", None, "A"]
+    assert redis.commands == [("mget", "a", "b"), ("get", "a")]
+
+
+async def test_rewarm_after_invalidation(redis):
+    """無効化されたキーはローダーで作り直し、実行中の再無効化はもう1回作り直す"""
+    calls = []
+
+    @warmup.cache_loader("test:list")
+    async def load_test_list():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return [len(calls)]
+
+    try:
+        with patch("app.warmup.REWARM_DELAY", 0):
+            warmup._on_invalidate(["test:list", "unregistered"])
+            await asyncio.sleep(0.005)
+            warmup._on_invalidate(["test:list"])
+            while warmup._running:
+                await asyncio.sleep(0.01)
+    finally:
+        del warmup._loaders["test:list"]
+    assert len(calls) == 2
+    assert json.loads(redis.data["test:list"]) == [2]
+    assert not any(k.startswith("lock:") for k in redis.data)
+
+
+async def test_change_notification_invalidates_once(redis):
+    """同じトランザクションの通知は1回だけ無効化し、購読者には毎回配信する"""
+    redis.data.update({"pcs:list": "[]", "history:all": "[]"})
+    async with changefeed.subscribe_changes() as queue:
+        with patch("app.changefeed.DEBOUNCE", 0):
+            changefeed._on_notify(
+                None, 0, "table_changes", '{"table": "pcs", "txid": 7}'
+            )
+            await asyncio.sleep(0.01)
+        assert await queue.get() == {"pcs"}
+        assert "pcs:list" not in redis.data
+
+        redis.data["pcs:list"] = "[]"
+        await changefeed.apply_changes({("pcs", 7)})
+        assert await queue.get() == {"pcs"}
+    assert redis.data["pcs:list"] == "[]"
+    assert not changefeed._subscribers
+
+
+async def test_models_round_trip_through_cache(redis):
+    """取得行はまとめてモデルに変換し、キャッシュのJSONから直接モデルに戻す"""
+    rows = [
+        {
+            "id": uuid4(),
+            "name": "PC-1",
+            "model": "M",
+            "serial_number": "S1",
+            "assigned_to": None,
+            "assigned_to.name": "ignored",
+        },
+        {
+            "id": uuid4(),
+            "name": "PC-2",
+            "model": "M",
+            "serial_number": "S2",
+            "assigned_to": uuid4(),
+        },
+    ]
+    pcs = pc_repo.to_models(rows)
+    await cache.set_cached("pcs:list", pcs)
+    assert await cache.get_cached("pcs:list", list[PC]) == pcs
+    assert json.loads(redis.data["pcs:list"])[0]["id"] == str(rows[0]["id"])
@@ -0,0 +1,57 @@
+"""画面のライブ更新 (SSE) のテスト"""
+
+import asyncio
+import contextlib
+import json
+import time
+from unittest.mock import patch
+
+from app import live
+
+
+async def test_updates_are_coalesced_per_client():
+    """続けて届いた更新は間隔を空けて1回にまとめ、内容は接続数によらず1回だけ作る"""
+    builds = []
+
+    async def build():
+        builds.append(live._generation)
+        return {"count": len(builds)}
+
+    async def collect(events, n):
+        return [await anext(events) for _ in range(n)]
+
+    with patch("app.live.PUSH_INTERVAL", 0.1):
+        first = live.live_events("dashboard", build)
+        second = live.live_events("dashboard", build)
+        other = live.live_events("pcs", build)
+        tasks = [
+            asyncio.create_task(collect(first, 2)),
+            asyncio.create_task(collect(second, 2)),
+            asyncio.create_task(collect(other, 1)),
+        ]
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        live.dispatch(["dashboard"])
+        await asyncio.sleep(0.01)
+        for _ in range(3):
+            live.dispatch(["dashboard"])
+        first_events, second_events = await asyncio.gather(*tasks[:2])
+        elapsed = time.perf_counter() - start
+
+    assert not tasks[2].done()
+    tasks[2].cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await tasks[2]
+    for events in (first, second, other):
+        await events.aclose()
+    assert [e.event for e in first_events] == ["dashboard", "dashboard"]
+    assert [json.loads(e.data) for e in first_events] == [{"count": 1}, {"count": 2}]
+    assert [e.data for e in second_events] == [e.data for e in first_events]
+    assert len(builds) == 2
+    assert elapsed >= 0.1
+    assert not live._clients
+
+
+async def test_table_changes_map_to_topics():
+    assert live.topics_for(["pcs", "pc_assignment_histories"]) == {"dashboard", "pcs"}
+    assert live.topics_for(["tags"]) == set()
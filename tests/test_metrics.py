@@ -0,0 +1,128 @@
+"""メトリクスのテスト"""
+
+import fnmatch
+from collections import defaultdict
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from litestar.exceptions import NotAuthorizedException
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app import metrics
+from app.auth import metrics_token_guard
+
+
+class FakeRedis:
+    """ハッシュ操作だけを持つ最小のRedis"""
+
+    def __init__(self):
+        self.hashes = defaultdict(dict)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def hgetall(self, key):
+        return {k: str(v) for k, v in self.hashes.get(key, {}).items()}
+
+    async def scan_iter(self, match):
+        for key in list(self.hashes):
+            if fnmatch.fnmatch(key, match):
+                yield key
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis, self.ops = redis, []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def hincrbyfloat(self, key, field, value):
+        self.ops.append(
+            lambda h: h[key].__setitem__(field, h[key].get(field, 0) + value)
+        )
+
+    def hset(self, key, mapping):
+        self.ops.append(lambda h: h[key].update(mapping))
+
+    def delete(self, key):
+        self.ops.append(lambda h: h.pop(key, None))
+
+    def expire(self, key, ttl):
+        pass
+
+    async def execute(self):
+        for op in self.ops:
+            op(self.redis.hashes)
+
+
+@pytest.fixture
+def fake_redis():
+    fake = FakeRedis()
+    metrics._counters.clear()
+    metrics._flushed.clear()
+    metrics._gauges.clear()
+    with patch("app.metrics.get_redis", AsyncMock(return_value=fake)):
+        yield fake
+    metrics._counters.clear()
+    metrics._flushed.clear()
+    metrics._gauges.clear()
+
+
+async def test_render_aggregates_workers(fake_redis):
+    """Redis上の他ワーカー分と合算し、バケットはle順に出力する"""
+    metrics.observe("http_request_duration_seconds", 0.02, method="GET", route="/pcs")
+    metrics.inc("cache_requests_total", prefix="pcs", result="hit")
+    metrics.add_gauge("chat_websocket_connections", 2)
+    await metrics.flush()
+
+    # 別ワーカーの書き込み
+    metrics.inc("cache_requests_total", prefix="pcs", result="hit")
+    fake_redis.hashes["metrics:gauges:other"]["chat_websocket_connections"] = 3
+
+    text = await metrics.render()
+    assert 'cache_requests_total{prefix="pcs",result="hit"} 2' in text
+    assert "chat_websocket_connections 5" in text
+    buckets = [
+        line.split()[-1]
+        for line in text.splitlines()
+        if line.startswith("http_request_duration_seconds_bucket")
+    ]
+    assert buckets[:3] == ["0", "0", "1"]
+    assert len(buckets) == len(metrics.LATENCY_BUCKETS) + 1
+    assert "# TYPE http_request_duration_seconds histogram" in text
+
+
+async def test_render_falls_back_to_local_when_redis_fails(fake_redis):
+    """Redisに届かなければ500にせず、このワーカーの累積を返す"""
+    metrics.inc("cache_requests_total", prefix="pcs", result="hit")
+    await metrics.flush()
+    metrics.inc("cache_requests_total", prefix="pcs", result="hit")
+    metrics.add_gauge("chat_websocket_connections", 2)
+
+    with patch("app.metrics.get_redis", AsyncMock(side_effect=RedisConnectionError)):
+        text = await metrics.render()
+    assert text.startswith(f"# worker {metrics.WORKER_ID} only")
+    assert 'cache_requests_total{prefix="pcs",result="hit"} 2' in text
+    assert "chat_websocket_connections 2" in text
+    # 書き込めなかった差分は次回に持ち越す
+    assert metrics._counters['cache_requests_total{prefix="pcs",result="hit"}'] == 1
+
+
+async def test_metrics_token_guard():
+    """/metrics はMETRICS_TOKEN (未設定ならAPI_TOKEN) のBearer Tokenが必要"""
+
+    def connection(token):
+        return MagicMock(headers={"Authorization": f"Bearer {token}"})
+
+    with patch("app.auth.API_TOKEN", "api-token"):
+        await metrics_token_guard(connection("api-token"), None)
+        with patch("app.auth.METRICS_TOKEN", "metrics-token"):
+            await metrics_token_guard(connection("metrics-token"), None)
+            with pytest.raises(NotAuthorizedException):
+                await metrics_token_guard(connection("api-token"), None)
+        with pytest.raises(NotAuthorizedException):
+            await metrics_token_guard(MagicMock(headers={}), None)
@@ -0,0 +1,25 @@
+"""パーティション管理のテスト"""
+
+from datetime import date
+
+from app.partitions import add_months, expired_partitions
+
+
+def test_add_months():
+    """月の加減算は年をまたいでも月初日になる"""
+    assert add_months(date(2025, 11, 15), 3) == date(2026, 2, 1)
+    assert add_months(date(2025, 1, 31), -1) == date(2024, 12, 1)
+
+
+def test_expired_partitions():
+    """保持期間より前の月次パーティションのみ対象 (DEFAULTは除外)"""
+    names = [
+        "chat_messages_p202401",
+        "chat_messages_p202412",
+        "chat_messages_p202501",
+        "chat_messages_default",
+    ]
+    assert expired_partitions(names, date(2025, 1, 1)) == [
+        "chat_messages_p202401",
+        "chat_messages_p202412",
+    ]
@@ -2,6 +2,9 @@
 
 from uuid import uuid4
 
+import msgspec
+import pytest
+
 
 def test_create_and_get_pc(auth_client, auth_headers):
     """PCの作成と取得"""
@@ -53,3 +56,52 @@ def test_update_and_delete_pc(auth_client, auth_headers):
     # 削除確認
     res = auth_client.get(f"/pcs/{pc_id}", headers=auth_headers)
     assert res.status_code == 404
+
+
+def test_get_and_delete_pc_query_count(auth_client, auth_headers, query_log):
+    """詳細取得・削除はそれぞれ1クエリ (削除は DELETE ... RETURNING)"""
+    pc_id = uuid4()
+    pc_data = {
+        "id": str(pc_id),
+        "name": "TestPC-003",
+        "model": "ThinkPad X1",
+        "serial_number": "SN345678",
+        "assigned_to": None,
+    }
+    auth_client.post("/pcs", json=pc_data, headers=auth_headers)
+
+    query_log.clear()
+    res = auth_client.get(f"/pcs/{pc_id}", headers=auth_headers)
+    assert res.status_code == 200
+    assert len(query_log) == 1
+
+    query_log.clear()
+    res = auth_client.delete(f"/pcs/{pc_id}", headers=auth_headers)
+    assert res.status_code == 204
+    assert len(query_log) == 1
+    assert not any("EXISTS" in q.upper() for q in query_log)
+
+    # 存在しない場合も1クエリで404
+    query_log.clear()
+    res = auth_client.get(f"/pcs/{uuid4()}", headers=auth_headers)
+    assert res.status_code == 404
+    assert len(query_log) == 1
+
+
+async def test_prepared_queries_fall_back_to_piccolo():
+    """接続プールが無い (SQLite) ときはPiccoloのクエリで同じ形の結果を返す"""
+    from app.api.pcs import _pc_list
+    from app.repository import pc_repo
+    from app.statements import PreparedQuery
+    from app.web.pcs import _pc_count
+    from models import PC, PCTable
+
+    pc = PC(name="TestPC-004", model="Surface", serial_number="SN901234")
+    await PCTable.insert(PCTable(**msgspec.structs.asdict(pc)))
+
+    assert await _pc_list.fetch_models(PC) == [pc]
+    assert await _pc_count.fetchval() == 1
+    assert (await pc_repo.get(pc.id))["name"] == "TestPC-004"
+    assert await pc_repo.get(uuid4()) is None
+    with pytest.raises(ValueError):
+        PreparedQuery("pcs_count", "SELECT 1", _pc_count.fallback)
@@ -0,0 +1,50 @@
+"""クエリプロファイラのテスト"""
+
+from unittest.mock import patch
+
+import pytest
+from litestar.testing import TestClient
+from piccolo.engine.sqlite import SQLiteEngine
+
+from app.profiler import install_profiler, uninstall_profiler
+from main import create_app
+
+
+@pytest.fixture
+def profiled_client():
+    install_profiler(SQLiteEngine)
+    try:
+        with (
+            patch("main.QUERY_PROFILER_ENABLED", True),
+            patch("app.auth.API_TOKEN", "test-token"),
+        ):
+            with TestClient(app=create_app()) as c:
+                yield c
+    finally:
+        uninstall_profiler()
+
+
+def test_server_timing_header(profiled_client, auth_headers):
+    """リクエストごとのクエリ数・DB時間をServer-Timingに出力する"""
+    res = profiled_client.get("/pcs", headers=auth_headers)
+    assert res.status_code == 200
+    timing = res.headers["server-timing"]
+    assert 'desc="1 queries"' in timing
+    assert "total;dur=" in timing
+
+
+def test_slow_query_log_redacts_params(profiled_client, auth_headers, caplog):
+    """閾値を超えたクエリはパラメータを型名に置き換えて記録する"""
+    with patch("app.profiler.SLOW_QUERY_MS", 0):
+        profiled_client.get(
+            "/pcs/00000000-0000-0000-0000-000000000001", headers=auth_headers
+        )
+    slow = [r.getMessage() for r in caplog.records if "slow_query" in r.getMessage()]
+    assert slow
+    assert "00000000-0000-0000-0000-000000000001" not in slow[0]
+    assert '"params": ["UUID"]' in slow[0]
+
+
+def test_disabled_by_default(client):
+    res = client.get("/auth/login")
+    assert "server-timing" not in res.headers
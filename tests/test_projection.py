@@ -0,0 +1,76 @@
+"""社員テーブルのbyteaカラム (profile_image) を画像エンドポイント以外で取得しないことの検査"""
+
+import ast
+from pathlib import Path
+
+APP_DIR = Path(__file__).parent.parent / "app"
+
+# EmployeeTableの別名
+EMPLOYEE_TABLES = {"E", "EmployeeTable"}
+# 社員を参照する外部キー (X.<fk>.all_columns() で画像まで取得してしまう)
+EMPLOYEE_FKS = {
+    "assigned_to",
+    "author_id",
+    "employee_id",
+    "sender_id",
+    "receiver_id",
+    "created_by",
+}
+# profile_image を扱ってよい関数 (画像の登録・配信、画像有無の判定)
+IMAGE_HANDLERS = {
+    "upload_profile_image",
+    "get_profile_image",
+    "upload_employee_image",
+    "get_employee_image",
+    "view_mypage",
+}
+
+
+def _violations(path: Path) -> list[str]:
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    found = []
+
+    def visit(node: ast.AST, func: str | None) -> None:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            func = node.name
+        where = f"{path.relative_to(APP_DIR.parent)}:{getattr(node, 'lineno', 0)}"
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            target = node.func.value
+            # E.select() / E.objects() は全カラム取得
+            if (
+                isinstance(target, ast.Name)
+                and target.id in EMPLOYEE_TABLES
+                and node.func.attr in {"select", "objects"}
+                and not node.args
+            ):
+                found.append(f"{where} {target.id}.{node.func.attr}() (全カラム)")
+            # E.all_columns() / X.assigned_to.all_columns()
+            if node.func.attr == "all_columns" and (
+                (isinstance(target, ast.Name) and target.id in EMPLOYEE_TABLES)
+                or (isinstance(target, ast.Attribute) and target.attr in EMPLOYEE_FKS)
+            ):
+                found.append(f"{where} {ast.unparse(node)}")
+        if (
+            isinstance(node, ast.Attribute)
+            and node.attr == "profile_image"
+            and isinstance(node.value, ast.Name)
+            and node.value.id in EMPLOYEE_TABLES
+            and func not in IMAGE_HANDLERS
+        ):
+            found.append(f"{where} {node.value.id}.profile_image in {func}")
+        for child in ast.iter_child_nodes(node):
+            visit(child, func)
+
+    visit(tree, None)
+    return found
+
+
+def test_profile_image_only_selected_by_image_endpoints():
+    """社員の全カラム取得・画像カラム参照は画像エンドポイントのみ"""
+    violations = [
+        v
+        for path in sorted(APP_DIR.rglob("*.py"))
+        if path.name != "repository.py"
+        for v in _violations(path)
+    ]
+    assert violations == []
@@ -0,0 +1,26 @@
+"""レート制限・OTP検証のテスト"""
+
+from unittest.mock import patch
+
+
+def test_api_rate_limit(auth_client, auth_headers, mock_redis):
+    """上限を超えたら429とRetry-Afterを返す (判定はスクリプト1回)"""
+    mock_redis.evalsha.side_effect = [[1, 0, 0], [0, 1500, 0]]
+    with patch("app.ratelimit.RATE_LIMIT_ENABLED", True):
+        assert auth_client.get("/pcs", headers=auth_headers).status_code == 200
+        res = auth_client.get("/pcs", headers=auth_headers)
+    assert res.status_code == 429
+    assert res.headers["retry-after"] == "2"
+    assert mock_redis.evalsha.await_count == 2
+    assert mock_redis.evalsha.await_args.args[2].startswith("rate:api:")
+
+
+def test_verify_otp_invalid(client, mock_redis):
+    """OTPの照合結果に応じたエラーを返す (照合と試行回数の更新はスクリプト内)"""
+    mock_redis.evalsha.side_effect = [[1, 0, 9], "invalid"]
+    res = client.post(
+        "/auth/verify-otp", json={"email": "a@example.com", "otp": "000000"}
+    )
+    assert res.status_code == 401
+    assert res.json()["detail"] == "OTPが正しくありません"
+    mock_redis.get.assert_not_awaited()
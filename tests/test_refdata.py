@@ -0,0 +1,43 @@
+"""参照データスナップショットのテスト"""
+
+import asyncio
+from unittest.mock import patch
+
+from app.refdata import get_refdata
+from models import DepartmentTable
+
+
+async def test_refdata_reloads_when_version_changes(mock_redis, query_log):
+    """バージョンが同じ間はDBを読まず、変わったら読み直す"""
+    await DepartmentTable(name="開発部").save()
+    mock_redis.get.return_value = "1"
+
+    first = await get_refdata()
+    assert [d.name for d in first.departments.values()] == ["開発部"]
+
+    await DepartmentTable(name="営業部").save()
+    query_log.clear()
+    assert await get_refdata() is first
+    assert query_log == []
+
+    mock_redis.get.return_value = "2"
+    with patch("app.refdata.VERSION_CHECK_SECONDS", 0):
+        second = await get_refdata()
+    assert second.version == 2
+    assert [d.name for d in second.departments.values()] == ["営業部", "開発部"]
+
+
+async def test_refdata_loads_once_for_concurrent_requests(mock_redis, query_log):
+    """同時に読み込みが必要になっても1回だけ読み、直後の呼び出しはRedisも見ない"""
+    await DepartmentTable(name="開発部").save()
+    mock_redis.get.return_value = "1"
+    query_log.clear()
+
+    snapshots = await asyncio.gather(*(get_refdata() for _ in range(5)))
+    assert all(s is snapshots[0] for s in snapshots)
+    # 部署・会議室・タグ・社員の4クエリ
+    assert len(query_log) == 4
+
+    mock_redis.get.reset_mock()
+    assert await get_refdata() is snapshots[0]
+    mock_redis.get.assert_not_called()